@@ -0,0 +1,71 @@
+"""
+bench_additive_kb.py -- Additive knowledge base at full E-number scale.
+
+Generates a knowledge base the size of the full E-number list (E100 to
+E1599, every fifth number with a/b/c sub-entries and (i)/(ii)
+sub-sub-entries), then reports how long building the index (what a
+hot reload costs, off the event loop) takes, and the per-lookup cost
+for canonical codes, OFF tags, loose spellings and sub-entries that
+only exist as their parent, against the old exact-key dict lookup.
+
+    python -m benchmarks.bench_additive_kb --lookups 200000
+"""
+
+import argparse
+import random
+import time
+
+from services.additive_kb import KnowledgeBase, canonical_code
+
+
+def full_table():
+    table = {}
+    for number in range(100, 1600):
+        entry = {"name": f"Additive {number}", "category": "Test", "risk": "low",
+                 "explanation": "Generated."}
+        if number % 5 == 0:
+            entry["sub"] = {
+                letter: {"name": f"Additive {number}{letter}",
+                         "sub": {"i": {"risk": "moderate"}, "ii": {"risk": "high"}}}
+                for letter in "abc"
+            }
+        table[f"E{number}"] = entry
+    return table
+
+
+def _spellings(rng, n):
+    kinds = {
+        "canonical": lambda k: f"E{k}",
+        "off tag":   lambda k: f"en:e{k}",
+        "loose":     lambda k: f"e-{k}",
+        "sub-entry": lambda k: f"E {k // 5 * 5} a (ii)",
+        "fallback":  lambda k: f"E{k}D(iv)",
+    }
+    return {name: [make(rng.randrange(100, 1600)) for _ in range(n)] for name, make in kinds.items()}
+
+
+def main(args):
+    table = full_table()
+    start = time.perf_counter()
+    kb = KnowledgeBase(table)
+    build_ms = (time.perf_counter() - start) * 1e3
+    print(f"index: {len(kb):,} entries built in {build_ms:.1f}ms (version {kb.version})")
+
+    exact = {code: entry for code, entry in kb.entries.items()}
+    rng = random.Random(0)
+    for kind, codes in _spellings(rng, args.lookups).items():
+        canonical_code.cache_clear()
+        start = time.perf_counter()
+        found = sum(kb.lookup(c) is not None for c in codes)
+        kb_ns = (time.perf_counter() - start) / len(codes) * 1e9
+        start = time.perf_counter()
+        old = sum(exact.get(c.replace("en:", "").upper()) is not None for c in codes)
+        old_ns = (time.perf_counter() - start) / len(codes) * 1e9
+        print(f"  {kind:<10} kb {kb_ns:6.0f}ns/lookup, {found / len(codes):6.1%} found   "
+              f"exact-key dict {old_ns:5.0f}ns, {old / len(codes):6.1%} found")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lookups", type=int, default=200_000)
+    main(parser.parse_args())
@@ -0,0 +1,86 @@
+"""
+bench_allergens.py -- Per-term substring loop vs the compiled allergen matcher.
+
+Runs both over long, noisy OCR-style ingredient texts, first with the
+shipped data/allergens.json and then with a table padded to --terms
+synthetic multilingual terms, to show how each scales with the term list.
+
+    python -m benchmarks.bench_allergens --texts 200 --length 8000 --terms 600
+"""
+
+import argparse
+import random
+import string
+import time
+
+from services.allergens import MATCHER, AllergenMatcher, load_matcher
+
+_WORDS = [
+    "sugar", "wheat flour", "palmolein", "salt", "milk solids", "cocoa", "emulsifier",
+    "soya lecithin", "raising agent", "e500(ii)", "spices", "eggplant", "hazelnut paste",
+    "contains", "may contain traces of", "peanuts", "sesame", "mustard", "INS 322",
+    "antioxidant", "natural flavour", "glucose syrup", "lait", "weizenmehl", "édulcorant",
+]
+
+
+def _ocr_text(rng, length):
+    parts, size = [], 0
+    while size < length:
+        word = rng.choice(_WORDS)
+        if rng.random() < 0.1:
+            # OCR noise: a dropped or swapped character
+            i = rng.randrange(len(word))
+            word = word[:i] + rng.choice(string.ascii_lowercase) + word[i + 1:]
+        parts.append(word)
+        size += len(word) + 2
+    return ", ".join(parts)
+
+
+def _naive(terms, text, traces):
+    # The previous detect_allergens loop: one full scan per term
+    text = text.lower()
+    return {a for a in terms if a in text or any(a in t for t in traces)}
+
+
+def _padded_table(base, n, rng):
+    table = {k: list(v) for k, v in base.items()}
+    allergens = list(table)
+    count = sum(len(v) for v in table.values())
+    while count < n:
+        term = "".join(rng.choice("abcdefghijklmnopqrstuvwxyzéèüö") for _ in range(rng.randint(4, 12)))
+        table[rng.choice(allergens)].append(term)
+        count += 1
+    return table
+
+
+def _time(fn, texts, traces):
+    start = time.perf_counter()
+    for t in texts:
+        fn(t, traces)
+    return (time.perf_counter() - start) / len(texts) * 1e6
+
+
+def main(args):
+    rng = random.Random(0)
+    texts = [_ocr_text(rng, args.length) for _ in range(args.texts)]
+    traces = ["en:nuts", "en:peanuts", "en:sesame-seeds", "en:soybeans"]
+
+    base = load_matcher()
+    table = _padded_table(MATCHER.table, args.terms, rng)
+
+    for label, matcher in (("shipped", base), (f"{args.terms} terms", AllergenMatcher(table))):
+        terms = list(matcher.canonical)
+        naive_us = _time(lambda t, tr: _naive(terms, t, tr), texts, traces)
+        matcher_us = _time(lambda t, tr: matcher.find(t, *tr), texts, traces)
+        print(
+            f"{label:<12} terms={len(terms):>4}  substring loop={naive_us:9.1f}us/text  "
+            f"matcher={matcher_us:9.1f}us/text  ({naive_us / matcher_us:4.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=200)
+    parser.add_argument("--length", type=int, default=8000, help="characters per ingredient text")
+    parser.add_argument("--terms", type=int, default=600, help="term count for the padded table")
+    main(parser.parse_args())
@@ -0,0 +1,75 @@
+"""
+bench_analyze_batch.py -- analyze_batch() vs analyze() speed.
+
+Scores --rows random columnar rows with analyze_batch and compares the
+rate with analyze() on --sample synthetic products. That both produce
+the same results is tested in tests/test_analyzer_batch.py.
+
+    python -m benchmarks.bench_analyze_batch --rows 1000000
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_product
+from services.analyzer import analyze
+from services.analyzer_batch import analyze_batch
+from services.extractor import extract_product_data
+from services.normalizer import normalize
+
+
+def _sample(n, seed):
+    rng = random.Random(seed)
+    return [normalize(extract_product_data(make_product(i, rng))) for i in range(n)]
+
+
+def _random_columns(rows, seed):
+    rng = np.random.default_rng(seed)
+
+    def nutrient(hi, p_missing=0.15):
+        v = np.round(rng.uniform(0, hi, rows), 2)
+        v[rng.random(rows) < p_missing] = np.nan
+        return v
+
+    return {
+        "energy_kcal": nutrient(650), "fat": nutrient(40), "saturated_fat": nutrient(20),
+        "carbohydrates": nutrient(90), "sugars": nutrient(40), "fiber": nutrient(12),
+        "protein": nutrient(30), "salt": nutrient(12), "cholesterol": nutrient(0.3, 0.7),
+        "trans_fat": nutrient(1, 0.9),
+        "nova_group": rng.choice([1.0, 2.0, 3.0, 4.0, np.nan], rows),
+        "off_completeness": nutrient(1, 0.3),
+        "per_100g": rng.random(rows) < 0.9,
+        "is_condiment": rng.random(rows) < 0.05,
+        "contains_palm_oil": rng.random(rows) < 0.3,
+        "ingredient_count": rng.integers(0, 40, rows),
+        "additive_penalty": rng.integers(0, 30, rows),
+        "high_risk_additives": rng.integers(0, 3, rows),
+        "positive_labels": rng.integers(0, 4, rows),
+    }
+
+
+def bench(rows, sample):
+    cols = _random_columns(rows, 1)
+    start = time.perf_counter()
+    analyze_batch(cols)
+    elapsed = time.perf_counter() - start
+    print(f"analyze_batch: {rows:,} rows in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/s)")
+
+    start = time.perf_counter()
+    for p in sample:
+        analyze(p)
+    elapsed = time.perf_counter() - start
+    print(f"analyze:       {len(sample):,} rows in {elapsed:.2f}s ({len(sample) / elapsed:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="rows for analyze_batch")
+    parser.add_argument("--sample", type=int, default=20000, help="products for analyze")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    bench(args.rows, _sample(args.sample, args.seed))
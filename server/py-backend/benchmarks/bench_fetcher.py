@@ -0,0 +1,79 @@
+"""
+bench_fetcher.py -- Per-request AsyncClient vs the shared pooled client.
+
+Runs against a local OpenFoodFacts stand-in that sleeps `--handshake-ms`
+on every new connection, so the gap between the two modes is the
+connection setup cost the pooled client avoids.
+
+    python -m benchmarks.bench_fetcher --requests 500 --concurrency 20
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from benchmarks.standins import OffStandin
+from services import fetcher
+
+
+async def _per_request(url):
+    # What fetch_product_from_api used to do before the shared client
+    async with httpx.AsyncClient(timeout=6.0) as client:
+        return await client.get(url)
+
+
+async def _pooled(url):
+    return await fetcher.get_client().get(url)
+
+
+async def _run(call, base_url, n, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with sem:
+            start = time.perf_counter()
+            res = await call(f"{base_url}{i:013d}")
+            res.raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    return latencies, time.perf_counter() - start
+
+
+def _pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def _report(label, latencies, elapsed, connections):
+    print(
+        f"{label:<12} p50={_pct(latencies, 50):7.2f}ms  p99={_pct(latencies, 99):7.2f}ms  "
+        f"mean={statistics.mean(latencies):7.2f}ms  rps={len(latencies) / elapsed:8.1f}  "
+        f"connections={connections}"
+    )
+
+
+async def main(args):
+    with OffStandin(handshake_ms=args.handshake_ms, latency_ms=args.latency_ms) as off:
+        modes = [("per-request", _per_request), ("pooled", _pooled)]
+        for label, call in modes:
+            before = off.connections
+            lat, elapsed = await _run(call, off.base_url, args.requests, args.concurrency)
+            _report(label, lat, elapsed, off.connections - before)
+        await fetcher.close_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--handshake-ms", type=float, default=40.0,
+                        help="delay per new connection, emulating TCP+TLS setup")
+    parser.add_argument("--latency-ms", type=float, default=5.0,
+                        help="per-request server processing time")
+    asyncio.run(main(parser.parse_args()))
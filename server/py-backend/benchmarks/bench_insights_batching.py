@@ -0,0 +1,91 @@
+"""
+bench_insights_batching.py -- Per-product vs micro-batched insight calls.
+
+Drives generate_insights() at a steady arrival rate against a local fake
+LLM with a requests-per-minute limit, once with LLM_BATCH off and once
+on, and reports successful insights per minute and per-request latency.
+
+    python -m benchmarks.bench_insights_batching --count 200 --rate 20 --rpm 30
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.standins import FakeLLM
+from benchmarks.synthetic import make_product
+from services import ai_insights
+from services.analyzer import analyze
+from services.extractor import extract_product_data
+from services.normalizer import normalize
+
+
+def _pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+async def _drive(products, rate):
+    latencies, ok, failed = [], 0, 0
+
+    async def one(normalized, analyzed):
+        nonlocal ok, failed
+        start = time.perf_counter()
+        result = await ai_insights.generate_insights(normalized, analyzed)
+        latencies.append(time.perf_counter() - start)
+        if ai_insights._is_error(result):
+            failed += 1
+        else:
+            ok += 1
+
+    start = time.perf_counter()
+    tasks = []
+    for normalized, analyzed in products:
+        tasks.append(asyncio.create_task(one(normalized, analyzed)))
+        await asyncio.sleep(1 / rate)
+    await asyncio.gather(*tasks)
+    return latencies, ok, failed, time.perf_counter() - start
+
+
+async def main(args):
+    products = []
+    for i in range(args.count):
+        normalized = normalize(extract_product_data(make_product(i)))
+        products.append((normalized, analyze(normalized)))
+
+    os.environ["GROQ_API_KEY"] = "standin"
+    ai_insights.INSIGHT_CACHE = False
+    ai_insights.LLM_BATCH_MAX = args.batch_max
+    ai_insights.LLM_BATCH_WINDOW_MS = args.window_ms
+
+    for batch in (False, True):
+        with FakeLLM(rpm=args.rpm, latency_ms=args.latency_ms, per_item_ms=args.per_item_ms) as llm:
+            ai_insights.LLM_BASE_URL = llm.base_url
+            ai_insights.LLM_BATCH = batch
+            ai_insights.client = None
+            ai_insights._batcher = None
+            ai_insights._semaphore = None
+
+            lat, ok, failed, elapsed = await _drive(products, args.rate)
+            label = "batched" if batch else "per-product"
+            print(
+                f"{label:<12} ok={ok:>4} failed={failed:>4}  "
+                f"insights/min={ok / elapsed * 60:7.1f}  upstream calls={llm.requests - llm.rate_limited:>4} "
+                f"(429s={llm.rate_limited})  p50={_pct(lat, 50):5.2f}s  p99={_pct(lat, 99):5.2f}s"
+            )
+            if batch:
+                print("             ", ai_insights.get_batcher().stats())
+            await ai_insights.client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=200, help="insight requests to send")
+    parser.add_argument("--rate", type=float, default=20.0, help="arrivals per second")
+    parser.add_argument("--rpm", type=int, default=30, help="fake LLM requests-per-minute limit")
+    parser.add_argument("--latency-ms", type=float, default=400.0)
+    parser.add_argument("--per-item-ms", type=float, default=60.0)
+    parser.add_argument("--batch-max", type=int, default=8)
+    parser.add_argument("--window-ms", type=float, default=200.0)
+    asyncio.run(main(parser.parse_args()))
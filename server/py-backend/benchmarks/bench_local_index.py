@@ -0,0 +1,71 @@
+"""
+bench_local_index.py -- Build a local index with 1M+ entries and time lookups.
+
+Payloads are small synthetic product stubs so the build stays quick; use
+--rich for full synthetic OFF documents (slower to generate).
+
+    python -m benchmarks.bench_local_index --entries 1000000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.synthetic import make_product
+from services.local_index import LocalIndex, build_index
+
+
+def _stubs(n):
+    for i in range(n):
+        yield {
+            "code": f"{2000000000000 + i:013d}",
+            "product_name": f"Product {i}",
+            "nutriments": {"salt": i % 7 / 3, "sugars": i % 23},
+        }
+
+
+def _pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, "products")
+        source = (make_product(i) for i in range(args.entries)) if args.rich else _stubs(args.entries)
+
+        start = time.perf_counter()
+        entries, _ = build_index(source, base)
+        build_s = time.perf_counter() - start
+        size_mb = (os.path.getsize(f"{base}.keys") + os.path.getsize(f"{base}.data")) / 1e6
+        print(f"build: {entries:,} entries in {build_s:.1f}s ({size_mb:.1f} MB on disk)")
+
+        start = time.perf_counter()
+        index = LocalIndex(base)
+        print(f"open:  {(time.perf_counter() - start) * 1e3:.2f} ms")
+
+        rng = random.Random(1)
+        hit_codes = [f"{2000000000000 + rng.randrange(args.entries):013d}" for _ in range(args.lookups)]
+        miss_codes = [f"{9000000000000 + i:013d}" for i in range(args.lookups)]
+
+        for label, codes in (("hit", hit_codes), ("miss", miss_codes)):
+            lat = []
+            for code in codes:
+                t0 = time.perf_counter()
+                index.lookup(code)
+                lat.append((time.perf_counter() - t0) * 1e6)
+            print(
+                f"{label:<5} p50={_pct(lat, 50):6.1f}us  p99={_pct(lat, 99):6.1f}us  "
+                f"rate={len(lat) / (sum(lat) / 1e6):,.0f}/s"
+            )
+        index.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--rich", action="store_true", help="index full synthetic OFF documents")
+    main(parser.parse_args())
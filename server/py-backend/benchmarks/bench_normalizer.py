@@ -0,0 +1,180 @@
+"""
+bench_normalizer.py -- Legacy vs single-pass ingredient normalisation.
+
+Builds synthetic products with growing ingredient trees (and additive
+lists to match), checks that flatten_ingredients + normalize return
+exactly what the previous recursive / multi-pass code returned, then
+times both. A final case feeds a chain nested deeper than the recursion
+limit, which the old recursive flattener cannot handle.
+
+    python -m benchmarks.bench_normalizer --sizes 100 1000 5000 --depth 3000
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+
+from benchmarks.synthetic import make_product
+from services.extractor import extract_product_data, flatten_ingredients
+from services.encoding import dumps
+from services.normalizer import _is_junk, normalize
+
+
+# --- previous implementation, kept inline as the reference -------------------
+
+def _legacy_flatten(ingredients):
+    flat = []
+    for ing in ingredients or []:
+        flat.append(ing)
+        if isinstance(ing.get("ingredients"), list):
+            flat.extend(_legacy_flatten(ing["ingredients"]))
+    return flat
+
+
+def _legacy_is_additive(item):
+    idv = item.get("id") or ""
+    return bool(re.match(r"en:e\d+", idv.lower()))
+
+
+_INGREDIENT_KEYS = (
+    "id", "text", "percent_estimate", "percent_min", "percent_max", "vegan", "vegetarian",
+    "ciqual_proxy_food_code", "ciqual_food_code", "ecobalyse_code", "from_palm_oil",
+    "is_in_taxonomy",
+)
+
+
+def _legacy_normalize_ingredient(item):
+    return {k: item.get(k) for k in _INGREDIENT_KEYS}
+
+
+def _legacy_normalize(extracted):
+    raw_ing = extracted.ingredients
+    ingredients, additives_from_ingredients = [], []
+    for ing in raw_ing:
+        if _is_junk(ing):
+            continue
+        n = _legacy_normalize_ingredient(ing)
+        if _legacy_is_additive(ing):
+            additives_from_ingredients.append(n)
+        else:
+            ingredients.append(n)
+
+    additives_raw = extracted.additives
+    uniq = {}
+    if additives_raw:
+        for tag in additives_raw:
+            entry = {"id": tag, "text": tag.replace("en:", "").upper()}
+            entry.update(dict.fromkeys(
+                ("percent_estimate", "percent_min", "percent_max", "vegan", "vegetarian",
+                 "ciqual_proxy_food_code", "ciqual_food_code", "ecobalyse_code",
+                 "from_palm_oil", "is_in_taxonomy")))
+            for a in additives_from_ingredients:
+                if (a.get("id") or "").lower() == tag.lower():
+                    entry.update({k: v for k, v in a.items() if v is not None})
+                    break
+            code = tag.replace("en:", "").upper()
+            if code not in uniq:
+                uniq[code] = entry
+    else:
+        for a in additives_from_ingredients:
+            code = (a["id"] or "").replace("en:", "").upper()
+            if code not in uniq:
+                uniq[code] = a
+    additives = list(uniq.values())
+
+    contains_palm_oil = any(
+        (i.get("from_palm_oil") or "") in ("yes", "maybe")
+        or "palm" in (i.get("id") or "")
+        or "palm" in (i.get("text") or "").lower()
+        for i in raw_ing
+    )
+
+    seen_text, dom = set(), []
+    for ing in raw_ing:
+        if _is_junk(ing) or _legacy_is_additive(ing):
+            continue
+        text = (ing.get("text") or "").strip()
+        if not text or text in seen_text:
+            continue
+        pct = ing.get("percent_estimate") or 0
+        if pct > 0:
+            seen_text.add(text)
+            dom.append({"ingredient": text, "percent": round(pct, 1)})
+    dom = sorted(dom, key=lambda x: x["percent"], reverse=True)[:4]
+
+    return {
+        "text":             extracted.ingredients_text,
+        "ingredients":      ingredients,
+        "additives":        additives,
+        "dominant":         dom,
+        "contains_palm_oil": contains_palm_oil,
+        "total_count":      len(ingredients),
+    }
+
+# -----------------------------------------------------------------------------
+
+
+def _large_product(i, size):
+    rng = random.Random(i)
+    raw = make_product(i, rng, n_ingredients=size // 3, depth=1, fanout=2)
+    # One additive per ~10 ingredients, with distinct codes, to load the merge
+    codes = [f"e{100 + k}" for k in range(size // 10)]
+    raw["ingredients"] += [{"id": f"en:{c}", "text": c.upper(), "percent_estimate": 0.1}
+                           for c in codes]
+    raw["additives_tags"] = [f"en:{c}" for c in codes]
+    return raw
+
+
+def _deep_product(depth):
+    raw = make_product(0, random.Random(0), n_ingredients=1, depth=0)
+    node = raw["ingredients"][0]
+    for k in range(depth):
+        child = {"id": f"en:layer-{k}", "text": f"layer {k}", "percent_estimate": 1.0}
+        node["ingredients"] = [child]
+        node = child
+    return raw
+
+
+def _time(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+def main(args):
+    for size in args.sizes:
+        raw = _large_product(size, size)
+        assert flatten_ingredients(raw["ingredients"]) == _legacy_flatten(raw["ingredients"])
+        extracted = extract_product_data(raw)
+        # The new code returns records; compare what each encodes to
+        new, legacy = normalize(extracted).ingredients, _legacy_normalize(extracted)
+        assert dumps(new) == dumps(legacy), f"mismatch at size {size}"
+
+        n = len(extracted.ingredients)
+        legacy_ms = _time(lambda: _legacy_normalize(extracted), args.repeat)
+        new_ms = _time(lambda: normalize(extracted), args.repeat)
+        print(f"ingredients={n:>6}  additives={len(raw['additives_tags']):>5}  "
+              f"legacy={legacy_ms:8.2f}ms  single-pass={new_ms:7.2f}ms  ({legacy_ms / new_ms:5.1f}x)")
+
+    raw = _deep_product(args.depth)
+    try:
+        _legacy_flatten(raw["ingredients"])
+        legacy = "ok"
+    except RecursionError:
+        legacy = "RecursionError"
+    start = time.perf_counter()
+    normalized = normalize(extract_product_data(raw))
+    print(f"depth={args.depth} (recursion limit {sys.getrecursionlimit()}): legacy flatten {legacy}, "
+          f"new pipeline ok with {normalized.ingredients.total_count} ingredients "
+          f"in {(time.perf_counter() - start) * 1e3:.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000, 20000])
+    parser.add_argument("--depth", type=int, default=3000, help="nesting depth of the deep-chain case")
+    parser.add_argument("--repeat", type=int, default=3)
+    main(parser.parse_args())
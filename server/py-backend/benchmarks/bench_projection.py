@@ -0,0 +1,112 @@
+"""
+bench_projection.py -- Whole OFF documents vs `fields=`-projected fetches.
+
+Pads a fixture with the bulk a real OFF v2 document carries (image
+metadata, per-language texts, packaging and ecoscore breakdowns) and
+serves it from the local stand-in, which honours `fields=`. Then runs
+fetch_product_from_api in both modes and reports bytes on the wire,
+fetch + parse latency and the peak Python memory of one fetch.
+
+    python -m benchmarks.bench_projection --requests 300
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import tracemalloc
+
+from benchmarks.bench_suite import load_fixtures
+from benchmarks.standins import OffStandin
+from services import fetcher
+
+_LANGS = ["en", "fr", "de", "es", "it", "nl", "pt", "pl", "hi", "ta", "te", "mr",
+          "bn", "gu", "kn", "ml", "ar", "ru", "ja", "zh"]
+
+
+def full_document(product, seed=0):
+    """`product` plus the kind of fields the extractor never reads."""
+    rng = random.Random(seed)
+    doc = dict(product)
+    text = product.get("ingredients_text") or ""
+    for lang in _LANGS:
+        doc[f"ingredients_text_{lang}"] = text
+        doc[f"product_name_{lang}"] = product.get("product_name")
+        doc[f"generic_name_{lang}"] = f"{product.get('product_name')} ({lang})"
+    doc["images"] = {
+        f"{kind}_{lang}": {
+            "imgid": str(rng.randint(1, 40)), "rev": str(rng.randint(1, 20)), "angle": 0,
+            "sizes": {s: {"w": s, "h": s} for s in ("100", "200", "400", "full")},
+            "geometry": "0x0-0-0", "normalize": None, "white_magic": None,
+        }
+        for kind in ("front", "ingredients", "nutrition", "packaging") for lang in _LANGS
+    }
+    doc["images"].update({
+        str(i): {"uploaded_t": 1600000000 + i, "uploader": f"user{i}",
+                 "sizes": {s: {"w": 400, "h": 300} for s in ("100", "400", "full")}}
+        for i in range(1, 41)
+    })
+    doc["packagings"] = [
+        {"material": "en:plastic", "shape": "en:bag", "number_of_units": 1,
+         "recycling": "en:discard", "weight_measured": rng.uniform(1, 10)}
+        for _ in range(6)
+    ]
+    doc["ecoscore_data"] = {
+        "adjustments": {k: {"value": rng.randint(-15, 0), "warning": f"{k}_unknown"}
+                        for k in ("origins_of_ingredients", "packaging", "production_system", "threatened_species")},
+        "agribalyse": {f"co2_{stage}": rng.random() for stage in
+                       ("agriculture", "consumption", "distribution", "packaging", "processing", "transportation")},
+        "scores": {c: rng.randint(0, 100) for c in ("fr", "de", "es", "it", "nl", "in", "world")},
+    }
+    doc["nutriments_estimated"] = {f"{k}_100g": rng.random() for k in range(120)}
+    doc["editors_tags"] = [f"user{i}" for i in range(60)]
+    doc["states_tags"] = [f"en:state-{i}" for i in range(30)]
+    return doc
+
+
+async def _fetch_all(barcode, n, all_fields):
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        await fetcher.fetch_product_from_api(barcode, all_fields=all_fields)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+async def _peak_memory(barcode, all_fields):
+    tracemalloc.start()
+    await fetcher.fetch_product_from_api(barcode, all_fields=all_fields)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+async def main(args):
+    barcode, product = next(iter(load_fixtures().items()))
+    doc = full_document(product)
+
+    with OffStandin(products={barcode: doc}) as off:
+        fetcher.set_mirrors([off.base_url])
+        fetcher.LOCAL_INDEX_PATH = None
+        client = fetcher.get_client()
+
+        for all_fields in (True, False):
+            params = None if all_fields else fetcher._FIELDS_PARAM
+            wire = len((await client.get(f"{off.base_url}{barcode}", params=params)).content)
+            await _fetch_all(barcode, 10, all_fields)
+            latencies = await _fetch_all(barcode, args.requests, all_fields)
+            peak = await _peak_memory(barcode, all_fields)
+            label = "full document" if all_fields else "fields="
+            print(
+                f"{label:<14} bytes={wire:>8,}  p50={statistics.median(latencies):6.2f}ms  "
+                f"mean={statistics.mean(latencies):6.2f}ms  peak alloc={peak / 1024:8.1f}KiB"
+            )
+
+    await fetcher.close_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,91 @@
+"""
+bench_records.py -- Memory and allocations of one product through the pipeline.
+
+For the OFF fixtures and the generated large products from bench_suite,
+runs extract_product_data → normalize → analyze → format_response →
+encoding.dumps under tracemalloc and reports, per stage, the bytes and
+blocks the stage's result keeps alive, plus the peak traced memory of
+the whole run and its time.
+
+Only the public stage functions are used, so the same script measures
+an older revision too (run it with that checkout on PYTHONPATH):
+
+    python -m benchmarks.bench_records
+    PYTHONPATH=/path/to/old/checkout python benchmarks/bench_records.py
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from benchmarks.bench_suite import _cases
+from services.analyzer import analyze
+from services.encoding import dumps
+from services.extractor import extract_product_data
+from services.formatter import format_response
+from services.normalizer import normalize
+
+_INSIGHT = {"summary": "Stub.", "key_benefits": ["a"], "key_concerns": ["b"],
+            "consumption_advice": "Stub.", "alternative_suggestions": ["c"]}
+
+_STAGES = ("extract", "normalize", "analyze", "format")
+
+
+def _traced():
+    snapshot = tracemalloc.take_snapshot()
+    stats = snapshot.statistics("filename")
+    return sum(s.size for s in stats), sum(s.count for s in stats)
+
+
+def measure(raw):
+    """{stage: (bytes, blocks)} kept alive by each stage, plus peak bytes."""
+    gc.collect()
+    tracemalloc.start()
+    base = _traced()
+    kept = []   # hold every stage result so it stays counted
+    retained = {}
+
+    def step(name, fn, *args):
+        before = _traced()
+        result = fn(*args)
+        kept.append(result)
+        after = _traced()
+        retained[name] = (after[0] - before[0], after[1] - before[1])
+        return result
+
+    tracemalloc.reset_peak()
+    extracted = step("extract", extract_product_data, raw)
+    normalized = step("normalize", normalize, extracted)
+    analyzed = step("analyze", analyze, normalized)
+    response = step("format", format_response, normalized, analyzed, _INSIGHT)
+    body = dumps(response)
+    _, peak = tracemalloc.get_traced_memory()
+    total = _traced()
+    tracemalloc.stop()
+    retained["total"] = (total[0] - base[0] - len(body), total[1] - base[1] - 1)
+    return retained, peak, len(body)
+
+
+def _time(raw, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        normalized = normalize(extract_product_data(raw))
+        dumps(format_response(normalized, analyze(normalized), ai_insights=_INSIGHT))
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+def main(args):
+    for name, raw in _cases().items():
+        retained, peak, size = measure(raw)
+        print(f"{name} (response {size:,} bytes, {_time(raw, args.repeat):.2f}ms per product)")
+        for stage in _STAGES + ("total",):
+            nbytes, blocks = retained[stage]
+            print(f"    {stage:<10} {nbytes / 1024:9.1f}KiB  {blocks:>8,} blocks")
+        print(f"    {'peak':<10} {peak / 1024:9.1f}KiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    main(parser.parse_args())
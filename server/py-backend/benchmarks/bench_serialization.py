@@ -0,0 +1,85 @@
+"""
+bench_serialization.py -- Cost of turning a product response into bytes.
+
+Builds full responses for the OFF fixtures and the generated large
+products from bench_suite, then times:
+
+  fastapi default   jsonable_encoder + stdlib JSONResponse (the old route)
+  encoder + orjson  jsonable_encoder + FastJSONResponse
+  stdlib dumps      encoding.dumps fallback, no jsonable_encoder
+  orjson dumps      encoding.dumps with orjson, no jsonable_encoder
+  pre-encoded hit   a cached Encoded body (nothing to do)
+
+    python -m benchmarks.bench_serialization --repeat 200
+"""
+
+import argparse
+import json
+import time
+from dataclasses import is_dataclass
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from benchmarks.bench_suite import _cases
+from services import encoding
+from services.analyzer import analyze
+from services.encoding import Encoded, FastJSONResponse
+from services.extractor import extract_product_data
+from services.formatter import format_response
+from services.normalizer import normalize
+from services.records import to_json
+
+_INSIGHT = {"summary": "Stub.", "key_benefits": ["a", "b"], "key_concerns": ["c"],
+            "consumption_advice": "Stub.", "alternative_suggestions": ["d", "e"]}
+
+
+def _default(value):
+    # Same as encoding's fallback, which is not defined when orjson is installed
+    if is_dataclass(value):
+        return to_json(value)
+    return str(value)
+
+
+def _stdlib_dumps(value):
+    return json.dumps(
+        value, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def _time(fn, value, repeat):
+    fn(value)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(value)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main(args):
+    methods = {"fastapi default": lambda v: JSONResponse(jsonable_encoder(v)).body}
+    if encoding.orjson is not None:
+        methods["encoder + orjson"] = lambda v: FastJSONResponse(jsonable_encoder(v)).body
+    methods["stdlib dumps"] = _stdlib_dumps
+    if encoding.orjson is not None:
+        methods["orjson dumps"] = encoding.dumps
+    else:
+        print("orjson not installed: only the stdlib paths are timed")
+
+    for name, raw in _cases().items():
+        normalized = normalize(extract_product_data(raw))
+        response = format_response(normalized, analyze(normalized), ai_insights=_INSIGHT)
+        cached = Encoded(response)
+        assert json.loads(cached.body) == json.loads(_stdlib_dumps(response))
+
+        timings = {label: _time(fn, response, args.repeat) for label, fn in methods.items()}
+        timings["pre-encoded hit"] = _time(lambda e: e.body, cached, args.repeat)
+        base = timings["fastapi default"]
+        print(f"{name} ({len(cached.body):,} bytes)")
+        for label, us in timings.items():
+            print(f"    {label:<18} {us:10.1f}us  ({base / us:7.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    main(parser.parse_args())
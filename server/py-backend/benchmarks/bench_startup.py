@@ -0,0 +1,180 @@
+"""
+bench_startup.py -- Startup time and memory per worker, by serving mode.
+
+First the cost of importing the app in a fresh interpreter, as it is now
+(OpenAI SDK imported on first use) and with the SDK imported eagerly as
+before. Then, for each mode, N workers are started on a free port against
+an OFF stand-in, sent --requests product lookups over the fixtures and
+generated products (so every worker has run the pipeline and touched the
+preloaded objects), and measured from /proc:
+
+  uvicorn   python -m uvicorn main:app --workers N (one fresh interpreter each)
+  serve     python serve.py --workers N (preloaded master, forked workers)
+
+"ready" is the time until every worker has finished its lifespan
+startup. Per worker, RSS counts shared pages in full, USS only the
+worker's private pages (what one more worker costs) and PSS splits shared
+pages between their users. "total PSS" sums PSS over every process of the
+mode, supervisor included: the memory the deployment actually takes.
+
+    python -m benchmarks.bench_startup --workers 4 --requests 400
+"""
+
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_suite import _cases
+from benchmarks.standins import OffStandin
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_IMPORT = """
+import re, sys, time
+start = time.perf_counter()
+import main
+{extra}
+elapsed = time.perf_counter() - start
+rss = int(re.search(r"VmRSS:\\s+(\\d+)", open("/proc/self/status").read()).group(1))
+print(elapsed, rss, "openai" in sys.modules)
+"""
+
+
+def _env(**extra):
+    env = dict(os.environ, PYTHONPATH=ROOT, PREFETCH="0", INSIGHT_CACHE="0")
+    env.pop("GROQ_API_KEY", None)
+    env.update(extra)
+    return env
+
+
+def import_cost(extra, repeat):
+    samples = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", _IMPORT.format(extra=extra)], cwd=ROOT,
+                             env=_env(), capture_output=True, text=True, check=True).stdout.split()
+        samples.append((float(out[0]), int(out[1]), out[2] == "True"))
+    return (statistics.median(s[0] for s in samples), statistics.median(s[1] for s in samples),
+            samples[0][2])
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _tree(pid):
+    """pid and all of its descendants."""
+    pids = [pid]
+    for p in pids:
+        for task in os.listdir(f"/proc/{p}/task"):
+            with open(f"/proc/{p}/task/{task}/children") as f:
+                pids.extend(int(c) for c in f.read().split())
+    return pids
+
+
+def _memory(pid):
+    """(rss, pss, uss) in KiB from smaps_rollup."""
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        fields = dict(re.findall(r"^(\w+):\s+(\d+) kB", f.read(), re.MULTILINE))
+    uss = int(fields["Private_Clean"]) + int(fields["Private_Dirty"])
+    return int(fields["Rss"]), int(fields["Pss"]), uss
+
+
+def _cmdline(pid):
+    with open(f"/proc/{pid}/cmdline", "rb") as f:
+        return f.read().replace(b"\0", b" ").decode()
+
+
+def run_mode(command, workers, barcodes, off_url, n_requests):
+    port = _free_port()
+    started = threading.Event()
+    ready = [0]
+
+    start = time.perf_counter()
+    proc = subprocess.Popen(command + ["--port", str(port)], cwd=ROOT, text=True,
+                            env=_env(OFF_BASE_URL=off_url),
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+    def watch():
+        for line in proc.stdout:
+            if "Application startup complete" in line:
+                ready[0] += 1
+                if ready[0] == workers:
+                    started.set()
+
+    threading.Thread(target=watch, daemon=True).start()
+    try:
+        if not started.wait(120):
+            raise RuntimeError(f"{command[1]}: only {ready[0]} of {workers} workers started")
+        ready_s = time.perf_counter() - start
+
+        url = f"http://127.0.0.1:{port}/product/"
+
+        def get(i):
+            with urllib.request.urlopen(url + barcodes[i % len(barcodes)]) as resp:
+                resp.read()
+        with ThreadPoolExecutor(workers * 2) as pool:
+            list(pool.map(get, range(n_requests)))
+        time.sleep(0.5)
+
+        pids = _tree(proc.pid)
+        usage = {pid: _memory(pid) for pid in pids}
+        # Workers are the processes running the app, not supervisors or helpers
+        worker_pids = [pid for pid in pids if pid != proc.pid and "resource_tracker" not in _cmdline(pid)]
+        per_worker = [usage[pid] for pid in worker_pids]
+        return {
+            "ready_s": ready_s,
+            "processes": len(pids),
+            "rss": statistics.mean(u[0] for u in per_worker),
+            "pss": statistics.mean(u[1] for u in per_worker),
+            "uss": statistics.mean(u[2] for u in per_worker),
+            "total_pss": sum(u[1] for u in usage.values()),
+        }
+    finally:
+        proc.terminate()
+        proc.wait(30)
+
+
+def main(args):
+    now = import_cost("", args.repeat)
+    eager = import_cost("import openai", args.repeat)
+    print(f"import main: {now[0] * 1e3:.0f}ms, RSS {now[1] / 1024:.1f}MiB (openai loaded: {now[2]})")
+    print(f"  + openai:  {eager[0] * 1e3:.0f}ms, RSS {eager[1] / 1024:.1f}MiB (import it eagerly, as before)")
+
+    cases = _cases()
+    products = {raw["code"]: raw for raw in cases.values()}
+    barcodes = list(products)
+    modes = {
+        "uvicorn": [sys.executable, "-m", "uvicorn", "main:app", "--no-access-log",
+                    "--workers", str(args.workers)],
+        "serve":   [sys.executable, "serve.py", "--no-access-log", "--workers", str(args.workers)],
+    }
+    print(f"\n{args.workers} workers, {args.requests} product requests "
+          f"({'KiB':>5} per worker)       RSS       USS       PSS   total PSS")
+    results = {}
+    with OffStandin(products=products) as off:
+        for name, command in modes.items():
+            r = results[name] = run_mode(command, args.workers, barcodes, off.base_url, args.requests)
+            print(f"  {name:<8} ready {r['ready_s']:5.2f}s  {r['processes']} processes   "
+                  f"{r['rss']:9,.0f} {r['uss']:9,.0f} {r['pss']:9,.0f} {r['total_pss']:11,.0f}")
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per import measurement")
+    parser.add_argument("--json", action="store_true", help="also print the raw numbers")
+    main(parser.parse_args())
@@ -0,0 +1,291 @@
+"""
+bench_suite.py -- Per-stage throughput/latency suite with saved, comparable results.
+
+Times extract_product_data, normalize, analyze and format_response on
+OpenFoodFacts fixtures plus generated large products, and the full
+GET /product/{barcode} route in-process (OFF served by a local stand-in,
+the LLM by FakeLLM with no latency or rate limit, caches cleared before
+every call). A "route_cached" row measures the response-cache hit path.
+
+Fixtures live in benchmarks/fixtures/off/<barcode>.json as OFF v2
+envelopes. The three shipped ones are synthetic: hand-built in the OFF v2
+shape (modelled on the test products noted in backend/app/main.py) under
+in-store GS1 "2" barcodes, and marked "synthetic": true. Their rows are
+labelled "<barcode> (synthetic)"; they are not real-product timings.
+`record` adds live responses, e.g. for those test products:
+
+    python -m benchmarks.bench_suite record 8901786060504 8906010501570 8906010500511
+    python -m benchmarks.bench_suite run --out baseline.json
+    python -m benchmarks.bench_suite run --out new.json --compare baseline.json
+    python -m benchmarks.bench_suite compare baseline.json new.json --threshold 0.15
+
+`compare` (and `run --compare`) exits with status 1 when any p50 got
+slower than the baseline by more than --threshold.
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from benchmarks.standins import FakeLLM, OffStandin
+from benchmarks.synthetic import make_product
+from services.analyzer import analyze
+from services.extractor import extract_product_data
+from services.formatter import format_response
+from services.normalizer import normalize
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "off")
+
+# name -> (n_ingredients, depth, fanout) for the generated products
+GENERATED = {
+    "generated_large":  (60, 2, 3),
+    "generated_xlarge": (400, 3, 3),
+}
+
+_INSIGHT = {"summary": "Stub.", "key_benefits": [], "key_concerns": [],
+            "consumption_advice": "Stub.", "alternative_suggestions": []}
+
+
+def _envelopes():
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.json"))):
+        with open(path, encoding="utf-8") as f:
+            yield json.load(f)
+
+
+def load_fixtures():
+    """{barcode: OFF product} for every fixture."""
+    return {envelope["code"]: envelope["product"] for envelope in _envelopes()}
+
+
+def _cases():
+    cases = {}
+    for envelope in _envelopes():
+        code = envelope["code"]
+        cases[f"{code} (synthetic)" if envelope.get("synthetic") else code] = envelope["product"]
+    for i, (name, (n, depth, fanout)) in enumerate(GENERATED.items()):
+        product = make_product(i, random.Random(i), n_ingredients=n, depth=depth, fanout=fanout)
+        product["product_name"] = name
+        cases[name] = product
+    return cases
+
+
+def _summary(samples_ns):
+    samples = sorted(samples_ns)
+    n = len(samples)
+
+    def pct(p):
+        return samples[min(n - 1, int(round(p / 100 * (n - 1))))] / 1e3
+
+    mean = sum(samples) / n / 1e3
+    return {
+        "n":        n,
+        "mean_us":  round(mean, 2),
+        "p50_us":   round(pct(50), 2),
+        "p95_us":   round(pct(95), 2),
+        "p99_us":   round(pct(99), 2),
+        "ops_per_s": round(1e6 / mean, 1),
+    }
+
+
+def _time_stage(fn, arg, min_time, min_iterations):
+    for _ in range(3):
+        fn(arg)
+    samples = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < min_iterations or time.perf_counter() < deadline:
+        start = time.perf_counter_ns()
+        fn(arg)
+        samples.append(time.perf_counter_ns() - start)
+    return samples
+
+
+def bench_stages(cases, min_time, min_iterations):
+    results = {}
+    for name, raw in cases.items():
+        extracted = extract_product_data(raw)
+        normalized = normalize(extracted)
+        analyzed = analyze(normalized)
+        stages = {
+            "extract":   (extract_product_data, raw),
+            "normalize": (normalize, extracted),
+            "analyze":   (analyze, normalized),
+            "format":    (lambda a: format_response(normalized, a, ai_insights=_INSIGHT), analyzed),
+        }
+        for stage, (fn, arg) in stages.items():
+            results[f"{name}/{stage}"] = _summary(_time_stage(fn, arg, min_time, min_iterations))
+    return results
+
+
+async def _bench_route(cases, min_time, min_iterations):
+    import httpx
+
+    import main
+    from services import ai_insights, fetcher, pipeline
+
+    barcodes = {name: raw.get("code") for name, raw in cases.items()}
+    products = {raw["code"]: raw for raw in cases.values()}
+    results = {}
+
+    with OffStandin(products=products) as off, FakeLLM(rpm=10**9, latency_ms=0, per_item_ms=0) as llm:
+        os.environ.setdefault("GROQ_API_KEY", "standin")
+        fetcher.set_mirrors([off.base_url])
+        fetcher.LOCAL_INDEX_PATH = None
+        ai_insights.LLM_BASE_URL = llm.base_url
+        ai_insights.INSIGHT_CACHE = False
+        ai_insights.LLM_BATCH = False
+        ai_insights.client = None
+
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+            async def call(barcode, cold):
+                if cold:
+                    pipeline.RAW_CACHE.clear()
+                    pipeline.RESPONSE_CACHE.clear()
+                start = time.perf_counter_ns()
+                res = await client.get(f"/product/{barcode}")
+                elapsed = time.perf_counter_ns() - start
+                res.raise_for_status()
+                return elapsed
+
+            for name, barcode in barcodes.items():
+                for label, cold in (("route", True), ("route_cached", False)):
+                    for _ in range(3):
+                        await call(barcode, cold)
+                    samples = []
+                    deadline = time.perf_counter() + min_time
+                    while len(samples) < min_iterations or time.perf_counter() < deadline:
+                        samples.append(await call(barcode, cold))
+                    results[f"{name}/{label}"] = _summary(samples)
+
+        await fetcher.close_client()
+        await ai_insights.client.close()
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_results(results):
+    for key, r in results.items():
+        print(f"{key:<36} p50={r['p50_us']:10.1f}us  p95={r['p95_us']:10.1f}us  "
+              f"p99={r['p99_us']:10.1f}us  ops/s={r['ops_per_s']:10.1f}  n={r['n']}")
+
+
+def compare(baseline, current, threshold):
+    """Print p50 changes per key; return the keys slower than `threshold` (a fraction)."""
+    regressions = []
+    for key, new in current["results"].items():
+        old = baseline["results"].get(key)
+        if old is None:
+            print(f"{key:<36} (new)")
+            continue
+        change = new["p50_us"] / old["p50_us"] - 1 if old["p50_us"] else 0.0
+        flag = "REGRESSION" if change > threshold else ""
+        if flag:
+            regressions.append(key)
+        print(f"{key:<36} p50 {old['p50_us']:10.1f}us -> {new['p50_us']:10.1f}us  {change:+7.1%}  {flag}")
+    for key in baseline["results"].keys() - current["results"].keys():
+        print(f"{key:<36} (missing from current run)")
+    return regressions
+
+
+def _load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def cmd_run(args):
+    cases = _cases()
+    results = bench_stages(cases, args.min_time, args.min_iterations)
+    if not args.skip_route:
+        results.update(asyncio.run(_bench_route(cases, args.min_time, args.min_iterations)))
+    _print_results(results)
+
+    run = {
+        "meta": {
+            "created":   datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git":       _git_revision(),
+            "python":    platform.python_version(),
+            "platform":  platform.platform(),
+            "min_time":  args.min_time,
+            "min_iterations": args.min_iterations,
+            "cases":     list(cases),
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(run, f, indent=2)
+        print(f"Saved {len(results)} results to {args.out}")
+
+    if args.compare:
+        print()
+        if compare(_load(args.compare), run, args.threshold):
+            sys.exit(1)
+
+
+def cmd_compare(args):
+    if compare(_load(args.baseline), _load(args.current), args.threshold):
+        sys.exit(1)
+
+
+async def _record(barcodes):
+    from services import fetcher
+
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    client = fetcher.get_client()
+    for barcode in barcodes:
+        res = await client.get(f"{fetcher.OPENFOODFACTS_URL}{barcode}")
+        res.raise_for_status()
+        path = os.path.join(FIXTURES_DIR, f"{barcode}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(res.json(), f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"Recorded {barcode} -> {path}")
+    await fetcher.close_client()
+
+
+def cmd_record(args):
+    asyncio.run(_record(args.barcodes))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="run the suite")
+    run.add_argument("--out", help="write results JSON here")
+    run.add_argument("--compare", metavar="BASELINE", help="compare against a saved results JSON")
+    run.add_argument("--threshold", type=float, default=0.15, help="allowed p50 slowdown (fraction)")
+    run.add_argument("--min-time", type=float, default=0.5, help="seconds per measured row")
+    run.add_argument("--min-iterations", type=int, default=50)
+    run.add_argument("--skip-route", action="store_true", help="only time the pure stages")
+    run.set_defaults(func=cmd_run)
+
+    cmp_ = sub.add_parser("compare", help="compare two saved results files")
+    cmp_.add_argument("baseline")
+    cmp_.add_argument("current")
+    cmp_.add_argument("--threshold", type=float, default=0.15)
+    cmp_.set_defaults(func=cmd_compare)
+
+    rec = sub.add_parser("record", help="capture live OFF responses as fixtures")
+    rec.add_argument("barcodes", nargs="+")
+    rec.set_defaults(func=cmd_record)
+
+    args = parser.parse_args()
+    args.func(args)
@@ -0,0 +1,129 @@
+"""
+bench_upstream.py -- Hedged requests, mirrors and the circuit breaker
+against misbehaving OpenFoodFacts stand-ins.
+
+  tail       one host, `--slow-ratio` of requests take `--slow-ms`:
+             latency percentiles with hedging off and on
+  mirror     same slow primary plus a healthy mirror to hedge to
+  outage     host times out on every request: latency per lookup with
+             the breaker effectively disabled vs enabled, then recovery
+             once the host is healthy again
+  failover   primary answers 503 on everything, mirror is healthy, with
+             hedging on and off
+
+    python -m benchmarks.bench_upstream --requests 400 --concurrency 10
+"""
+
+import argparse
+import asyncio
+import time
+
+from fastapi import HTTPException
+
+from benchmarks.standins import OffStandin
+from services import fetcher, metrics
+
+
+def _pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+async def _run(n, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+    latencies, statuses = [], {}
+
+    async def one(i):
+        async with sem:
+            start = time.perf_counter()
+            try:
+                await fetcher.fetch_product_from_api(f"{i:013d}")
+                status = 200
+            except HTTPException as e:
+                status = e.status_code
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    await asyncio.gather(*(one(i) for i in range(n)))
+    return latencies, statuses
+
+
+def _report(label, latencies, statuses):
+    hedges = {o: metrics.UPSTREAM_HEDGES.value("off", o) for o in ("sent", "won")}
+    print(
+        f"  {label:<22} p50={_pct(latencies, 50):7.1f}ms  p95={_pct(latencies, 95):7.1f}ms  "
+        f"p99={_pct(latencies, 99):7.1f}ms  max={max(latencies):7.1f}ms  "
+        f"status={statuses}  hedges={hedges}"
+    )
+    metrics.UPSTREAM_HEDGES._values.clear()
+
+
+async def _fresh(urls, hedge, breaker_failures=None):
+    await fetcher.close_client()
+    fetcher.OFF_HEDGE = hedge
+    fetcher.OFF_BREAKER_FAILURES = breaker_failures or 5
+    fetcher.set_mirrors(urls)
+    fetcher.init_client()
+
+
+async def tail(args):
+    print(f"tail: {args.slow_ratio:.0%} of requests take {args.slow_ms:.0f}ms")
+    standin = dict(latency_ms=args.latency_ms, slow_ratio=args.slow_ratio, slow_ms=args.slow_ms)
+    with OffStandin(**standin) as off, OffStandin(latency_ms=args.latency_ms) as mirror:
+        for label, urls, hedge in (("no hedging", [off.base_url], False),
+                                   ("hedge to same host", [off.base_url], True),
+                                   ("hedge to mirror", [off.base_url, mirror.base_url], True)):
+            await _fresh(urls, hedge)
+            await _run(50, args.concurrency)   # fill the latency window
+            metrics.UPSTREAM_HEDGES._values.clear()
+            _report(label, *await _run(args.requests, args.concurrency))
+
+
+async def outage(args):
+    print(f"outage: every request outlasts the {fetcher.OFF_READ_TIMEOUT:.1f}s read timeout")
+    with OffStandin(latency_ms=args.latency_ms, slow_ratio=1.0,
+                    slow_ms=fetcher.OFF_READ_TIMEOUT * 1000 + 500) as off:
+        for label, failures in (("breaker disabled", 10**9), ("breaker enabled", None)):
+            await _fresh([off.base_url], True, failures)
+            _report(label, *await _run(args.outage_requests, 4))
+
+        off.slow_ratio = 0.0
+        await asyncio.sleep(fetcher.OFF_BREAKER_COOLDOWN)
+        _report("recovery probe", *await _run(1, 1))
+        _report("after recovery", *await _run(args.outage_requests, 4))
+        print(f"  breaker: {fetcher.get_mirrors()[0].breaker.stats()}")
+
+
+async def failover(args):
+    print("failover: primary answers 503, mirror is healthy")
+    for label, hedge in (("hedging on", True), ("hedging off", False)):
+        with OffStandin(error_ratio=1.0) as off, OffStandin(latency_ms=args.latency_ms) as mirror:
+            await _fresh([off.base_url, mirror.base_url], hedge)
+            metrics.UPSTREAM_FAILOVERS._values.clear()
+            _report(label, *await _run(args.requests, args.concurrency))
+            print(f"  primary requests={off.requests}  mirror requests={mirror.requests}  "
+                  f"failovers={metrics.UPSTREAM_FAILOVERS.value('off')}")
+
+
+async def main(args):
+    fetcher.LOCAL_INDEX_PATH = None
+    fetcher.OFF_READ_TIMEOUT = args.timeout
+    fetcher.OFF_BREAKER_COOLDOWN = args.cooldown
+    await tail(args)
+    await outage(args)
+    await failover(args)
+    await fetcher.close_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=15.0)
+    parser.add_argument("--slow-ratio", type=float, default=0.05)
+    parser.add_argument("--slow-ms", type=float, default=600.0)
+    parser.add_argument("--timeout", type=float, default=1.0,
+                        help="OFF read timeout (s); keep it above --slow-ms")
+    parser.add_argument("--cooldown", type=float, default=2.0, help="breaker cooldown (s)")
+    parser.add_argument("--outage-requests", type=int, default=40)
+    asyncio.run(main(parser.parse_args()))
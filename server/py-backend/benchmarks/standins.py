@@ -0,0 +1,241 @@
+"""
+standins.py -- Local stand-in servers for benchmarks (no network needed).
+
+OffStandin mimics the OpenFoodFacts v2 product endpoint. It serves the
+same product payload for every barcode, or per-barcode payloads from a
+`products` mapping, and honours the `fields=` projection parameter.
+`handshake_ms` is slept once per new TCP connection to emulate the
+TCP+TLS setup cost of the real host. `slow_ratio` of the requests take
+`slow_ms` instead of `latency_ms` and `error_ratio` of them answer
+`error_status`, to emulate an unhealthy host; both can be changed while
+the server runs.
+
+FakeLLM mimics an OpenAI-compatible /v1/chat/completions endpoint with a
+requests-per-minute limit, answering both single and batched insight
+prompts.
+"""
+
+import json
+import random
+import re
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+SAMPLE_PRODUCT = {
+    "code": "0000000000000",
+    "product_name": "Stand-in crisps",
+    "brands": "Bench",
+    "nutrition_data_per": "100g",
+    "nutriments": {
+        "energy-kcal": 536, "fat": 34, "saturated-fat": 14.5,
+        "carbohydrates": 53, "sugars": 2.4, "fiber": 3.1,
+        "proteins": 6.2, "salt": 1.8,
+    },
+    "ingredients_text": "Potato, palmolein oil, salt, spices, flavour enhancer (e621)",
+    "ingredients": [
+        {"id": "en:potato", "text": "Potato", "percent_estimate": 62},
+        {"id": "en:palm-olein", "text": "palmolein oil", "percent_estimate": 30,
+         "from_palm_oil": "yes"},
+        {"id": "en:salt", "text": "salt", "percent_estimate": 2},
+        {"id": "en:spice", "text": "spices", "percent_estimate": 5},
+        {"id": "en:e621", "text": "e621", "percent_estimate": 1},
+    ],
+    "additives_tags": ["en:e621"],
+    "nova_group": 4,
+    "serving_size": "30 g",
+}
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def handle_error(self, request, client_address):
+        # Clients hang up on purpose (cancelled hedges, timeouts): not an error
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class OffStandin:
+    """Threaded HTTP server on 127.0.0.1 serving /api/v2/product/<barcode>."""
+
+    def __init__(self, product=None, handshake_ms=0.0, latency_ms=0.0, products=None,
+                 slow_ratio=0.0, slow_ms=0.0, error_ratio=0.0, error_status=503, seed=0):
+        self.product = product or SAMPLE_PRODUCT
+        self.products = products or {}
+        self.handshake_ms = handshake_ms
+        self.latency_ms = latency_ms
+        self.slow_ratio = slow_ratio
+        self.slow_ms = slow_ms
+        self.error_ratio = error_ratio
+        self.error_status = error_status
+        self._rng = random.Random(seed)
+        self.connections = 0
+        self.requests = 0
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/v2/product/"
+
+    def _handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out as separate writes; without this,
+            # Nagle + delayed ACK adds ~40ms to every keep-alive response
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                standin.connections += 1
+                if standin.handshake_ms:
+                    time.sleep(standin.handshake_ms / 1000)
+
+            def do_GET(self):
+                standin.requests += 1
+                slow = standin.slow_ratio and standin._rng.random() < standin.slow_ratio
+                delay_ms = standin.slow_ms if slow else standin.latency_ms
+                if delay_ms:
+                    time.sleep(delay_ms / 1000)
+                if standin.error_ratio and standin._rng.random() < standin.error_ratio:
+                    self.send_response(standin.error_status)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                url = urlsplit(self.path)
+                code = url.path.rstrip("/").rsplit("/", 1)[-1]
+                product = standin.products.get(code) or dict(standin.product, code=code)
+                fields = parse_qs(url.query).get("fields")
+                if fields:
+                    keep = fields[0].split(",")
+                    product = {k: product[k] for k in keep if k in product}
+                body = json.dumps({"status": 1, "code": code, "product": product}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._server = _Server(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+_INSIGHT = {
+    "summary": "Stand-in summary.",
+    "key_benefits": ["Stand-in benefit"],
+    "key_concerns": ["Stand-in concern"],
+    "consumption_advice": "Stand-in advice.",
+    "alternative_suggestions": ["Alternative A", "Alternative B"],
+}
+
+
+class FakeLLM:
+    """
+    Threaded OpenAI-compatible chat endpoint on 127.0.0.1.
+    Answers 429 beyond `rpm` requests per rolling minute; each call takes
+    `latency_ms` plus `per_item_ms` per product in a batched prompt.
+    """
+
+    def __init__(self, rpm=30, latency_ms=400.0, per_item_ms=60.0, malformed=False):
+        self.rpm = rpm
+        self.latency_ms = latency_ms
+        self.per_item_ms = per_item_ms
+        self.malformed = malformed
+        self.requests = 0
+        self.rate_limited = 0
+        self._window = deque()
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _admit(self):
+        now = time.monotonic()
+        with self._lock:
+            self.requests += 1
+            while self._window and now - self._window[0] > 60:
+                self._window.popleft()
+            if len(self._window) >= self.rpm:
+                self.rate_limited += 1
+                return False
+            self._window.append(now)
+            return True
+
+    def _answer(self, prompt):
+        ids = [int(i) for i in re.findall(r"^### Product (\d+)$", prompt, re.MULTILINE)]
+        time.sleep((self.latency_ms + self.per_item_ms * max(1, len(ids))) / 1000)
+        if not ids:
+            return json.dumps(_INSIGHT)
+        if self.malformed:
+            return json.dumps({"results": [_INSIGHT]})
+        return json.dumps({"results": [dict(_INSIGHT, id=i) for i in ids]})
+
+    def _handler(self):
+        llm = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out as separate writes; without this,
+            # Nagle + delayed ACK adds ~40ms to every keep-alive response
+            disable_nagle_algorithm = True
+
+            def _send(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                if not llm._admit():
+                    self._send(429, {"error": {"message": "Rate limit reached for requests per minute",
+                                               "type": "requests", "code": "rate_limit_exceeded"}})
+                    return
+                content = llm._answer(req["messages"][-1]["content"])
+                self._send(200, {
+                    "id": "chatcmpl-standin", "object": "chat.completion", "created": int(time.time()),
+                    "model": req.get("model"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                })
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._server = _Server(("127.0.0.1", 0), self._handler())
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,124 @@
+"""
+synthetic.py -- Generate OpenFoodFacts-shaped products and JSONL dumps.
+
+Products are random but deterministic for a given seed, and cover the
+fields extract_product_data reads (nutriments, nested ingredients,
+additives, labels, NOVA, completeness, ...). Missing values are mixed in
+so every branch of the analyzer gets exercised.
+
+    python -m benchmarks.synthetic dump.jsonl.gz --count 10000
+"""
+
+import argparse
+import gzip
+import json
+import random
+
+_INGREDIENTS = [
+    "sugar", "wheat flour", "palm oil", "salt", "milk powder", "cocoa butter",
+    "soy lecithin", "rice", "potato", "sunflower oil", "tomato", "onion",
+    "garlic", "spices", "whey", "egg", "peanut", "sesame seeds", "maize starch",
+    "dextrose", "glucose syrup", "yeast", "vinegar", "water", "almond",
+]
+_ADDITIVES = ["e100", "e150d", "e202", "e211", "e322", "e330", "e407", "e471",
+              "e500", "e621", "e627", "e631", "e951", "e999"]
+_LABELS = ["en:organic", "en:vegan", "en:fair-trade", "en:no-preservatives",
+           "en:gluten-free", "en:green-dot"]
+_CATEGORIES = ["en:snacks", "en:beverages", "en:biscuits", "en:condiments",
+               "en:spices", "en:breakfast-cereals", "en:dairies"]
+
+
+def _maybe(rng, value, p_missing=0.15):
+    return None if rng.random() < p_missing else value
+
+
+def _ingredient(rng, depth, fanout):
+    name = rng.choice(_INGREDIENTS)
+    ing = {
+        "id": f"en:{name.replace(' ', '-')}",
+        "text": name,
+        "percent_estimate": round(rng.uniform(0, 40), 2),
+        "percent_min": 0,
+        "percent_max": 100,
+        "vegan": rng.choice(["yes", "no", "maybe"]),
+        "vegetarian": rng.choice(["yes", "no"]),
+        "is_in_taxonomy": 1,
+    }
+    if "palm" in name:
+        ing["from_palm_oil"] = "yes"
+    if depth > 0:
+        ing["ingredients"] = [_ingredient(rng, depth - 1, fanout) for _ in range(fanout)]
+    return ing
+
+
+def make_product(i, rng=None, n_ingredients=None, depth=1, fanout=2):
+    """One OFF-like product document with barcode derived from `i`."""
+    rng = rng or random.Random(i)
+    n_ingredients = n_ingredients if n_ingredients is not None else rng.randint(1, 25)
+
+    ingredients = [
+        _ingredient(rng, depth if rng.random() < 0.2 else 0, fanout)
+        for _ in range(n_ingredients)
+    ]
+    additives = rng.sample(_ADDITIVES, rng.randint(0, 5))
+    for code in additives[:2]:
+        ingredients.append({"id": f"en:{code}", "text": code.upper(), "percent_estimate": 0.1})
+
+    nutriments = {
+        "energy-kcal": _maybe(rng, round(rng.uniform(0, 650), 1)),
+        "fat": _maybe(rng, round(rng.uniform(0, 40), 2)),
+        "saturated-fat": _maybe(rng, round(rng.uniform(0, 20), 2)),
+        "carbohydrates": _maybe(rng, round(rng.uniform(0, 90), 2)),
+        "sugars": _maybe(rng, round(rng.uniform(0, 40), 2)),
+        "fiber": _maybe(rng, round(rng.uniform(0, 12), 2)),
+        "proteins": _maybe(rng, round(rng.uniform(0, 30), 2)),
+        "salt": _maybe(rng, round(rng.uniform(0, 12), 3)),
+        "cholesterol": _maybe(rng, round(rng.uniform(0, 0.3), 3), p_missing=0.7),
+    }
+    if rng.random() < 0.1:
+        nutriments["sodium"] = round(rng.uniform(0, 2), 3)
+        nutriments["salt"] = None
+
+    return {
+        "code": f"{2000000000000 + i:013d}",
+        "product_name": f"Synthetic product {i}",
+        "brands": rng.choice(["Acme", "Bench", "Foodco", ""]),
+        "image_url": f"https://images.example/{i}.jpg",
+        "quantity": f"{rng.choice([30, 100, 200, 500])} g",
+        "categories_tags": rng.sample(_CATEGORIES, rng.randint(0, 3)),
+        "nutrition_data_per": "100g" if rng.random() < 0.9 else "serving",
+        "nutriments": {k: v for k, v in nutriments.items() if v is not None},
+        "ingredients_text": ", ".join(i["text"] for i in ingredients),
+        "ingredients": ingredients,
+        "additives_tags": [f"en:{a}" for a in additives],
+        "allergens_tags": rng.sample(["en:milk", "en:gluten", "en:soybeans"], rng.randint(0, 2)),
+        "traces_tags": rng.sample(["en:nuts", "en:peanuts", "en:sesame-seeds"], rng.randint(0, 2)),
+        "serving_size": _maybe(rng, f"{rng.randint(10, 250)} g", p_missing=0.3),
+        "nutriscore_grade": rng.choice(["a", "b", "c", "d", "e", "unknown"]),
+        "nova_group": rng.choice([1, 2, 3, 4, None]),
+        "labels_tags": rng.sample(_LABELS, rng.randint(0, 3)),
+        "completeness": _maybe(rng, round(rng.uniform(0.1, 1.0), 4), p_missing=0.3),
+        "ecoscore_grade": rng.choice(["a", "b", "c", "d", "unknown"]),
+        "packaging_materials_tags": ["en:plastic"],
+        "countries_tags": ["en:india"],
+        "last_modified_t": 1700000000 + i,
+    }
+
+
+def write_dump(path, count, seed=0):
+    """Write `count` products as JSONL (gzip-compressed if path ends in .gz)."""
+    opener = gzip.open if str(path).endswith(".gz") else open
+    rng = random.Random(seed)
+    with opener(path, "wt", encoding="utf-8") as f:
+        for i in range(count):
+            f.write(json.dumps(make_product(i, rng)))
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_dump(args.path, args.count, args.seed)
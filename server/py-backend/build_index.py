@@ -0,0 +1,39 @@
+"""
+build_index.py -- Build the local barcode index from an OpenFoodFacts dump.
+
+    python build_index.py openfoodfacts-products.jsonl.gz --out data/products
+
+Writes data/products.keys and data/products.data. Point LOCAL_INDEX_PATH
+at the same base path to make the fetcher consult it before OFF.
+Products are stored projected to the extractor's OFF_FIELDS unless
+--all-fields is given.
+"""
+
+import argparse
+import time
+
+from services.dump import iter_dump_products
+from services.extractor import project
+from services.local_index import build_index, DEFAULT_KEY_WIDTH
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dump", help="OpenFoodFacts JSONL export (.jsonl or .jsonl.gz)")
+    parser.add_argument("--out", required=True, help="index base path (without extension)")
+    parser.add_argument("--key-width", type=int, default=DEFAULT_KEY_WIDTH)
+    parser.add_argument("--level", type=int, default=6, help="zlib compression level")
+    parser.add_argument("--all-fields", action="store_true", help="store whole documents, not OFF_FIELDS")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    products = (p for _, p in iter_dump_products(args.dump))
+    if not args.all_fields:
+        products = map(project, products)
+    entries, skipped = build_index(products, args.out, key_width=args.key_width, level=args.level)
+    elapsed = time.perf_counter() - start
+    print(f"Indexed {entries:,} products ({skipped:,} skipped) in {elapsed:.1f}s -> {args.out}.keys/.data")
+
+
+if __name__ == "__main__":
+    main()
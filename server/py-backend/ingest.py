@@ -0,0 +1,151 @@
+"""
+ingest.py -- Offline bulk analysis of an OpenFoodFacts JSONL(.gz) dump.
+
+Streams the dump line by line, runs every product through
+extract_product_data → normalize → analyze → format_response on a
+process pool and writes the results to a local SQLite store. A checkpoint
+is written after every committed batch, so an interrupted run picks up
+where it stopped when started again with the same arguments.
+
+    python ingest.py openfoodfacts-products.jsonl.gz --store products.sqlite --workers 8
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+
+from services.dump import iter_dump_lines
+from services.product_store import ProductStore
+from services.extractor import extract_product_data
+from services.normalizer import normalize
+from services.analyzer import analyze
+from services.formatter import format_response
+from services.encoding import dumps
+
+
+def analyze_line(line):
+    """Worker: raw dump line → (barcode, response_json), or (None, None) to skip."""
+    line = line.strip()
+    if not line:
+        return None, None
+    try:
+        raw = json.loads(line)
+        if not isinstance(raw, dict) or not raw.get("code"):
+            return None, None
+        normalized = normalize(extract_product_data(raw))
+        final = format_response(normalized, analyze(normalized), ai_insights=None)
+    except Exception:
+        return None, None
+    return final["barcode"], dumps(final).decode("utf-8")
+
+
+def load_checkpoint(path, dump):
+    try:
+        with open(path, encoding="utf-8") as f:
+            cp = json.load(f)
+    except (OSError, ValueError):
+        return {"lines": 0, "stored": 0, "skipped": 0}
+    if cp.get("dump") != os.path.abspath(dump):
+        raise SystemExit(f"Checkpoint {path} belongs to {cp.get('dump')}, not {dump}")
+    return cp
+
+
+def save_checkpoint(path, dump, lines, stored, skipped):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({
+            "dump":    os.path.abspath(dump),
+            "lines":   lines,
+            "stored":  stored,
+            "skipped": skipped,
+        }, f)
+    os.replace(tmp, path)
+
+
+def _batches(lines, size):
+    while True:
+        batch = list(islice(lines, size))
+        if not batch:
+            return
+        yield batch[-1][0], [line for _, line in batch]
+
+
+def run(args):
+    checkpoint_path = args.checkpoint or f"{args.store}.checkpoint.json"
+    cp = load_checkpoint(checkpoint_path, args.dump)
+    lines_done, stored, skipped = cp["lines"], cp["stored"], cp["skipped"]
+    if lines_done:
+        print(f"Resuming after line {lines_done:,} ({stored:,} products already stored)")
+
+    store = ProductStore(args.store)
+    lines = iter_dump_lines(args.dump, skip=lines_done)
+    if args.limit:
+        lines = islice(lines, args.limit)
+
+    start = time.perf_counter()
+    last_report = start
+    processed = 0
+
+    def commit(last_line, results):
+        nonlocal lines_done, stored, skipped, processed
+        rows = [r for r in results if r[0] is not None]
+        store.put_many(rows)
+        stored += len(rows)
+        skipped += len(results) - len(rows)
+        processed += len(results)
+        lines_done = last_line
+        save_checkpoint(checkpoint_path, args.dump, lines_done, stored, skipped)
+
+    # Two batches in flight: the pool works on the next one while the
+    # parent writes the previous one, and memory stays bounded.
+    pending = deque()
+    with Pool(args.workers) as pool:
+        try:
+            for last_line, batch in _batches(lines, args.batch_size):
+                pending.append((last_line, pool.map_async(analyze_line, batch, args.chunk_size)))
+                if len(pending) >= 2:
+                    last, res = pending.popleft()
+                    commit(last, res.get())
+
+                now = time.perf_counter()
+                if now - last_report >= args.report_every:
+                    last_report = now
+                    _report(processed, now - start, args.workers, lines_done)
+            while pending:
+                last, res = pending.popleft()
+                commit(last, res.get())
+        except KeyboardInterrupt:
+            print(f"\nInterrupted; checkpoint kept at line {lines_done:,}")
+            pool.terminate()
+            store.close()
+            return
+
+    _report(processed, time.perf_counter() - start, args.workers, lines_done)
+    print(f"Done: {stored:,} products stored, {skipped:,} lines skipped -> {args.store}")
+    store.close()
+
+
+def _report(processed, elapsed, workers, line):
+    rate = processed / elapsed if elapsed else 0.0
+    print(
+        f"line {line:>12,}  {processed:>10,} products  "
+        f"{rate:9.1f}/s  {rate / workers:8.1f}/s/core",
+        flush=True,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dump", help="OpenFoodFacts JSONL export (.jsonl or .jsonl.gz)")
+    parser.add_argument("--store", default="products.sqlite", help="SQLite output file")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: <store>.checkpoint.json)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=5000, help="lines per committed batch")
+    parser.add_argument("--chunk-size", type=int, default=100, help="lines per worker task")
+    parser.add_argument("--limit", type=int, default=0, help="stop after this many lines (0 = all)")
+    parser.add_argument("--report-every", type=float, default=10.0, help="seconds between progress lines")
+    run(parser.parse_args())
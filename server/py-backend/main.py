@@ -1,31 +1,188 @@
+import asyncio
+import hmac
 import json
 import os
+import time
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
 load_dotenv()
-from fastapi import FastAPI
-from services.fetcher import fetch_product_from_api
-from services.extractor import extract_product_data
-from services.normalizer import normalize
-from services.analyzer import analyze
-from services.formatter import format_response
-from services.ai_insights import generate_insights
+from fastapi import FastAPI, Header, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from services import fetcher
+from services import pipeline
+from services import scoring
+from services import ai_insights
+from services import metrics
+from services import prefetch
+from services.additive_kb import ADDITIVES
+from services.analyzer import analysis_version
+from services.encoding import FastJSONResponse, RawJSONResponse, dumps
+from services.formatter import select_sections
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled OpenFoodFacts client per worker, reused across requests
+    fetcher.init_client()
+    fetcher.get_local_index()
+    await asyncio.to_thread(ai_insights.open_store)
+    ADDITIVES.start_watching()
+    prefetcher = prefetch.get_prefetcher()
+    if prefetcher is not None:
+        prefetcher.start()
+    yield
+    if prefetcher is not None:
+        await prefetcher.stop()
+    await ADDITIVES.stop_watching()
+    await fetcher.close_client()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+
+# Shared secret for /admin routes (X-Admin-Token); unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+
+class BatchRequest(BaseModel):
+    barcodes: list[str] = Field(min_length=1, max_length=BATCH_MAX_ITEMS)
+    fields: str | None = None
+    compact: bool = False
+
+
+def _sections(fields, compact):
+    try:
+        return select_sections(fields, compact)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
 @app.get("/")
 def home():
     return {"message": "Food Analyzer running"}
 
 @app.get("/product/{barcode}")
-async def get_product(barcode: str, debug: bool = False):
+async def get_product(
+    barcode: str,
+    debug: bool = False,
+    fields: str | None = None,
+    compact: bool = False,
+    if_none_match: str | None = Header(default=None),
+):
+    sections = _sections(fields, compact)
+    start = time.perf_counter()
+    timings = metrics.begin_request()
+    body = etag = None
+    try:
+        if debug:
+            # Full, unprojected upstream document; bypasses the caches
+            body = dumps(await fetcher.fetch_product_from_api(barcode, all_fields=True))
+        else:
+            if if_none_match:
+                # Revalidation: answer from the ETag alone when it still matches
+                etag = await pipeline.current_etag(barcode, sections)
+                if etag is not None and not pipeline.etag_matches(if_none_match, etag):
+                    etag = None
+                metrics.CACHE_REQUESTS.inc("conditional", "modified" if etag is None else "not_modified")
+            if etag is None:
+                entry = await pipeline.get_product_entry(barcode, sections)
+                etag, body = pipeline.etag_for(entry, sections), entry.body
+    finally:
+        total = time.perf_counter() - start
+        metrics.REQUEST_DURATION.observe(total, "/product")
+
+    headers = {"Server-Timing": metrics.server_timing(timings, total)}
+    if etag is not None:
+        headers["ETag"] = etag
+    if body is None:
+        return Response(status_code=304, headers=headers)
+    return RawJSONResponse(body, headers=headers)
+
+
+@app.get("/product/{barcode}/stream")
+async def stream_product(
+    barcode: str,
+    request: Request,
+    fields: str | None = None,
+    compact: bool = False,
+):
+    """
+    Progressive variant of /product: an "analysis" event with everything
+    but ai_insights as soon as it is ready, then an "insights" event.
+    Server-Sent Events when the client accepts text/event-stream,
+    otherwise NDJSON lines of {"event": ..., "data": ...}.
+    """
+    sections = _sections(fields, compact)
+    events = pipeline.stream_product(barcode, sections)
+    # Run up to the first event here so fetch errors still map to 404/502
+    first = await anext(events)
+    sse = "text/event-stream" in request.headers.get("accept", "")
+
+    def encode(event, entry):
+        if sse:
+            return b"event: " + event.encode() + b"\ndata: " + entry.body + b"\n\n"
+        return b'{"event":"' + event.encode() + b'","data":' + entry.body + b"}\n"
+
+    async def body():
+        try:
+            yield encode(*first)
+            async for event, entry in events:
+                yield encode(event, entry)
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/products/batch")
+async def get_products_batch(req: BatchRequest):
+    sections = _sections(req.fields, req.compact)
+    return StreamingResponse(
+        pipeline.stream_batch(req.barcodes, sections=sections),
+        media_type="application/x-ndjson",
+    )
+
+
+@app.get("/stats")
+def stats():
+    store = ai_insights.get_store()
+    return {
+        "cache":        pipeline.cache_stats(),
+        "singleflight": pipeline.singleflight_stats(),
+        "upstream":     fetcher.upstream_stats(),
+        "scoring":      scoring.rule_stats(),
+        "analysis_version": analysis_version(),
+        "additives":    ADDITIVES.stats(),
+        "insight_cache": store.stats() if store is not None else None,
+        "insight_batching": ai_insights.get_batcher().stats() if ai_insights.LLM_BATCH else None,
+        "prefetch":     prefetch.get_prefetcher().stats() if prefetch.PREFETCH else None,
+    }
+
 
-    raw = await fetch_product_from_api(barcode)
-    extracted = extract_product_data(raw)
-    normalized = normalize(extracted)
-    analyzed = analyze(normalized)
-    insights = generate_insights(normalized, analyzed)
+@app.post("/admin/additives/reload")
+async def reload_additives(x_admin_token: str | None = Header(default=None)):
+    """Swap in the additive knowledge base from disk (this worker only)."""
+    if not ADMIN_TOKEN or not hmac.compare_digest((x_admin_token or "").encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    previous = ADDITIVES.kb.version
+    try:
+        kb = await ADDITIVES.reload_async()
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"Knowledge base not reloaded: {e}")
+    return {
+        "previous_version": previous,
+        "version":          kb.version,
+        "entries":          len(kb),
+        "analysis_version": analysis_version(),
+    }
 
-    final = format_response(normalized, analyzed, ai_insights=insights)
 
-    return final
\ No newline at end of file
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
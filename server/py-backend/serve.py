@@ -0,0 +1,199 @@
+"""
+serve.py -- Production launcher: preload the app once, fork the workers.
+
+    python serve.py --workers 4 --host 0.0.0.0 --port 8000
+
+`uvicorn --workers N` starts every worker as a fresh interpreter, so each
+one re-imports FastAPI and the services, re-parses additives.json and
+allergens.json and builds its own copy of every table. Here the master
+process imports main (app, additive knowledge base, allergen matcher,
+scoring rules) and uvicorn, opens the local index, builds the TLS
+context for OFF, binds the socket, then forks the workers. They start
+with those pages already in memory and share them copy-on-write.
+gc.freeze() moves everything preloaded out of the collector's view, so
+collections in a worker never write to (and so never copy) the shared
+objects.
+
+Anything that owns a connection, thread or task is still per worker and
+created after the fork by the app's lifespan hook: the OFF client, the
+additive file watcher, the insight store and the OpenAI client (which is
+only imported once a worker needs it). Caches, /stats and /metrics are
+per worker too. A POST /admin/additives/reload only reaches one worker;
+the file watcher picks the change up in all of them. Only worker 0 runs
+the prefetcher, so the OFF budget and the hot list are not multiplied by
+the number of workers.
+
+The master restarts workers that die, and on SIGTERM/SIGINT passes
+SIGTERM on and waits up to --graceful-timeout for in-flight requests
+before killing what is left.
+"""
+
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+log = logging.getLogger("serve")
+
+# A worker that dies sooner than this after starting is restarted only after the same delay
+_MIN_LIFETIME = 1.0
+
+
+def preload(args):
+    """
+    Import the app, build its read-only state and load the uvicorn config
+    (server, protocol and event-loop modules) in this (master) process.
+    """
+    # No collections while importing: a collection here only dirties pages before they are shared
+    gc.disable()
+    # httpx imports its transport (httpcore) only when the first client is built
+    import httpcore  # noqa: F401
+    import uvicorn
+    import main
+    from services import fetcher
+    fetcher.get_local_index()
+    fetcher.ssl_context()
+
+    config = uvicorn.Config(
+        main.app,
+        log_level=args.log_level,
+        access_log=not args.no_access_log,
+        timeout_graceful_shutdown=args.graceful_timeout,
+    )
+    config.load()
+    gc.collect()
+    gc.freeze()
+    return config
+
+
+def bind(host, port, backlog):
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(config, sock, index):
+    """Body of a forked worker: serve on the inherited socket until told to stop."""
+    import uvicorn
+    from services import prefetch
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    gc.enable()
+    if index != 0:
+        prefetch.PREFETCH = False
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def spawn(config, sock, index):
+    pid = os.fork()
+    if pid:
+        return pid
+    status = 0
+    try:
+        run_worker(config, sock, index)
+    except BaseException:
+        log.exception("Worker %d crashed", index)
+        status = 1
+    finally:
+        logging.shutdown()
+        os._exit(status)
+
+
+class Master:
+
+    def __init__(self, config, sock, args):
+        self.config = config
+        self.sock = sock
+        self.args = args
+        self.workers = {}       # pid -> (index, started)
+        self.stopping = None    # monotonic time shutdown began
+
+    def start(self, index):
+        pid = spawn(self.config, self.sock, index)
+        self.workers[pid] = (index, time.monotonic())
+        log.info("Started worker %d (pid %d)", index, pid)
+
+    def stop(self, signum, frame):
+        if self.stopping is None:
+            log.info("Shutting down %d workers", len(self.workers))
+            self.stopping = time.monotonic()
+        for pid in self.workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _reap(self):
+        """Collect exited workers; returns [(index, lifetime)]."""
+        exited = []
+        while self.workers:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                break
+            index, started = self.workers.pop(pid)
+            lifetime = time.monotonic() - started
+            if self.stopping is None:
+                log.warning("Worker %d (pid %d) exited with status %d after %.1fs",
+                            index, pid, os.waitstatus_to_exitcode(status), lifetime)
+            exited.append((index, lifetime))
+        return exited
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for index in range(self.args.workers):
+            self.start(index)
+
+        restarts = {}           # index -> monotonic time it may be restarted
+        killed = False
+        while self.workers or (self.stopping is None and restarts):
+            time.sleep(0.1)
+            for index, lifetime in self._reap():
+                if self.stopping is None:
+                    restarts[index] = time.monotonic() + (_MIN_LIFETIME if lifetime < _MIN_LIFETIME else 0)
+            if self.stopping is None:
+                now = time.monotonic()
+                for index, at in list(restarts.items()):
+                    if at <= now:
+                        del restarts[index]
+                        self.start(index)
+            elif not killed and time.monotonic() - self.stopping > self.args.graceful_timeout + 5:
+                for pid in self.workers:
+                    log.warning("Killing worker pid %d", pid)
+                    os.kill(pid, signal.SIGKILL)
+                killed = True
+        self.sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--graceful-timeout", type=float, default=30,
+                        help="seconds a stopping worker may spend finishing requests")
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--no-access-log", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s [serve] %(message)s")
+    start = time.perf_counter()
+    config = preload(args)
+    sock = bind(args.host, args.port, args.backlog)
+    log.info("Preloaded in %.2fs, listening on %s:%d with %d workers",
+             time.perf_counter() - start, args.host, args.port, args.workers)
+    Master(config, sock, args).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
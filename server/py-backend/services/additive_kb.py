@@ -0,0 +1,233 @@
+"""
+additive_kb.py -- Indexed additive knowledge base with atomic hot reload.
+
+data/additives.json maps E-numbers to {name, category, risk, explanation}.
+Keys may be written any way OFF or a person writes them ("E150d",
+"e-150d", "E 322 (i)", "en:e330"). An entry may also list sub-entries
+under "sub" ({"i": {...}, "ii": {...}}), which inherit whatever fields
+they do not set from their parent.
+
+Everything is canonicalized once into an immutable KnowledgeBase
+("E150D", "E322I", ...). lookup() canonicalizes the code it is given and
+falls back from a sub-entry to its parent (E322III -> E322, E150E ->
+E150), so variants and sub-entries missing from the file still find
+their family's data.
+
+ADDITIVES holds the current KnowledgeBase. A reload builds a new one
+(off the event loop) and swaps it in with a single reference assignment.
+An analysis reads ADDITIVES.kb once, so it never mixes two versions and
+in-flight requests are never blocked. A file that fails to parse leaves
+the current one in place. Reloads come from the file watcher (every
+worker polls the file's mtime) or POST /admin/additives/reload (only the
+worker that receives it). Each KnowledgeBase has a content `version`,
+which is part of analyzer.analysis_version() and hence of every
+response ETag.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+log = logging.getLogger(__name__)
+
+ADDITIVES_PATH = os.getenv(
+    "ADDITIVES_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "data", "additives.json"),
+)
+# Seconds between checks of the file for changes; 0 disables the watcher
+ADDITIVES_WATCH_INTERVAL = float(os.getenv("ADDITIVES_WATCH_INTERVAL", "5"))
+
+# "en:e150d", "E 150 d", "e-322(ii)", "E1422" -> number, letter, roman numeral
+_CODE = re.compile(
+    r"^(?:en:)?e[\s._-]*(\d{3,4})[\s._-]*\(?([a-h])?\)?[\s._-]*\(?([iv]{1,4})?\)?$",
+    re.IGNORECASE,
+)
+
+_FIELDS = ("name", "category", "risk", "explanation")
+
+
+@lru_cache(maxsize=8192)
+def canonical_code(code):
+    """Canonical E-number ("E150D", "E322II"), or None if `code` is not one."""
+    m = _CODE.match((code or "").strip())
+    if m is None:
+        return None
+    number, letter, roman = m.groups()
+    return f"E{int(number)}{(letter or '').upper()}{(roman or '').upper()}"
+
+
+_CANONICAL = re.compile(r"^(E\d+)([A-H]?)([IV]*)$")
+
+
+def _parents(code):
+    """Broader forms of a canonical code: E160AII -> E160A -> E160."""
+    number, letter, roman = _CANONICAL.match(code).groups()
+    if roman:
+        yield number + letter
+    if letter:
+        yield number
+
+
+@dataclass(frozen=True, slots=True)
+class AdditiveEntry:
+    code: str
+    name: str
+    category: str
+    risk: str
+    explanation: str
+
+
+class KnowledgeBase:
+    """Immutable index of canonical code -> AdditiveEntry."""
+
+    def __init__(self, table, source=None):
+        self.source = source
+        self.entries = {}
+        for key, spec in table.items():
+            self._add(key, spec, {})
+        payload = json.dumps(
+            sorted((e.code,) + tuple(getattr(e, f) for f in _FIELDS) for e in self.entries.values()),
+        )
+        self.version = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:12]
+
+    def _add(self, key, spec, inherited):
+        code = canonical_code(key)
+        if code is None:
+            raise ValueError(f"Not an E-number: {key!r}")
+        fields = dict(inherited)
+        fields.update({f: spec[f] for f in _FIELDS if spec.get(f) is not None})
+        if code in self.entries:
+            raise ValueError(f"Duplicate additive {code} (from {key!r})")
+        self.entries[code] = AdditiveEntry(
+            code=code,
+            name=fields.get("name", code),
+            category=fields.get("category", "Unknown"),
+            risk=fields.get("risk", "unknown"),
+            explanation=fields.get("explanation", "No safety data available."),
+        )
+        for suffix, sub in (spec.get("sub") or {}).items():
+            self._add(f"{code}{suffix}", sub, fields)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, code):
+        """Entry for `code` in any spelling, else its parent's, else None."""
+        canonical = canonical_code(code)
+        if canonical is None:
+            return None
+        entry = self.entries.get(canonical)
+        if entry is None:
+            for parent in _parents(canonical):
+                entry = self.entries.get(parent)
+                if entry is not None:
+                    break
+        return entry
+
+
+def load_kb(path=ADDITIVES_PATH):
+    with open(path, encoding="utf-8") as f:
+        return KnowledgeBase(json.load(f), source=path)
+
+
+class AdditiveKB:
+    """The live knowledge base, its file watcher and reload bookkeeping."""
+
+    def __init__(self, path=ADDITIVES_PATH):
+        self.path = path
+        self.kb = load_kb(path)
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.last_error = None
+        self._listeners = []
+        self._stamp = self._file_stamp()
+        self._task = None
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def on_reload(self, callback):
+        """Call `callback(kb)` after every swap to a different version."""
+        self._listeners.append(callback)
+
+    def _load(self):
+        self._stamp = self._file_stamp()
+        try:
+            return load_kb(self.path)
+        except (OSError, ValueError) as e:
+            self.failed_reloads += 1
+            self.last_error = str(e)
+            log.warning("Keeping additive knowledge base %s: %s", self.kb.version, e)
+            raise
+
+    def _swap(self, kb):
+        self.last_error = None
+        if kb.version != self.kb.version:
+            previous, self.kb = self.kb, kb
+            self.reloads += 1
+            log.info("Additive knowledge base %s -> %s (%d entries)",
+                     previous.version, kb.version, len(kb))
+            for callback in self._listeners:
+                callback(kb)
+        return self.kb
+
+    def reload(self):
+        """
+        Load the file and swap it in; returns the live KnowledgeBase.
+        Raises OSError/ValueError, keeping the current one, if the file is
+        unreadable or invalid.
+        """
+        return self._swap(self._load())
+
+    async def reload_async(self):
+        """reload() with the parsing and indexing done off the event loop."""
+        return self._swap(await asyncio.to_thread(self._load))
+
+    def changed(self):
+        """True if the file changed since the last load attempt."""
+        return self._file_stamp() != self._stamp
+
+    async def _watch(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            if self.changed():
+                try:
+                    await self.reload_async()
+                except (OSError, ValueError):
+                    pass
+
+    def start_watching(self, interval=ADDITIVES_WATCH_INTERVAL):
+        if self._task is None and interval > 0:
+            self._task = asyncio.create_task(self._watch(interval))
+
+    async def stop_watching(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        return {
+            "version":  self.kb.version,
+            "entries":  len(self.kb),
+            "path":     self.path,
+            "watching": self._task is not None,
+            "reloads":  self.reloads,
+            "failed_reloads": self.failed_reloads,
+            "last_error": self.last_error,
+        }
+
+
+ADDITIVES = AdditiveKB()
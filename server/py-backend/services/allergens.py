@@ -0,0 +1,110 @@
+"""
+allergens.py -- Single-pass, word-boundary-aware allergen term matcher.
+
+Terms come from data/allergens.json ({allergen: [terms in any language]})
+and are compiled once at import into one automaton: the terms are merged
+into a trie and emitted as a trie-shaped regular expression, so the
+`re` engine walks the text once, following shared prefixes instead of
+re-scanning the text for every term.
+
+A term matches at the start of a word and only as a whole word,
+optionally pluralised with -s/-es, so "egg" does not match inside
+"eggplant" nor "mandel" inside "mandelic acid". A term written with a
+trailing "*" also matches as the first part of a compound word, for the
+languages and terms that build them ("weizen*" matches "Weizenmehl",
+"soy*" matches "soymilk"). Every term starting at a position is
+reported, not only the longest ("soya lecithin" is soya and soy).
+"""
+
+import json
+import os
+import re
+
+_ALLERGENS_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "allergens.json")
+
+# What may follow a whole-word term: a plural ending, then the end of the word
+_WORD_END = r"(?=(?:e?s)?(?!\w))"
+_WORD_CHAR = re.compile(r"\w")
+
+
+def _trie_pattern(terms, compounds):
+    """
+    Regex source matching any of `terms`, structured as a prefix trie.
+    Terms in `compounds` may be followed by anything, the others only by
+    a plural ending and the end of the word.
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = "" if term in compounds else _WORD_END
+
+    def emit(node):
+        stop = node.get("")
+        branches = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return stop
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if stop is not None:
+            # Prefer the longer term, but allow stopping here
+            return "(?:" + body + "|" + stop + ")"
+        return body
+
+    return emit(trie)
+
+
+class AllergenMatcher:
+
+    def __init__(self, table):
+        self.table = table
+        names, compounds = {}, set()
+        for allergen, terms in table.items():
+            for term in terms:
+                term = term.lower()
+                if term.endswith("*"):
+                    term = term[:-1]
+                    compounds.add(term)
+                names.setdefault(term, set()).add(allergen)
+        # term -> allergen names, e.g. a term listed under two allergens
+        self.canonical = {term: tuple(sorted(a)) for term, a in names.items()}
+        self.compounds = sorted(compounds)
+
+        # The regex reports the longest term at a position; a shorter term it
+        # starts with matches there too if it may start a compound or ends at
+        # a word boundary inside the longer one ("soya" also reports "soy*",
+        # "egg yolk" also "egg")
+        self._names = {
+            term: frozenset().union(*(
+                names[term[:i]] for i in range(1, len(term) + 1)
+                if term[:i] in names
+                and (i == len(term) or term[:i] in compounds or not _WORD_CHAR.match(term[i]))
+            ))
+            for term in names
+        }
+
+        trie = _trie_pattern(names, compounds)
+        first = "".join(sorted({term[0] for term in names}))
+        # Only word starts are tried; the leading character class skips the
+        # ones no term starts at. Zero-width lookahead so overlapping terms
+        # ("tree nut" / "nut") are all seen
+        self._regex = re.compile(rf"(?<!\w)(?=[{re.escape(first)}])(?=({trie}))")
+
+    def __len__(self):
+        return len(self.canonical)
+
+    def find(self, *texts):
+        """Canonical allergen names found in any of `texts`, in one pass."""
+        haystack = "\n".join(t.lower() for t in texts if t)
+        found = set()
+        for term in set(self._regex.findall(haystack)):
+            found |= self._names[term]
+        return found
+
+
+def load_matcher(path=_ALLERGENS_PATH):
+    with open(path, encoding="utf-8") as f:
+        return AllergenMatcher(json.load(f))
+
+
+MATCHER = load_matcher()
@@ -1,36 +1,23 @@
 # analyzer.py
 
+import hashlib
 import json
-import os
-
-# Load additive info from the shared knowledge base
-_ADDITIVES_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "additives.json")
-with open(_ADDITIVES_PATH, encoding="utf-8") as _f:
-    ADDITIVE_INFO: dict = json.load(_f)
-
-# Additive risk → score deduction
-ADDITIVE_PENALTY = {"high": 10, "moderate": 4, "low": 0, "unknown": 2}
 
+from services import scoring_rules
+from services.additive_kb import ADDITIVES, canonical_code
+from services.allergens import MATCHER
+from services.records import (
+    Additive, Analysis, Highlights, NutrientRow, Radar, ServingAnalysis,
+)
+from services.scoring import NUTRITION_PLAN, DATA_QUALITY_PLAN, RATINGS, verdict_for
+from services.scoring_rules import (
+    ADDITIVE_PENALTY, ADDITIVE_PENALTY_CAP, LABEL_BONUS_EACH, LABEL_BONUS_CAP,
+    SALT_IMPLAUSIBLE,
+)
 
 def rating_color(metric, value):
     """Traffic-light colour for individual nutrients."""
-    if value is None:
-        return "neutral"
-    if metric == "salt":
-        return "red" if value > 1.5 else "orange" if value > 0.6 else "green"
-    if metric == "saturated_fat":
-        return "red" if value > 5 else "orange" if value > 2.5 else "green"
-    if metric == "sugars":
-        return "red" if value > 15 else "orange" if value > 8 else "green"
-    if metric == "fat":
-        return "red" if value > 17.5 else "orange" if value > 10 else "green"
-    if metric == "fiber":
-        return "green" if value >= 3 else "orange" if value > 1 else "red"
-    if metric == "protein":
-        return "green" if value >= 10 else "neutral"
-    if metric == "energy_kcal":
-        return "red" if value > 400 else "orange" if value > 250 else "green"
-    return "neutral"
+    return RATINGS.rate(metric, value)
 
 
 def _safe(val):
@@ -50,6 +37,19 @@ def _key_nutrients_present(n):
         if _safe(n.get(k)) is not None
     )
 
+# Daily reference intakes used for rda_percent
+RDA = {
+    "salt":          5,
+    "saturated_fat": 20,
+    "sugars":        50,
+    "fiber":         25,
+    "protein":       50,
+    "fat":           70,
+    "energy_kcal":   2000,
+    "carbohydrates": 260,
+    "cholesterol":   0.3,   # 300 mg/day = 0.3 g
+}
+
 # Labels that deserve a positive signal
 _POSITIVE_LABELS = {
     "en:organic", "en:eu-organic", "en:fair-trade",
@@ -58,248 +58,155 @@ _POSITIVE_LABELS = {
     "en:no-preservatives", "en:whole-grain",
 }
 
-def analyze(normalized):
-    n   = normalized["nutrients"]
-    ing = normalized["ingredients"]
-    m   = normalized["metadata"]
-    s   = normalized["serving"]
 
-    nutrition_data_per = s.get("nutrition_data_per", "100g")
+def _rules_version():
+    """Digest of the scoring rule tables, RDAs, positive labels and allergen terms."""
+    tables = {k: v for k, v in vars(scoring_rules).items() if k.isupper()}
+    payload = json.dumps(
+        [tables, RDA, sorted(_POSITIVE_LABELS), sorted(MATCHER.canonical.items()), MATCHER.compounds],
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+_RULES_VERSION = _rules_version()
+
+
+def analysis_version():
+    """
+    Identifies everything that shapes an analysis: the rules (fixed per
+    process) and the additive knowledge base (changes when it is
+    reloaded). Part of every response ETag.
+    """
+    return f"{_RULES_VERSION}.{ADDITIVES.kb.version}"
+
+
+def additive_details(additive, kb):
+    """Additive record for a normalized additive, from the knowledge base `kb`."""
+    code = canonical_code(additive.id) or (additive.id or "").replace("en:", "").upper()
+    entry = kb.lookup(code)
+    if entry is None:
+        return Additive(
+            code=        code,
+            name=        additive.text or code,
+            category=    "Unknown",
+            risk=        "unknown",
+            explanation= "No safety data available.",
+        )
+    return Additive(
+        code=        code,
+        name=        entry.name,
+        category=    entry.category,
+        risk=        entry.risk,
+        explanation= entry.explanation,
+    )
+
+def _facts(normalized):
+    """Flatten a normalized product into the fields the scoring rules read."""
+    n   = normalized.nutrients
+    ing = normalized.ingredients
+    m   = normalized.metadata
+    s   = normalized.serving
+
+    salt      = _safe(n.salt)
+    sat_fat   = _safe(n.saturated_fat)
+    total_fat = _safe(n.fat)
+
+    # Cap nonsense salt values for non-condiments (likely data error)
+    salt_scored = salt
+    if salt is not None and salt > SALT_IMPLAUSIBLE:
+        categories = normalized.product.categories or []
+        is_condiment = any("salt" in c or "condiment" in c or "spice" in c
+                           for c in categories)
+        if not is_condiment:
+            salt_scored = None
+
+    sat_fat_ratio = None
+    if sat_fat is not None and total_fat is not None and total_fat > 0:
+        sat_fat_ratio = sat_fat / total_fat
+
+    return {
+        "salt_scored":       salt_scored,
+        "saturated_fat":     sat_fat,
+        "fat":               total_fat,
+        "sat_fat_ratio":     sat_fat_ratio,
+        "sugars":            _safe(n.sugars),
+        "fiber":             _safe(n.fiber),
+        "protein":           _safe(n.protein),
+        "energy_kcal":       _safe(n.energy_kcal),
+        "cholesterol":       _safe(n.cholesterol),
+        "trans_fat":         _safe(n.get("trans_fat")),
+        "carbohydrates":     _safe(n.carbohydrates),
+        "nova_group":        m.nova_group,
+        "contains_palm_oil": bool(ing.contains_palm_oil),
+        "ingredient_count":  ing.total_count,
+        "per_100g":          s.nutrition_data_per == "100g",
+        "off_completeness":  _safe(m.off_completeness),
+        "key_nutrients_present": _key_nutrients_present(n),
+    }
+
+
+def analyze(normalized):
+    n   = normalized.nutrients
+    ing = normalized.ingredients
+    m   = normalized.metadata
+    s   = normalized.serving
 
     score    = 100
     likes    = []
     concerns = []
 
-    salt        = _safe(n.get("salt"))
-    sat_fat     = _safe(n.get("saturated_fat"))
-    total_fat   = _safe(n.get("fat"))
-    sugars      = _safe(n.get("sugars"))
-    fiber       = _safe(n.get("fiber"))
-    protein     = _safe(n.get("protein"))
-    energy_kcal = _safe(n.get("energy_kcal"))
-    cholesterol = _safe(n.get("cholesterol"))
-    trans_fat   = _safe(n.get("trans_fat"))
-    carbs       = _safe(n.get("carbohydrates"))
-
-    # ── salt (cap nonsense values for non-condiments) ────────────────
-    if salt is not None and salt > 10:
-        categories = normalized.get("product", {}).get("categories", [])
-        is_condiment = any("salt" in c or "condiment" in c or "spice" in c
-                          for c in categories)
-        if not is_condiment:
-            salt = None  # likely data error
-
-    if salt is None:
-        score -= 5
-        concerns.append("Salt content not reported")
-    elif salt > 1.5:
-        score -= 25
-        concerns.append("Very high salt")
-    elif salt > 0.6:
-        score -= 12
-        concerns.append("Moderate salt")
-    else:
-        likes.append("Low salt")
-
-    # ── saturated fat ────────────────────────────────────────────────
-    if sat_fat is None:
-        score -= 5
-        concerns.append("Saturated fat not reported")
-    elif sat_fat > 5:
-        score -= 20
-        concerns.append("High saturated fat")
-    elif sat_fat > 2.5:
-        score -= 8
-        concerns.append("Moderate saturated fat")
-    else:
-        likes.append("Low saturated fat")
+    facts = _facts(normalized)
+    nova  = facts["nova_group"]
 
-    # ── total fat ────────────────────────────────────────────────────
-    if total_fat is not None:
-        if total_fat > 17.5:
-            score -= 10
-            concerns.append("High total fat")
-        elif total_fat > 10:
-            score -= 4
+    # ── nutrients, processing, palm oil, complexity (scoring_rules) ──
+    score += NUTRITION_PLAN.run(facts, likes, concerns)
 
-    # ── saturated-to-total fat ratio (extra penalty) ─────────────────
-    if sat_fat is not None and total_fat is not None and total_fat > 0:
-        sat_ratio = sat_fat / total_fat
-        if sat_ratio > 0.5:
-            score -= 3
-            concerns.append("High saturated-to-total fat ratio")
-        elif sat_ratio < 0.3 and total_fat > 5:
-            score += 2
-            likes.append("Healthy fat profile")
-
-    # ── sugars (tightened to WHO guidance) ────────────────────────────
-    if sugars is None:
-        score -= 3
-        concerns.append("Sugar content not reported")
-    elif sugars > 15:
-        score -= 20
-        concerns.append("Very high sugar")
-    elif sugars > 10:
-        score -= 10
-        concerns.append("High sugar")
-    elif sugars > 5:
-        score -= 4
-        concerns.append("Moderate sugar")
-    else:
-        likes.append("Low sugar")
-
-    # ── fiber ────────────────────────────────────────────────────────
-    if fiber is not None:
-        if fiber >= 5:
-            score += 8
-            likes.append("Excellent fiber content")
-        elif fiber >= 3:
-            score += 4
-            likes.append("Good fiber content")
-        elif fiber < 1:
-            score -= 3
-
-    # ── protein (scaled bonus) ───────────────────────────────────────
-    if protein is not None:
-        if protein >= 15:
-            score += 7
-            likes.append("Excellent protein content")
-        elif protein >= 10:
-            score += 5
-            likes.append("High protein")
-
-    # ── energy ───────────────────────────────────────────────────────
-    if energy_kcal is not None:
-        if energy_kcal > 450:
-            score -= 10
-            concerns.append("Very high calorie density")
-        elif energy_kcal > 300:
-            score -= 5
-            concerns.append("High calorie density")
-        elif energy_kcal < 100:
-            score += 3
-            likes.append("Low calorie")
-
-    # ── cholesterol ──────────────────────────────────────────────────
-    if cholesterol is not None and cholesterol > 0.1:  # > 100mg per 100g
-        score -= 5
-        concerns.append("High cholesterol")
-
-    # ── trans fat ────────────────────────────────────────────────────
-    if trans_fat is not None and trans_fat > 0:
-        score -= 10
-        concerns.append("Contains trans fat")
-
-    # ── carbohydrates (flag very high) ───────────────────────────────
-    if carbs is not None and carbs > 70:
-        score -= 3
-        concerns.append("Very high carbohydrate content")
-
-    # ── NOVA processing level ────────────────────────────────────────
-    nova = m.get("nova_group")
-    if nova == 4:
-        score -= 15
-        concerns.append("Ultra-processed food (NOVA 4)")
-    elif nova == 3:
-        score -= 5
-        concerns.append("Processed food (NOVA 3)")
-    elif nova in (1, 2):
-        likes.append("Minimally processed")
-
-    # ── palm oil ─────────────────────────────────────────────────────
-    if ing.get("contains_palm_oil"):
-        score -= 5
-        concerns.append("Contains palm oil")
-
-    # ── ingredient complexity ────────────────────────────────────────
-    ingredient_count = ing.get("total_count", 0)
-    if ingredient_count > 20:
-        score -= 3
-        concerns.append(f"Complex formulation ({ingredient_count} ingredients)")
- 
     additives_full = []
     additive_score_deduction = 0
     high_risk_count = 0
 
-    for a in ing.get("additives", []):
-        code = (a.get("id") or "").replace("en:", "").upper()
-        info = ADDITIVE_INFO.get(code, {
-            "name": a.get("text") or code,
-            "category": "Unknown",
-            "risk": "unknown",
-            "explanation": "No safety data available.",
-        })
-        additives_full.append({
-            "code":        code,
-            "name":        info.get("name", code),
-            "category":    info.get("category", "Unknown"),
-            "risk":        info.get("risk", "unknown"),
-            "explanation": info.get("explanation", "No safety data available."),
-        })
-        deduction = ADDITIVE_PENALTY.get(info.get("risk", "unknown"), 2)
-        additive_score_deduction += deduction
-        if info.get("risk") == "high":
+    # One knowledge base for the whole analysis, even if it is swapped meanwhile
+    kb = ADDITIVES.kb
+    for a in ing.additives:
+        additive = additive_details(a, kb)
+        additives_full.append(additive)
+        additive_score_deduction += ADDITIVE_PENALTY.get(additive.risk, 2)
+        if additive.risk == "high":
             high_risk_count += 1
 
-    # Cap additive penalty at 20 points
-    additive_score_deduction = min(additive_score_deduction, 20)
+    # Cap the total additive penalty
+    additive_score_deduction = min(additive_score_deduction, ADDITIVE_PENALTY_CAP)
     if additive_score_deduction > 0:
         score -= additive_score_deduction
     if high_risk_count:
         concerns.append(f"{high_risk_count} high-risk additive(s) detected")
 
-    product_labels = set(m.get("labels") or [])
+    product_labels = set(m.labels or [])
     matched_labels = product_labels & _POSITIVE_LABELS
     if matched_labels:
-        score += min(5, len(matched_labels) * 2)
+        score += min(LABEL_BONUS_CAP, len(matched_labels) * LABEL_BONUS_EACH)
         label_names = [l.replace("en:", "").replace("-", " ").title() for l in sorted(matched_labels)]
         likes.append(f"Certified: {', '.join(label_names)}")
 
-    off_completeness = _safe(m.get("off_completeness"))
-    if nutrition_data_per != "100g":
-        score -= 8
-        concerns.append(f"Nutrition values reported per-serving, not per-100g — analysis may be inaccurate")
-    elif off_completeness is not None:
-        if off_completeness >= 0.8:
-            score += 3
-        elif off_completeness < 0.35:
-            score -= 5
-            concerns.append("Very limited nutrition data available")
-    else:
-        key_present = _key_nutrients_present(n)
-        if key_present == 4:
-            score += 3
-        elif key_present <= 1:
-            score -= 5
-            concerns.append("Very limited nutrition data available")
+    # ── per-serving data / completeness (scoring_rules) ──────────────
+    score += DATA_QUALITY_PLAN.run(facts, likes, concerns)
 
     score = max(0, min(100, score))
 
-    RDA = {
-        "salt":          5,
-        "saturated_fat": 20,
-        "sugars":        50,
-        "fiber":         25,
-        "protein":       50,
-        "fat":           70,
-        "energy_kcal":   2000,
-        "carbohydrates": 260,
-        "cholesterol":   0.3,   # 300 mg/day = 0.3 g
-    }
-
     nutrients_list = []
     for key, val in n.items():
         v = _safe(val)
         if v is not None:
-            nutrients_list.append({
-                "name":        key,
-                "amount_100g": v,
-                "unit":        "kcal" if key == "energy_kcal" else "g",
-                "rda_percent": round((v / RDA.get(key, 100)) * 100, 1),
-                "rating":      rating_color(key, v),
-            })
-
-    sg = s.get("serving_size_g")
+            nutrients_list.append(NutrientRow(
+                name=        key,
+                amount_100g= v,
+                unit=        "kcal" if key == "energy_kcal" else "g",
+                rda_percent= round((v / RDA.get(key, 100)) * 100, 1),
+                rating=      rating_color(key, v),
+            ))
+
+    sg = s.serving_size_g
     if sg:
         per_serv = {
             k: round((_safe(v) * sg) / 100, 2)
@@ -309,40 +216,31 @@ def analyze(normalized):
     else:
         per_serv = None
 
-    radar = {
-        "salt":          min(1.0, (_safe(n.get("salt"))          or 0) / 3),
-        "saturated_fat": min(1.0, (_safe(n.get("saturated_fat")) or 0) / 10),
-        "sugars":        min(1.0, (_safe(n.get("sugars"))        or 0) / 25),
-        "energy":        min(1.0, (_safe(n.get("energy_kcal"))   or 0) / 600),
-        "fiber":         min(1.0, (_safe(n.get("fiber"))         or 0) / 10),
-        "protein":       min(1.0, (_safe(n.get("protein"))       or 0) / 25),
-    }
-
-    if score >= 75:
-        verdict = "Healthy choice"
-    elif score >= 60:
-        verdict = "Decent choice"
-    elif score >= 40:
-        verdict = "Moderate consumption recommended"
-    elif score >= 20:
-        verdict = "Best enjoyed occasionally"
-    else:
-        verdict = "Limit consumption"
+    radar = Radar(
+        salt=          min(1.0, (_safe(n.salt)          or 0) / 3),
+        saturated_fat= min(1.0, (_safe(n.saturated_fat) or 0) / 10),
+        sugars=        min(1.0, (_safe(n.sugars)        or 0) / 25),
+        energy=        min(1.0, (_safe(n.energy_kcal)   or 0) / 600),
+        fiber=         min(1.0, (_safe(n.fiber)         or 0) / 10),
+        protein=       min(1.0, (_safe(n.protein)       or 0) / 25),
+    )
 
-    return {
-        "highlights": {
-            "health_score": score,
-            "verdict":      verdict,
-            "likes":        likes,
-            "concerns":     concerns,
-            "nova_group":   nova,
-        },
-        "nutrients":      nutrients_list,
-        "nutrient_radar": radar,
-        "additives_full": additives_full,
-        "serving": {
-            "per_100g":       n,
-            "per_serving":    per_serv,
-            "serving_size_g": sg,
-        },
-    }
+    verdict = verdict_for(score)
+
+    return Analysis(
+        highlights=Highlights(
+            health_score= score,
+            verdict=      verdict,
+            likes=        likes,
+            concerns=     concerns,
+            nova_group=   nova,
+        ),
+        nutrients=      nutrients_list,
+        nutrient_radar= radar,
+        additives_full= additives_full,
+        serving=ServingAnalysis(
+            per_100g=       n,
+            per_serving=    per_serv,
+            serving_size_g= sg,
+        ),
+    )
@@ -0,0 +1,169 @@
+"""
+analyzer_batch.py -- Vectorized NumPy scorer for whole catalogs.
+
+analyze_batch() computes the same health_score, verdict, RDA percentages,
+nutrient ratings and radar values as analyzer.analyze(), but over
+columnar arrays, evaluating the same compiled rule plans (scoring.py).
+NaN means "not reported" (the scalar analyzer's None).
+Likes/concerns text and additive details are not produced here.
+
+columns_from_normalized() turns normalize() outputs into the columns.
+"""
+
+import numpy as np
+
+from services.additive_kb import ADDITIVES
+from services.analyzer import RDA, _POSITIVE_LABELS, _safe, additive_details
+from services.scoring import NUTRITION_PLAN, DATA_QUALITY_PLAN, RATINGS
+from services.scoring_rules import (
+    ADDITIVE_PENALTY, ADDITIVE_PENALTY_CAP, LABEL_BONUS_EACH, LABEL_BONUS_CAP,
+    SALT_IMPLAUSIBLE, VERDICTS,
+)
+
+NUTRIENT_KEYS = (
+    "energy_kcal", "fat", "saturated_fat", "carbohydrates", "sugars",
+    "fiber", "protein", "salt", "cholesterol",
+)
+
+# Non-nutrient columns analyze_batch expects
+#   nova_group          float, NaN when missing
+#   off_completeness    float, NaN when missing
+#   per_100g            bool, nutrition_data_per == "100g"
+#   is_condiment        bool, a category mentions salt/condiment/spice
+#   contains_palm_oil   bool
+#   ingredient_count    int
+#   additive_penalty    int, uncapped sum of ADDITIVE_PENALTY per additive
+#   high_risk_additives int
+#   positive_labels     int, number of labels in _POSITIVE_LABELS
+
+_RADAR = (
+    ("salt", "salt", 3),
+    ("saturated_fat", "saturated_fat", 10),
+    ("sugars", "sugars", 25),
+    ("energy", "energy_kcal", 600),
+    ("fiber", "fiber", 10),
+    ("protein", "protein", 25),
+)
+
+def _additive_columns(additives, kb):
+    penalty = 0
+    high = 0
+    for a in additives:
+        risk = additive_details(a, kb).risk
+        penalty += ADDITIVE_PENALTY.get(risk, 2)
+        if risk == "high":
+            high += 1
+    return penalty, high
+
+
+def columns_from_normalized(products):
+    """Build analyze_batch() input columns from a list of normalize() outputs."""
+    n = len(products)
+    kb = ADDITIVES.kb
+    cols = {k: np.full(n, np.nan) for k in NUTRIENT_KEYS + ("trans_fat", "nova_group", "off_completeness")}
+    for k in ("per_100g", "is_condiment", "contains_palm_oil"):
+        cols[k] = np.zeros(n, dtype=bool)
+    for k in ("ingredient_count", "additive_penalty", "high_risk_additives", "positive_labels"):
+        cols[k] = np.zeros(n, dtype=np.int64)
+
+    for i, p in enumerate(products):
+        nutr = p.nutrients
+        for k in NUTRIENT_KEYS + ("trans_fat",):
+            v = _safe(nutr.get(k))
+            if v is not None:
+                cols[k][i] = v
+
+        m = p.metadata
+        nova = m.nova_group
+        if isinstance(nova, (int, float)):
+            cols["nova_group"][i] = nova
+        completeness = _safe(m.off_completeness)
+        if completeness is not None:
+            cols["off_completeness"][i] = completeness
+        cols["positive_labels"][i] = len(set(m.labels or []) & _POSITIVE_LABELS)
+
+        cols["per_100g"][i] = p.serving.nutrition_data_per == "100g"
+        categories = p.product.categories or []
+        cols["is_condiment"][i] = any(
+            "salt" in c or "condiment" in c or "spice" in c for c in categories
+        )
+
+        ing = p.ingredients
+        cols["contains_palm_oil"][i] = bool(ing.contains_palm_oil)
+        cols["ingredient_count"][i] = ing.total_count
+        cols["additive_penalty"][i], cols["high_risk_additives"][i] = \
+            _additive_columns(ing.additives, kb)
+
+    return cols
+
+
+def _py_round(x, ndigits):
+    """
+    Elementwise round() matching Python's built-in exactly.
+    np.round only disagrees on values sitting at a decimal tie, so those
+    few are re-rounded with the built-in.
+    """
+    out = np.round(x, ndigits)
+    scaled = x * 10.0 ** ndigits
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in np.flatnonzero(near_tie):
+        out[i] = round(float(x[i]), ndigits)
+    return out
+
+
+def analyze_batch(cols):
+    """
+    Score every row of `cols` (see columns_from_normalized) at once.
+    Returns health_score, verdict, rda_percent, ratings and radar arrays.
+    """
+    salt    = np.asarray(cols["salt"], dtype=float)
+    sat_fat = np.asarray(cols["saturated_fat"], dtype=float)
+    fat     = np.asarray(cols["fat"], dtype=float)
+
+    # Derived facts, mirroring analyzer._facts
+    facts = dict(cols)
+    if "trans_fat" not in facts:
+        facts["trans_fat"] = np.full(salt.shape, np.nan)
+    facts["salt_scored"] = np.where(
+        (salt > SALT_IMPLAUSIBLE) & ~np.asarray(cols["is_condiment"]), np.nan, salt
+    )
+    ratio_ok = ~np.isnan(sat_fat) & ~np.isnan(fat) & (fat > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        facts["sat_fat_ratio"] = np.where(ratio_ok, sat_fat / fat, np.nan)
+    facts["key_nutrients_present"] = sum(
+        (~np.isnan(np.asarray(cols[k], dtype=float))).astype(np.int64)
+        for k in ("salt", "saturated_fat", "sugars", "fiber")
+    )
+
+    score = np.full(salt.shape, 100, dtype=np.int64)
+    score += NUTRITION_PLAN.run_batch(facts)
+    score -= np.minimum(np.asarray(cols["additive_penalty"]), ADDITIVE_PENALTY_CAP)
+    score += np.minimum(LABEL_BONUS_CAP, np.asarray(cols["positive_labels"]) * LABEL_BONUS_EACH)
+    score += DATA_QUALITY_PLAN.run_batch(facts)
+
+    score = np.clip(score, 0, 100)
+    verdict = np.select(
+        [score >= minimum for minimum, _ in VERDICTS],
+        [name for _, name in VERDICTS],
+        VERDICTS[-1][1],
+    )
+
+    rda_percent = {}
+    ratings = {}
+    for key in NUTRIENT_KEYS:
+        v = np.asarray(cols[key], dtype=float)
+        rda_percent[key] = _py_round((v / RDA.get(key, 100)) * 100, 1)
+        ratings[key] = RATINGS.rate_batch(key, v)
+
+    radar = {
+        name: np.minimum(1.0, np.nan_to_num(np.asarray(cols[key], dtype=float), nan=0.0) / div)
+        for name, key, div in _RADAR
+    }
+
+    return {
+        "health_score": score,
+        "verdict":      verdict,
+        "rda_percent":  rda_percent,
+        "ratings":      ratings,
+        "radar":        radar,
+    }
@@ -0,0 +1,131 @@
+"""
+cache.py -- Bounded in-process TTL/LRU cache.
+
+Entries are fresh for `ttl` seconds, then stale for another `stale_ttl`
+seconds (callers may serve a stale entry while they refresh it), then
+dropped. The cache is bounded both by entry count and by an approximate
+byte size measured from the JSON encoding of each value.
+"""
+
+import time
+from collections import OrderedDict
+
+from services.encoding import dumps
+
+FRESH = "fresh"
+STALE = "stale"
+MISS  = "miss"
+
+
+def approx_size(value):
+    """Rough memory footprint of a JSON-like value, in bytes."""
+    try:
+        return len(dumps(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+class TTLCache:
+
+    def __init__(self, name, ttl, stale_ttl=0.0, max_entries=1000, max_bytes=64 * 1024 * 1024):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._data = OrderedDict()   # key -> (value, size, fresh_until, stale_until)
+        self._bytes = 0
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key):
+        """Return (value, state) where state is FRESH, STALE or MISS."""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None, MISS
+
+        value, _, fresh_until, stale_until = entry
+        now = time.monotonic()
+        if now >= stale_until:
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None, MISS
+
+        self._data.move_to_end(key)
+        if now < fresh_until:
+            self.hits += 1
+            return value, FRESH
+        self.stale_hits += 1
+        return value, STALE
+
+    def peek(self, key):
+        """Value if present and fresh, else None; no stats or LRU update."""
+        entry = self._data.get(key)
+        if entry is None or time.monotonic() >= entry[2]:
+            return None
+        return entry[0]
+
+    def expires_in(self, key):
+        """Seconds of freshness left for `key` (<= 0 once stale), or None if absent."""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        return entry[2] - time.monotonic()
+
+    def set(self, key, value, ttl=None, size=None):
+        if key in self._data:
+            self._remove(key)
+
+        size = approx_size(value) if size is None else size
+        if size > self.max_bytes:
+            return
+
+        ttl = self.ttl if ttl is None else ttl
+        now = time.monotonic()
+        self._data[key] = (value, size, now + ttl, now + ttl + self.stale_ttl)
+        self._bytes += size
+
+        while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def delete(self, key):
+        if key in self._data:
+            self._remove(key)
+
+    def clear(self):
+        self._data.clear()
+        self._bytes = 0
+
+    def _remove(self, key):
+        _, size, _, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def stats(self):
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries":     len(self._data),
+            "bytes":       self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes":   self.max_bytes,
+            "hits":        self.hits,
+            "stale_hits":  self.stale_hits,
+            "misses":      self.misses,
+            "evictions":   self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio":   round((self.hits + self.stale_hits) / lookups, 4) if lookups else None,
+        }
@@ -0,0 +1,39 @@
+"""
+dump.py -- Stream-read OpenFoodFacts JSONL exports (.jsonl or .jsonl.gz).
+
+Lines are read one at a time, so memory stays constant regardless of the
+dump size. Line numbers are used as resume positions by the offline tools.
+"""
+
+import gzip
+import json
+
+
+def open_dump(path):
+    """Open a dump for binary line reading, decompressing .gz on the fly."""
+    if str(path).endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def iter_dump_lines(path, skip=0):
+    """Yield (line_no, raw_line) pairs, skipping the first `skip` lines."""
+    with open_dump(path) as f:
+        for line_no, line in enumerate(f, start=1):
+            if line_no <= skip:
+                continue
+            yield line_no, line
+
+
+def iter_dump_products(path, skip=0):
+    """Yield (line_no, product) pairs; blank and malformed lines are skipped."""
+    for line_no, line in iter_dump_lines(path, skip=skip):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            product = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(product, dict) and product.get("code"):
+            yield line_no, product
@@ -0,0 +1,79 @@
+"""
+encoding.py -- JSON encoding for responses and caches.
+
+Uses orjson when it is installed (`pip install orjson`; several times
+faster than the stdlib and produces bytes directly). Without it, the
+stdlib encoder is used with the same settings as Starlette's
+JSONResponse, so responses stay byte-compatible apart from float
+formatting details.
+
+Responses hold the pipeline records of services/records.py (slotted
+dataclasses). orjson serializes those natively; the stdlib path turns
+each into a dict as the encoder reaches it.
+
+Routes that return a plain dict go through FastAPI's jsonable_encoder
+before any response class sees them. Hot routes therefore return
+RawJSONResponse with bytes produced by `dumps` (often pre-encoded and
+cached), which skips that walk entirely.
+"""
+
+import json
+from dataclasses import is_dataclass
+
+from fastapi.responses import JSONResponse, Response
+
+from services.records import to_json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(value):
+        return orjson.dumps(value, default=str, option=_OPTIONS)
+
+else:
+    def _default(value):
+        if is_dataclass(value):
+            return to_json(value)
+        return str(value)
+
+    def dumps(value):
+        return json.dumps(
+            value, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":"),
+        ).encode("utf-8")
+
+
+def backend():
+    return "orjson" if orjson is not None else "json"
+
+
+class Encoded:
+    """
+    A JSON-able value and its encoded bytes, encoded once. `validator`
+    optionally identifies the source state the value was derived from
+    (used for ETags).
+    """
+
+    __slots__ = ("value", "body", "validator")
+
+    def __init__(self, value, body=None, validator=None):
+        self.value = value
+        self.body = dumps(value) if body is None else body
+        self.validator = validator
+
+
+class FastJSONResponse(JSONResponse):
+    """Default response class: JSONResponse rendered with `dumps`."""
+
+    def render(self, content):
+        return dumps(content)
+
+
+class RawJSONResponse(Response):
+    """A body that is already encoded JSON bytes."""
+
+    media_type = "application/json"
@@ -1,5 +1,45 @@
 import re
 
+from services.allergens import MATCHER
+from services.records import Extracted, Metadata, Nutrients, Product, Serving
+
+# Top-level OFF product keys extract_product_data reads. The fetcher asks
+# OFF for exactly these (`fields=`), and extract_product_data only sees
+# these, so reading a new key means adding it here first.
+OFF_FIELDS = (
+    "code",
+    "product_name",
+    "brands",
+    "image_url",
+    "quantity",
+    "categories_tags",
+    "nutriments",
+    "nutrition_data_per",
+    "ingredients",
+    "ingredients_text",
+    "additives_tags",
+    "allergens_tags",
+    "traces_tags",
+    "serving_size",
+    "nutriscore",
+    "nutriscore_grade",
+    "nova_group",
+    "nova_group_error",
+    "nutrient_levels",
+    "labels_tags",
+    "completeness",
+    "data_quality_warnings_tags",
+    "food_groups_tags",
+    "countries_tags",
+    "ecoscore_grade",
+    "packaging_materials_tags",
+    "last_modified_t",
+)
+
+def project(raw):
+    """`raw` restricted to OFF_FIELDS."""
+    return {k: raw[k] for k in OFF_FIELDS if k in raw}
+
 def safe_float(x):
     try:
         return float(x)
@@ -13,33 +53,28 @@ def extract_serving_size(serving_raw: str):
     return float(match.group(1)) if match else None
 
 def flatten_ingredients(ingredients):
+    """
+    Pre-order flattening of the nested ingredient tree.
+    Iterative, so pathologically deep OFF data cannot hit the recursion limit.
+    """
     flat = []
+    stack = [iter(ingredients or [])]
 
-    def walk(items):
-        for ing in items:
+    while stack:
+        for ing in stack[-1]:
             flat.append(ing)
             if isinstance(ing.get("ingredients"), list):
-                walk(ing["ingredients"])
+                stack.append(iter(ing["ingredients"]))
+                break
+        else:
+            stack.pop()
 
-    walk(ingredients or [])
     return flat
 
-COMMON_ALLERGENS = [
-    "milk", "lactose",
-    "soy", "soya",
-    "egg",
-    "wheat", "gluten",
-    "almond", "cashew", "peanut", "groundnut",
-    "sesame", "mustard", "hazelnut", "tree nut"
-]
 
 def detect_allergens(text, traces, tags):
-    text = (text or "").lower()
-    detected = set()
-
-    for a in COMMON_ALLERGENS:
-        if a in text or any(a in t for t in traces):
-            detected.add(a)
+    # Ingredients text and trace tags are scanned together in one pass
+    detected = MATCHER.find(text, *traces)
 
     for tag in tags:
         clean = tag.replace("en:", "")
@@ -56,7 +91,9 @@ def _nutriment(nutr, key):
     return safe_float(nutr.get(key) or nutr.get(f"{key}_100g"))
 
 
-def extract_product_data(raw: dict):
+def extract_product_data(raw: dict) -> Extracted:
+
+    raw = project(raw)
 
     nutr = raw.get("nutriments") or {}
     nutrition_data_per = raw.get("nutrition_data_per", "100g")
@@ -66,17 +103,17 @@ def extract_product_data(raw: dict):
     if raw_salt is None and raw_sodium is not None:
         raw_salt = round(raw_sodium * 2.5, 4)
 
-    nutrients = {
-        "energy_kcal":   _nutriment(nutr, "energy-kcal"),
-        "fat":           _nutriment(nutr, "fat"),
-        "saturated_fat": _nutriment(nutr, "saturated-fat"),
-        "carbohydrates": _nutriment(nutr, "carbohydrates"),
-        "sugars":        _nutriment(nutr, "sugars"),
-        "fiber":         _nutriment(nutr, "fiber"),
-        "protein":       _nutriment(nutr, "proteins"),
-        "salt":          raw_salt,
-        "cholesterol":   _nutriment(nutr, "cholesterol"),
-    }
+    nutrients = Nutrients(
+        energy_kcal=   _nutriment(nutr, "energy-kcal"),
+        fat=           _nutriment(nutr, "fat"),
+        saturated_fat= _nutriment(nutr, "saturated-fat"),
+        carbohydrates= _nutriment(nutr, "carbohydrates"),
+        sugars=        _nutriment(nutr, "sugars"),
+        fiber=         _nutriment(nutr, "fiber"),
+        protein=       _nutriment(nutr, "proteins"),
+        salt=          raw_salt,
+        cholesterol=   _nutriment(nutr, "cholesterol"),
+    )
 
     ing_list  = raw.get("ingredients") or []
     flattened = flatten_ingredients(ing_list)
@@ -113,38 +150,37 @@ def extract_product_data(raw: dict):
     countries_tags  = raw.get("countries_tags") or []
     nova_group_error = raw.get("nova_group_error")
 
-    return {
-        "product": {
-            "code":       raw.get("code"),
-            "name":       raw.get("product_name") or "Unknown",
-            "brand":      raw.get("brands") or "Unknown",
-            "image":      raw.get("image_url"),
-            "quantity":   raw.get("quantity"),
-            "categories": raw.get("categories_tags") or [],
-        },
-        "nutrients": nutrients,
-        "ingredients_raw": {
-            "text":       raw.get("ingredients_text") or "",
-            "structured": flattened,
-        },
-        "additives_raw":   additives_raw,
-        "allergens_raw":   allergens,
-        "serving": {
-            "serving_size":       serving_raw,
-            "serving_size_g":     serving_g,
-            "nutrition_data_per": nutrition_data_per,
-        },
-        "metadata": {
-            "nova_group":          raw.get("nova_group"),
-            "nova_group_error":    nova_group_error,
-            "nutriscore_grade":    nutriscore_grade,
-            "nutrient_levels":     nutrient_levels,
-            "ecoscore":            raw.get("ecoscore_grade"),
-            "packaging":           raw.get("packaging_materials_tags") or [],
-            "labels":              labels_tags,
-            "off_completeness":    off_completeness,
-            "data_quality_warnings": data_quality_warnings,
-            "food_groups":         food_groups,
-            "countries":           countries_tags,
-        }
-    }
+    return Extracted(
+        product=Product(
+            code=       raw.get("code"),
+            name=       raw.get("product_name") or "Unknown",
+            brand=      raw.get("brands") or "Unknown",
+            image=      raw.get("image_url"),
+            quantity=   raw.get("quantity"),
+            categories= raw.get("categories_tags") or [],
+        ),
+        nutrients=        nutrients,
+        ingredients_text= raw.get("ingredients_text") or "",
+        ingredients=      flattened,
+        additives=        additives_raw,
+        allergens=        allergens,
+        serving=Serving(
+            serving_size=       serving_raw,
+            serving_size_g=     serving_g,
+            nutrition_data_per= nutrition_data_per,
+        ),
+        metadata=Metadata(
+            nova_group=          raw.get("nova_group"),
+            nova_group_error=    nova_group_error,
+            nutriscore_grade=    nutriscore_grade,
+            nutrient_levels=     nutrient_levels,
+            ecoscore=            raw.get("ecoscore_grade"),
+            packaging=           raw.get("packaging_materials_tags") or [],
+            labels=              labels_tags,
+            off_completeness=    off_completeness,
+            data_quality_warnings= data_quality_warnings,
+            food_groups=         food_groups,
+            countries=           countries_tags,
+            last_modified_t=     raw.get("last_modified_t"),
+        ),
+    )
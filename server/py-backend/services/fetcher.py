@@ -1,18 +1,219 @@
+"""
+fetcher.py -- OpenFoodFacts product lookups.
+
+Products come from the optional local index first, then from OFF over a
+shared pooled client. OFF_BASE_URL is the primary host and OFF_MIRRORS
+lists fallbacks (comma-separated base URLs, in order of preference).
+Each host has its own circuit breaker (see resilience.py): a host that
+keeps failing is skipped until a probe succeeds, and when every host is
+open the lookup fails fast with a 503 instead of waiting out a timeout.
+
+An attempt that fails goes to the next healthy mirror not tried yet, if
+there is one; a failed host is not retried. With OFF_HEDGE on, slow
+requests are hedged too: when the first attempt has not answered after
+the OFF_HEDGE_PERCENTILE latency of its host, a second attempt goes to
+the next healthy mirror (or the same host without one) and whichever
+answers first wins. A 404 is a definitive answer and is neither retried
+nor counted against the host.
+"""
+
+import asyncio
+import os
+import time
+
 import httpx
 from fastapi import HTTPException
 
-OPENFOODFACTS_URL = "https://world.openfoodfacts.net/api/v2/product/"
+from services import metrics
+from services.extractor import OFF_FIELDS
+from services.local_index import LocalIndex
+from services.resilience import CLOSED, CircuitBreaker, LatencyWindow
+
+OPENFOODFACTS_URL = os.getenv("OFF_BASE_URL", "https://world.openfoodfacts.net/api/v2/product/")
+OFF_MIRRORS = [u.strip() for u in os.getenv("OFF_MIRRORS", "").split(",") if u.strip()]
+
+# Connection pool / timeout tuning for the shared OpenFoodFacts client
+OFF_MAX_CONNECTIONS = int(os.getenv("OFF_MAX_CONNECTIONS", "50"))
+OFF_MAX_KEEPALIVE   = int(os.getenv("OFF_MAX_KEEPALIVE", "20"))
+OFF_KEEPALIVE_EXPIRY = float(os.getenv("OFF_KEEPALIVE_EXPIRY", "30"))
+OFF_CONNECT_TIMEOUT = float(os.getenv("OFF_CONNECT_TIMEOUT", "3.0"))
+OFF_READ_TIMEOUT    = float(os.getenv("OFF_READ_TIMEOUT", "6.0"))
+OFF_HTTP2           = os.getenv("OFF_HTTP2", "0").lower() in ("1", "true", "yes")
+
+# Hedging: fire a second attempt once the first outlasts this latency percentile
+OFF_HEDGE            = os.getenv("OFF_HEDGE", "1").lower() in ("1", "true", "yes")
+OFF_HEDGE_PERCENTILE = float(os.getenv("OFF_HEDGE_PERCENTILE", "95"))
+OFF_HEDGE_MIN_DELAY  = float(os.getenv("OFF_HEDGE_MIN_DELAY", "0.05"))
+OFF_HEDGE_DELAY      = float(os.getenv("OFF_HEDGE_DELAY", "1.0"))   # until enough samples
+
+# Circuit breaker per host: open after N consecutive failures, probe after the cooldown
+OFF_BREAKER_FAILURES = int(os.getenv("OFF_BREAKER_FAILURES", "5"))
+OFF_BREAKER_COOLDOWN = float(os.getenv("OFF_BREAKER_COOLDOWN", "30"))
+
+# Request only the fields the extractor reads; set to download whole documents
+OFF_FETCH_ALL_FIELDS = os.getenv("OFF_FETCH_ALL_FIELDS", "0").lower() in ("1", "true", "yes")
+_FIELDS_PARAM = {"fields": ",".join(OFF_FIELDS)}
+
+# Optional offline index (built with build_index.py) consulted before OFF
+LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH")
+
+_client = None
+_ssl_context = None
+_local_index = None
+_mirrors = None
+
+
+def _http2_available():
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def ssl_context():
+    """
+    TLS context shared by every client: loading the CA bundle costs more
+    than a megabyte per context, and serve.py builds it once before forking.
+    """
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = httpx.create_ssl_context()
+    return _ssl_context
+
+
+def create_client():
+    """Build an AsyncClient with the configured pool limits and timeouts."""
+    limits = httpx.Limits(
+        max_connections=OFF_MAX_CONNECTIONS,
+        max_keepalive_connections=OFF_MAX_KEEPALIVE,
+        keepalive_expiry=OFF_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(
+        connect=OFF_CONNECT_TIMEOUT,
+        read=OFF_READ_TIMEOUT,
+        write=OFF_READ_TIMEOUT,
+        pool=OFF_CONNECT_TIMEOUT,
+    )
+    # HTTP/2 needs the optional `h2` package (httpx[http2])
+    http2 = OFF_HTTP2 and _http2_available()
+    return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2, verify=ssl_context())
+
+
+def init_client():
+    """Create the shared client. Called once from the app lifespan."""
+    global _client
+    if _client is None:
+        _client = create_client()
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_client():
+    """Shared client, created lazily if the lifespan hook did not run (e.g. scripts)."""
+    return _client if _client is not None else init_client()
+
+
+def get_local_index():
+    """Open the local index on first use; None when not configured."""
+    global _local_index
+    if _local_index is None and LOCAL_INDEX_PATH:
+        _local_index = LocalIndex(LOCAL_INDEX_PATH)
+    return _local_index
 
 
-async def fetch_product_from_api(barcode: str):
-    url = f"{OPENFOODFACTS_URL}{barcode}"
+class Mirror:
+    """One OFF host: its base URL, circuit breaker and recent latencies."""
 
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.breaker = CircuitBreaker(base_url, OFF_BREAKER_FAILURES, OFF_BREAKER_COOLDOWN)
+        self.latency = LatencyWindow()
+
+    def hedge_delay(self):
+        delay = self.latency.percentile(OFF_HEDGE_PERCENTILE)
+        if delay is None:
+            return OFF_HEDGE_DELAY
+        return min(max(delay, OFF_HEDGE_MIN_DELAY), OFF_READ_TIMEOUT)
+
+    async def get(self, barcode, params):
+        """Product from this host; the breaker slot must already be claimed."""
+        start = time.perf_counter()
+        try:
+            product = await _request(f"{self.base_url}{barcode}", params)
+        except HTTPException as e:
+            if e.status_code >= 500:
+                self.breaker.failure()
+            else:
+                self.breaker.success()
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+        self.latency.add(time.perf_counter() - start)
+        self.breaker.success()
+        return product
+
+    def stats(self):
+        return {
+            "url":     self.base_url,
+            "breaker": self.breaker.stats(),
+            "p50_ms":  _ms(self.latency.percentile(50)),
+            "p95_ms":  _ms(self.latency.percentile(95)),
+            "hedge_delay_ms": _ms(self.hedge_delay()),
+        }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+def get_mirrors():
+    global _mirrors
+    if _mirrors is None:
+        set_mirrors([OPENFOODFACTS_URL, *OFF_MIRRORS])
+    return _mirrors
+
+
+def set_mirrors(urls):
+    """Replace the OFF hosts (primary first), e.g. to point at a stand-in."""
+    global _mirrors
+    _mirrors = [Mirror(url) for url in dict.fromkeys(urls)]
+
+
+def _claim(exclude=()):
+    """First host whose breaker lets a call through, skipping those in `exclude`."""
+    for mirror in get_mirrors():
+        if mirror not in exclude and mirror.breaker.allow():
+            return mirror
+    return None
+
+
+def _unavailable():
+    metrics.UPSTREAM_RESPONSES.inc("off", "circuit_open")
+    retry_after = min(m.breaker.retry_after() for m in get_mirrors())
+    raise HTTPException(
+        status_code=503,
+        detail="OpenFoodFacts is unavailable",
+        headers={"Retry-After": str(max(1, round(retry_after)))},
+    )
+
+
+async def _request(url, params):
     try:
-        async with httpx.AsyncClient(timeout=6.0) as client:
-            res = await client.get(url)
-    except httpx.RequestError:
+        res = await get_client().get(url, params=params)
+    except httpx.RequestError as e:
+        metrics.UPSTREAM_RESPONSES.inc("off", type(e).__name__)
         raise HTTPException(status_code=502, detail="Unable to reach OpenFoodFacts")
 
+    metrics.UPSTREAM_RESPONSES.inc("off", str(res.status_code))
+
     if res.status_code == 404:
         raise HTTPException(status_code=404, detail="Product not found")
 
@@ -32,3 +233,81 @@ async def fetch_product_from_api(barcode: str):
         raise HTTPException(status_code=502, detail="Malformed product response")
 
     return product
+
+
+async def _fetch_upstream(barcode, params):
+    primary = _claim()
+    if primary is None:
+        _unavailable()
+
+    loop = asyncio.get_running_loop()
+    tried = [primary]
+    attempts = {asyncio.create_task(primary.get(barcode, params)): primary}
+    hedge_at = loop.time() + primary.hedge_delay() if OFF_HEDGE else None
+    hedge = error = None
+    try:
+        while True:
+            if not attempts:
+                # Everything sent so far failed: fail over to a host not tried
+                # yet. A failed host is not retried (a second timeout would
+                # only double the wait).
+                hedge_at = None
+                backup = _claim(exclude=tried)
+                if backup is None:
+                    raise error
+                metrics.UPSTREAM_FAILOVERS.inc("off")
+                tried.append(backup)
+                attempts[asyncio.create_task(backup.get(barcode, params))] = backup
+            elif hedge_at is not None and loop.time() >= hedge_at:
+                # The first attempt is slow: race a second one, elsewhere if possible
+                hedge_at = None
+                backup = _claim(exclude=tried)
+                if backup is None and primary.breaker.state == CLOSED:
+                    backup = primary
+                if backup is not None:
+                    metrics.UPSTREAM_HEDGES.inc("off", "sent")
+                    if backup is not primary:
+                        tried.append(backup)
+                    hedge = asyncio.create_task(backup.get(barcode, params))
+                    attempts[hedge] = backup
+
+            timeout = None if hedge_at is None else hedge_at - loop.time()
+            done, _ = await asyncio.wait(attempts, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                del attempts[task]
+                try:
+                    product = task.result()
+                except HTTPException as e:
+                    if e.status_code < 500:
+                        raise
+                    error = e
+                    continue
+                if hedge is not None:
+                    metrics.UPSTREAM_HEDGES.inc("off", "won" if task is hedge else "lost")
+                return product
+    finally:
+        for task in attempts:
+            task.cancel()
+
+
+async def fetch_product_from_api(barcode: str, all_fields: bool = False):
+    """
+    OFF product document, projected to OFF_FIELDS unless `all_fields` (or
+    OFF_FETCH_ALL_FIELDS) asks for the full upstream document.
+    """
+    all_fields = all_fields or OFF_FETCH_ALL_FIELDS
+    index = None if all_fields else get_local_index()
+    if index is not None:
+        product = index.lookup(barcode)
+        if product is not None:
+            metrics.UPSTREAM_RESPONSES.inc("local_index", "hit")
+            return product
+
+    return await _fetch_upstream(barcode, None if all_fields else _FIELDS_PARAM)
+
+
+def upstream_stats():
+    return {
+        "hedging": OFF_HEDGE,
+        "mirrors": [m.stats() for m in get_mirrors()],
+    }
@@ -1,43 +1,123 @@
-def format_response(normalized, analyzed, ai_insights=None):
+# Top-level sections of a product response, in response order
+SECTIONS = (
+    "barcode", "product", "highlights", "nutrients", "nutrient_radar", "ingredients",
+    "additives_full", "allergens", "serving", "metadata", "environment", "ai_insights",
+)
 
-    meta = normalized["metadata"]
+# compact=true: what list views need (name, score, verdict)
+COMPACT_SECTIONS = frozenset(("barcode", "product", "highlights"))
 
-    return {
-        "barcode":  normalized["product"]["code"],
-        "product":  normalized["product"],
-        "highlights": analyzed["highlights"],
-        "nutrients":  analyzed["nutrients"],
-        "nutrient_radar": analyzed["nutrient_radar"],
-        "ingredients": {
-            "text":             normalized["ingredients"]["text"],
-            "ingredients":      normalized["ingredients"]["ingredients"],
-            "additives":        normalized["ingredients"]["additives"],
-            "dominant":         normalized["ingredients"]["dominant"],
-            "contains_palm_oil": normalized["ingredients"]["contains_palm_oil"],
-            "complexity": (
-                "Highly complex"    if normalized["ingredients"]["total_count"] > 20 else
-                "Moderately complex" if normalized["ingredients"]["total_count"] > 10 else
-                "Simple formulation"
+# Sections that cannot be built without analyze(); ai_insights also needs the LLM
+ANALYZED_SECTIONS = frozenset((
+    "highlights", "nutrients", "nutrient_radar", "additives_full", "serving", "ai_insights",
+))
+
+
+def select_sections(fields=None, compact=False):
+    """
+    Sections requested by a `fields=a,b` query and/or compact=true, or
+    None for the full response. Raises ValueError on unknown names.
+    """
+    if not fields and not compact:
+        return None
+    wanted = set(COMPACT_SECTIONS) if compact else set()
+    if fields:
+        names = {f.strip() for f in fields.split(",") if f.strip()}
+        unknown = names - set(SECTIONS)
+        if unknown:
+            raise ValueError(
+                f"Unknown fields: {', '.join(sorted(unknown))}. Valid fields: {', '.join(SECTIONS)}"
             )
-        },
-        "additives_full": analyzed["additives_full"],
-        "allergens":  normalized["allergens"],
-        "serving":    analyzed["serving"],
-        "metadata": {
-            "nova_group":       meta.get("nova_group"),
-            "nova_group_error": meta.get("nova_group_error"),
-            "nutriscore_grade": meta.get("nutriscore_grade"),
-            "nutrient_levels":  meta.get("nutrient_levels"),
-            "labels":           meta.get("labels"),
-            "food_groups":      meta.get("food_groups"),
-            "countries":        meta.get("countries"),
-            "off_completeness": meta.get("off_completeness"),
-            "data_quality_warnings": meta.get("data_quality_warnings"),
-            "nutrition_data_per": normalized["serving"].get("nutrition_data_per"),
-        },
-        "environment": {
-            "ecoscore":  meta.get("ecoscore"),
-            "packaging": meta.get("packaging"),
-        },
-        "ai_insights": ai_insights,
+        wanted |= names
+    wanted.add("barcode")
+    return None if wanted >= set(SECTIONS) else frozenset(wanted)
+
+
+def variant_key(sections):
+    """Stable cache-key suffix for a section selection ("" for the full response)."""
+    return "" if sections is None else ",".join(s for s in SECTIONS if s in sections)
+
+
+def slice_response(final, sections):
+    """The `sections` part of an already built full response."""
+    if sections is None:
+        return final
+    return {k: final[k] for k in SECTIONS if k in sections}
+
+
+def _complexity(total_count):
+    return (
+        "Highly complex"    if total_count > 20 else
+        "Moderately complex" if total_count > 10 else
+        "Simple formulation"
+    )
+
+
+def _ingredients(normalized):
+    ing = normalized.ingredients
+    return {
+        "text":             ing.text,
+        "ingredients":      ing.ingredients,
+        "additives":        ing.additives,
+        "dominant":         ing.dominant,
+        "contains_palm_oil": ing.contains_palm_oil,
+        "complexity":       _complexity(ing.total_count),
+    }
+
+
+def _metadata(normalized):
+    meta = normalized.metadata
+    return {
+        "nova_group":       meta.nova_group,
+        "nova_group_error": meta.nova_group_error,
+        "nutriscore_grade": meta.nutriscore_grade,
+        "nutrient_levels":  meta.nutrient_levels,
+        "labels":           meta.labels,
+        "food_groups":      meta.food_groups,
+        "countries":        meta.countries,
+        "off_completeness": meta.off_completeness,
+        "data_quality_warnings": meta.data_quality_warnings,
+        "nutrition_data_per": normalized.serving.nutrition_data_per,
+    }
+
+
+def _environment(normalized):
+    meta = normalized.metadata
+    return {
+        "ecoscore":  meta.ecoscore,
+        "packaging": meta.packaging,
+    }
+
+
+# section -> builder(normalized, analyzed, ai_insights)
+_BUILDERS = {
+    "barcode":        lambda n, a, ai: n.product.code,
+    "product":        lambda n, a, ai: n.product,
+    "highlights":     lambda n, a, ai: a.highlights,
+    "nutrients":      lambda n, a, ai: a.nutrients,
+    "nutrient_radar": lambda n, a, ai: a.nutrient_radar,
+    "ingredients":    lambda n, a, ai: _ingredients(n),
+    "additives_full": lambda n, a, ai: a.additives_full,
+    "allergens":      lambda n, a, ai: n.allergens,
+    "serving":        lambda n, a, ai: a.serving,
+    "metadata":       lambda n, a, ai: _metadata(n),
+    "environment":    lambda n, a, ai: _environment(n),
+    "ai_insights":    lambda n, a, ai: ai,
+}
+
+
+def format_response(normalized, analyzed, ai_insights=None, sections=None):
+    """
+    Build the product response. With `sections` (see select_sections) only
+    those sections are built, and `analyzed` may be None when none of
+    ANALYZED_SECTIONS is requested.
+
+    Sections reference the pipeline records (services/records.py) rather
+    than copying them; the response becomes JSON when it is encoded.
+    """
+    if sections is None:
+        return {k: build(normalized, analyzed, ai_insights) for k, build in _BUILDERS.items()}
+    return {
+        k: build(normalized, analyzed, ai_insights)
+        for k, build in _BUILDERS.items() if k in sections
     }
@@ -0,0 +1,91 @@
+"""
+insight_batcher.py -- Micro-batching of LLM insight requests.
+
+Requests submitted within `window` seconds of each other (up to
+`max_batch`) are sent as one combined call. Each caller awaits its own
+future, resolved from its slot in the combined answer. If the combined
+answer cannot be split back (malformed JSON, wrong count), every item
+falls back to its own single call.
+"""
+
+import asyncio
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class MalformedBatch(ValueError):
+    """The combined response could not be mapped back onto the batch."""
+
+
+class InsightBatcher:
+
+    def __init__(self, run_batch, run_single, window, max_batch):
+        # run_batch(items) -> list of results, one per item, or raises MalformedBatch
+        # run_single(item) -> result
+        self.run_batch = run_batch
+        self.run_single = run_single
+        self.window = window
+        self.max_batch = max_batch
+
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+        self.batches = 0
+        self.batched_items = 0
+        self.fallbacks = 0
+
+    async def submit(self, item):
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.append((item, fut))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await fut
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+        if self._pending:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        items = [item for item, _ in batch]
+        futures = [fut for _, fut in batch]
+        try:
+            if len(items) == 1:
+                results = [await self.run_single(items[0])]
+            else:
+                try:
+                    results = await self.run_batch(items)
+                    self.batches += 1
+                    self.batched_items += len(items)
+                except MalformedBatch as e:
+                    log.warning("Batched insights unusable (%s); falling back to single calls", e)
+                    self.fallbacks += 1
+                    results = await asyncio.gather(*(self.run_single(i) for i in items))
+        except Exception as e:
+            for fut in futures:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        for fut, result in zip(futures, results):
+            if not fut.done():
+                fut.set_result(result)
+
+    def stats(self):
+        return {
+            "batches":       self.batches,
+            "batched_items": self.batched_items,
+            "fallbacks":     self.fallbacks,
+            "pending":       len(self._pending),
+        }
@@ -0,0 +1,140 @@
+"""
+insight_store.py -- Durable, content-addressed cache for AI insights.
+
+Entries are keyed by a hash of the model name and the fully rendered
+prompt, so a product whose data has not changed reuses yesterday's answer.
+Backed by SQLite in WAL mode: it survives restarts and can be shared by
+several uvicorn workers on the same host. Entries expire after `ttl`
+seconds, and the least recently used ones are evicted once the stored
+payloads exceed `max_bytes`.
+
+Opening raises sqlite3.Error. Afterwards the store never raises: a failed
+read is a miss and a failed write is dropped, and the first failure is
+logged as a warning (later ones only at debug level).
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# Touch accessed_at at most this often per entry, to keep reads mostly read-only
+_TOUCH_INTERVAL = 3600
+# Run the size check every N writes
+_EVICT_EVERY = 50
+
+
+def insight_key(model, prompt):
+    return hashlib.sha256(f"{model}\n{prompt}".encode("utf-8")).hexdigest()
+
+
+class InsightStore:
+
+    def __init__(self, path, ttl, max_bytes):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+        self.conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        try:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS insights ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS insights_accessed ON insights (accessed_at)")
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.close()
+            raise
+
+    def _failed(self, action, error):
+        self.errors += 1
+        level = logging.WARNING if self.errors == 1 else logging.DEBUG
+        log.log(level, "Insight store %s failed (%s): %s", action, self.path, error)
+
+    def get(self, key):
+        now = time.time()
+        try:
+            with self._lock:
+                row = self.conn.execute(
+                    "SELECT value, created_at, accessed_at FROM insights WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                value, created_at, accessed_at = row
+                if now - created_at > self.ttl:
+                    self.conn.execute("DELETE FROM insights WHERE key = ?", (key,))
+                    self.conn.commit()
+                    self.misses += 1
+                    return None
+                if now - accessed_at > _TOUCH_INTERVAL:
+                    self.conn.execute("UPDATE insights SET accessed_at = ? WHERE key = ?", (now, key))
+                    self.conn.commit()
+                self.hits += 1
+        except sqlite3.Error as e:
+            self._failed("read", e)
+            self.misses += 1
+            return None
+        return json.loads(value)
+
+    def put(self, key, insights):
+        value = json.dumps(insights, separators=(",", ":"))
+        now = time.time()
+        try:
+            with self._lock:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO insights (key, value, size, created_at, accessed_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (key, value, len(value), now, now),
+                )
+                self.conn.commit()
+                self._writes += 1
+                if self._writes % _EVICT_EVERY == 0:
+                    self._evict(now)
+        except sqlite3.Error as e:
+            self._failed("write", e)
+
+    def _evict(self, now):
+        self.conn.execute("DELETE FROM insights WHERE created_at < ?", (now - self.ttl,))
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM insights").fetchone()[0]
+        excess = total - self.max_bytes
+        if excess > 0:
+            victims = []
+            for key, size in self.conn.execute("SELECT key, size FROM insights ORDER BY accessed_at"):
+                victims.append((key,))
+                excess -= size
+                if excess <= 0:
+                    break
+            self.conn.executemany("DELETE FROM insights WHERE key = ?", victims)
+        self.conn.commit()
+
+    def stats(self):
+        entries = size = None
+        try:
+            with self._lock:
+                entries, size = self.conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM insights"
+                ).fetchone()
+        except sqlite3.Error as e:
+            self._failed("stats", e)
+        return {
+            "path": self.path, "entries": entries, "bytes": size,
+            "max_bytes": self.max_bytes, "hits": self.hits, "misses": self.misses,
+            "errors": self.errors,
+        }
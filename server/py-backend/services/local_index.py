@@ -0,0 +1,126 @@
+"""
+local_index.py -- Read-only, memory-mapped barcode → OFF product index.
+
+Built offline from a dump (see build_index.py) as two files:
+
+  <base>.keys  header + sorted fixed-width records (barcode, offset, length)
+  <base>.data  zlib-compressed product JSON documents, back to back
+
+Both files are mmapped read-only, so every uvicorn worker on the host
+shares the same page-cache pages. Lookups are a binary search over the
+key records plus one decompress, with no network involved.
+"""
+
+import json
+import mmap
+import os
+import struct
+import zlib
+
+MAGIC = b"UPEIDX1\0"
+_HEADER = struct.Struct("<8sIQ")     # magic, key_width, count
+_LOC = struct.Struct("<QI")          # offset, length
+DEFAULT_KEY_WIDTH = 24
+
+
+class LocalIndex:
+
+    def __init__(self, base_path):
+        self.base_path = base_path
+        with open(f"{base_path}.keys", "rb") as f:
+            self._keys = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(f"{base_path}.data", "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+        magic, self.key_width, self.count = _HEADER.unpack_from(self._keys, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{base_path}.keys is not a product index")
+        self._record = self.key_width + _LOC.size
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return self.count
+
+    def _find(self, barcode):
+        key = barcode.encode("ascii", "ignore")
+        if not key or len(key) > self.key_width:
+            return None
+        key = key.ljust(self.key_width, b"\0")
+
+        keys, rec, width = self._keys, self._record, self.key_width
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            pos = _HEADER.size + mid * rec
+            probe = keys[pos:pos + width]
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                return _LOC.unpack_from(keys, pos + width)
+        return None
+
+    def get_raw(self, barcode):
+        """Compressed payload bytes for a barcode, or None."""
+        loc = self._find(barcode)
+        if loc is None:
+            return None
+        offset, length = loc
+        return self._data[offset:offset + length]
+
+    def lookup(self, barcode):
+        """Decoded product document for a barcode, or None."""
+        blob = self.get_raw(barcode)
+        if blob is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(zlib.decompress(blob))
+
+    def stats(self):
+        return {"path": self.base_path, "entries": self.count, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        self._keys.close()
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+
+def build_index(products, base_path, key_width=DEFAULT_KEY_WIDTH, level=6):
+    """
+    Write an index from an iterable of product dicts (must carry "code").
+    Later duplicates of a barcode win. Returns (entries, skipped).
+    """
+    locations = {}          # padded key -> (offset, length) of its last occurrence
+    skipped = 0
+    offset = 0
+
+    with open(f"{base_path}.data.tmp", "wb") as data:
+        for product in products:
+            key = str(product.get("code") or "").encode("ascii", "ignore")
+            if not key or len(key) > key_width:
+                skipped += 1
+                continue
+            blob = zlib.compress(
+                json.dumps(product, separators=(",", ":")).encode("utf-8"), level
+            )
+            data.write(blob)
+            key = key.ljust(key_width, b"\0")
+            if key in locations:
+                skipped += 1
+            locations[key] = (offset, len(blob))
+            offset += len(blob)
+
+    unique = [key + _LOC.pack(*locations[key]) for key in sorted(locations)]
+
+    with open(f"{base_path}.keys.tmp", "wb") as keys:
+        keys.write(_HEADER.pack(MAGIC, key_width, len(unique)))
+        keys.writelines(unique)
+
+    os.replace(f"{base_path}.data.tmp", f"{base_path}.data")
+    os.replace(f"{base_path}.keys.tmp", f"{base_path}.keys")
+    return len(unique), skipped
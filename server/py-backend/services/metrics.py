@@ -0,0 +1,143 @@
+"""
+metrics.py -- Per-stage request timing and Prometheus-format counters.
+
+`stage(name)` times one pipeline stage. The duration is observed into
+the `stage_duration_seconds` histogram and, when a request is being
+traced (see `begin_request`), appended to that request's timing list,
+which the route turns into a Server-Timing header. The trace lives in a
+contextvar, so tasks spawned by the request (single-flight builds,
+background refreshes) record into it without any plumbing.
+
+Everything is in-process and per worker: a histogram observation is a
+bisect plus two additions, cheap enough to leave on in production.
+render() produces the Prometheus text exposition format for /metrics.
+"""
+
+import bisect
+import contextvars
+import time
+from contextlib import contextmanager
+
+# Latency buckets (seconds), from sub-millisecond CPU stages to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0)
+
+_timings = contextvars.ContextVar("timings", default=None)
+_registry = []
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        _registry.append(self)
+
+    def inc(self, *labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}   # labels -> [per-bucket counts..., +Inf count, sum]
+        _registry.append(self)
+
+    def observe(self, value, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        # Counts are stored per bucket and made cumulative at render time
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(names, labels + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    "request_duration_seconds", "End-to-end request latency.", ("route",))
+STAGE_DURATION = Histogram(
+    "stage_duration_seconds", "Latency of one pipeline stage.", ("stage",))
+UPSTREAM_RESPONSES = Counter(
+    "upstream_responses_total", "Upstream product lookups by source and status.", ("upstream", "status"))
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Cache lookups by cache and outcome.", ("cache", "outcome"))
+UPSTREAM_HEDGES = Counter(
+    "upstream_hedged_requests_total", "Hedged upstream requests by outcome.", ("upstream", "outcome"))
+UPSTREAM_FAILOVERS = Counter(
+    "upstream_failovers_total", "Upstream attempts sent to another host after a failure.", ("upstream",))
+BREAKER_TRANSITIONS = Counter(
+    "circuit_breaker_transitions_total", "Circuit breaker state changes.", ("circuit", "state"))
+LLM_ERRORS = Counter(
+    "llm_errors_total", "Failed LLM insight calls by kind.", ("kind",))
+
+
+def begin_request():
+    """Start collecting stage timings for the current request."""
+    timings = []
+    _timings.set(timings)
+    return timings
+
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_DURATION.observe(elapsed, name)
+        timings = _timings.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+def server_timing(timings, total=None):
+    """Server-Timing header value, durations in milliseconds."""
+    parts = [f"{name};dur={elapsed * 1000:.2f}" for name, elapsed in timings]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
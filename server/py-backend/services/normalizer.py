@@ -1,5 +1,8 @@
+import heapq
 import re
 
+from services.records import INGREDIENT_FIELDS, Dominant, Ingredient, Ingredients, Normalized
+
 _JUNK_PATTERNS = re.compile(
     r"do not buy|keep away|marketed by|survey no|anc no|allergen advice|"
     r"^open$|^[0-9]+$|foundamaged|direct sunlight",
@@ -16,111 +19,103 @@ def _is_junk(item):
     return False
 
 def normalize_ingredient(item):
-    return {
-        "id":                   item.get("id"),
-        "text":                 item.get("text"),
-        "percent_estimate":     item.get("percent_estimate"),
-        "percent_min":          item.get("percent_min"),
-        "percent_max":          item.get("percent_max"),
-        "vegan":                item.get("vegan"),
-        "vegetarian":           item.get("vegetarian"),
-        "ciqual_proxy_food_code": item.get("ciqual_proxy_food_code"),
-        "ciqual_food_code":     item.get("ciqual_food_code"),
-        "ecobalyse_code":       item.get("ecobalyse_code"),
-        "from_palm_oil":        item.get("from_palm_oil"),
-        "is_in_taxonomy":       item.get("is_in_taxonomy"),
-    }
+    get = item.get
+    # Positional, in Ingredient field order: keyword arguments cost twice as much here
+    return Ingredient(
+        get("id"), get("text"),
+        get("percent_estimate"), get("percent_min"), get("percent_max"),
+        get("vegan"), get("vegetarian"),
+        get("ciqual_proxy_food_code"), get("ciqual_food_code"), get("ecobalyse_code"),
+        get("from_palm_oil"), get("is_in_taxonomy"),
+    )
+
+_ADDITIVE_ID = re.compile(r"en:e\d+")
+
+def _tag_additive(tag, code, match):
+    """Additive from an additives_tags entry, filled in from its ingredient-list entry."""
+    entry = Ingredient(id=tag, text=code)
+    if match is not None:
+        for name in INGREDIENT_FIELDS:
+            value = getattr(match, name)
+            if value is not None:
+                setattr(entry, name, value)
+    return entry
 
 def is_additive(item):
     idv = item.get("id") or ""
-    return bool(re.match(r"en:e\d+", idv.lower()))
+    return _ADDITIVE_ID.match(idv.lower()) is not None
+
+def _mentions_palm(item):
+    return (
+        (item.get("from_palm_oil") or "") in ("yes", "maybe")
+        or "palm" in (item.get("id") or "")
+        or "palm" in (item.get("text") or "").lower()
+    )
 
 def normalize(extracted):
 
-    raw_ing = extracted["ingredients_raw"]["structured"]
+    raw_ing = extracted.ingredients
 
     ingredients = []
     additives_from_ingredients = []
+    contains_palm_oil = False
+    seen_text = set()
+    dom = []
 
+    # One pass: junk/additive checks run once per ingredient
     for ing in raw_ing:
+        if not contains_palm_oil and _mentions_palm(ing):
+            contains_palm_oil = True
         if _is_junk(ing):
             continue
         n = normalize_ingredient(ing)
         if is_additive(ing):
             additives_from_ingredients.append(n)
-        else:
-            ingredients.append(n)
+            continue
+        ingredients.append(n)
 
-    additives_raw = extracted.get("additives_raw") or []
+        text = (ing.get("text") or "").strip()
+        if not text or text in seen_text:
+            continue
+        pct = ing.get("percent_estimate") or 0
+        if pct > 0:
+            seen_text.add(text)
+            dom.append(Dominant(text, round(pct, 1)))
+    dom = heapq.nlargest(4, dom, key=lambda x: x.percent)
 
+    additives_raw = extracted.additives
+
+    uniq = {}
     if additives_raw:
-        uniq = {}
+        # First ingredient-level entry per lowercased id, for O(1) merging
+        by_id = {}
+        for a in additives_from_ingredients:
+            by_id.setdefault((a.id or "").lower(), a)
+
         for tag in additives_raw:
-            entry = {
-                "id":                   tag,
-                "text":                 tag.replace("en:", "").upper(),
-                "percent_estimate":     None,
-                "percent_min":          None,
-                "percent_max":          None,
-                "vegan":                None,
-                "vegetarian":           None,
-                "ciqual_proxy_food_code": None,
-                "ciqual_food_code":     None,
-                "ecobalyse_code":       None,
-                "from_palm_oil":        None,
-                "is_in_taxonomy":       None,
-            }
-            for a in additives_from_ingredients:
-                if (a.get("id") or "").lower() == tag.lower():
-                    entry.update({k: v for k, v in a.items() if v is not None})
-                    break
             code = tag.replace("en:", "").upper()
-            if code not in uniq:
-                uniq[code] = entry
-        additives = list(uniq.values())
+            if code in uniq:
+                continue
+            uniq[code] = _tag_additive(tag, code, by_id.get(tag.lower()))
     else:
-        uniq = {}
         for a in additives_from_ingredients:
-            code = (a["id"] or "").replace("en:", "").upper()
+            code = (a.id or "").replace("en:", "").upper()
             if code not in uniq:
                 uniq[code] = a
-        additives = list(uniq.values())
+    additives = list(uniq.values())
 
-    contains_palm_oil = any(
-        (i.get("from_palm_oil") or "") in ("yes", "maybe")
-        or "palm" in (i.get("id") or "")
-        or "palm" in (i.get("text") or "").lower()
-        for i in raw_ing
+    return Normalized(
+        product=   extracted.product,
+        nutrients= extracted.nutrients,
+        ingredients=Ingredients(
+            text=             extracted.ingredients_text,
+            ingredients=      ingredients,
+            additives=        additives,
+            dominant=         dom,
+            contains_palm_oil= contains_palm_oil,
+            total_count=      len(ingredients),
+        ),
+        allergens= extracted.allergens,
+        serving=   extracted.serving,
+        metadata=  extracted.metadata,
     )
-
-    seen_text = set()
-    dom = []
-    for ing in raw_ing:
-        if _is_junk(ing):
-            continue
-        if is_additive(ing):
-            continue
-        text = (ing.get("text") or "").strip()
-        if not text or text in seen_text:
-            continue
-        pct = ing.get("percent_estimate") or 0
-        if pct > 0:
-            seen_text.add(text)
-            dom.append({"ingredient": text, "percent": round(pct, 1)})
-    dom = sorted(dom, key=lambda x: x["percent"], reverse=True)[:4]
-
-    return {
-        "product":   extracted["product"],
-        "nutrients": extracted["nutrients"],
-        "ingredients": {
-            "text":             extracted["ingredients_raw"]["text"],
-            "ingredients":      ingredients,
-            "additives":        additives,
-            "dominant":         dom,
-            "contains_palm_oil": contains_palm_oil,
-            "total_count":      len(ingredients),
-        },
-        "allergens": extracted["allergens_raw"],
-        "serving":   extracted["serving"],
-        "metadata":  extracted["metadata"],
-    }
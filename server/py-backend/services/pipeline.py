@@ -0,0 +1,354 @@
+"""
+pipeline.py -- fetch → extract → normalize → analyze → insights → format,
+with in-process caching of raw OFF payloads and final responses.
+
+A stale response is served immediately and refreshed in the background.
+Concurrent misses for the same barcode share one build (single-flight).
+
+A request may ask for a subset of the response sections (see
+formatter.select_sections). Only what those sections need is computed
+(no LLM call without ai_insights, no analyze() for normalized-only
+sections), and each variant is cached under its own key. A fresh full
+response answers any variant by slicing.
+
+Responses are cached together with their encoded JSON bytes (see
+encoding.Encoded), so a cache hit is written out without re-serializing.
+
+ETags are derived from the OFF last_modified_t, the analysis version
+(scoring rules + knowledge base) and the response variant, so
+current_etag() can usually answer a conditional request from the raw
+document alone, without analyze() or the LLM. Reloading the additive
+knowledge base changes the analysis version and drops every cached
+response; a build that straddles a reload is returned but not cached.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+
+from fastapi import HTTPException
+
+from services import metrics
+from services.cache import TTLCache, FRESH, STALE
+from services.popularity import PopularityTracker
+from services.encoding import Encoded, dumps
+from services.singleflight import SingleFlight
+from services.fetcher import fetch_product_from_api
+from services.extractor import extract_product_data
+from services.normalizer import normalize
+from services.additive_kb import ADDITIVES
+from services.analyzer import analysis_version, analyze
+from services.formatter import (
+    ANALYZED_SECTIONS, SECTIONS, format_response, slice_response, variant_key,
+)
+from services.ai_insights import generate_insights
+
+log = logging.getLogger(__name__)
+
+RAW_CACHE = TTLCache(
+    "raw",
+    ttl=float(os.getenv("RAW_CACHE_TTL", "3600")),
+    max_entries=int(os.getenv("RAW_CACHE_MAX_ENTRIES", "2000")),
+    max_bytes=int(os.getenv("RAW_CACHE_MAX_BYTES", str(128 * 1024 * 1024))),
+)
+
+RESPONSE_CACHE = TTLCache(
+    "response",
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "900")),
+    stale_ttl=float(os.getenv("RESPONSE_CACHE_STALE_TTL", "3600")),
+    max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000")),
+    max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+)
+
+# Approximate request counts per barcode, feeding the prefetcher's hot list
+POPULARITY = PopularityTracker(
+    width=int(os.getenv("POPULARITY_WIDTH", "2048")),
+    depth=int(os.getenv("POPULARITY_DEPTH", "4")),
+    k=int(os.getenv("POPULARITY_TOP_K", "500")),
+)
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+_refreshing = {}   # barcode -> background refresh task
+_flight = SingleFlight()
+
+# Responses analyzed with the previous knowledge base are no longer valid
+ADDITIVES.on_reload(lambda kb: RESPONSE_CACHE.clear())
+
+
+async def fetch_raw(barcode, refresh=False):
+    """OFF product payload, from the raw cache unless `refresh` is set."""
+    if not refresh:
+        raw, state = RAW_CACHE.get(barcode)
+        metrics.CACHE_REQUESTS.inc("raw", state)
+        if state == FRESH:
+            return raw
+    raw = await fetch_product_from_api(barcode)
+    RAW_CACHE.set(barcode, raw)
+    return raw
+
+
+def _cache_key(barcode, sections):
+    variant = variant_key(sections)
+    return f"{barcode}|{variant}" if variant else barcode
+
+
+def _validator(barcode, raw, version=None):
+    """Source state a response is derived from; None without last_modified_t."""
+    last_modified = raw.get("last_modified_t")
+    if last_modified is None:
+        return None
+    return f"{barcode}|{last_modified}|{version or analysis_version()}"
+
+
+def _etag(seed):
+    return '"' + hashlib.blake2b(seed, digest_size=12).hexdigest() + '"'
+
+
+def _variant_etag(validator, sections):
+    return _etag(f"{validator}|{variant_key(sections)}".encode("utf-8"))
+
+
+def etag_for(entry, sections=None):
+    """Strong ETag of a response entry (content hash when it has no validator)."""
+    if entry.validator is None:
+        return _etag(entry.body)
+    return _variant_etag(entry.validator, sections)
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match comparison (weak, as RFC 9110 specifies for it)."""
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+async def _deterministic(barcode, sections, refresh=False):
+    """
+    fetch → extract → normalize → analyze (when `sections` need it).
+    Also returns the analysis version the result was computed with.
+    """
+    with metrics.stage("fetch"):
+        raw = await fetch_raw(barcode, refresh=refresh)
+    with metrics.stage("extract"):
+        extracted = extract_product_data(raw)
+    with metrics.stage("normalize"):
+        normalized = normalize(extracted)
+
+    analyzed = None
+    version = analysis_version()
+    if sections is None or not sections.isdisjoint(ANALYZED_SECTIONS):
+        with metrics.stage("analyze"):
+            analyzed = analyze(normalized)
+    return raw, normalized, analyzed, version
+
+
+def _finish(barcode, sections, raw, normalized, analyzed, insights, version):
+    """Format, cache and return the response entry."""
+    with metrics.stage("format"):
+        final = format_response(normalized, analyzed, ai_insights=insights, sections=sections)
+
+    # A failed LLM call is transient: keep the raw payload but not the
+    # response, and give it a content ETag so it is not revalidated later.
+    # Same for a response whose knowledge base was swapped out meanwhile.
+    if isinstance(insights, dict) and insights.get("status") == "error":
+        return Encoded(final)
+    if version != analysis_version():
+        return Encoded(final)
+    entry = Encoded(final, validator=_validator(barcode, raw, version))
+    RESPONSE_CACHE.set(_cache_key(barcode, sections), entry, size=len(entry.body))
+    return entry
+
+
+def _shared_deterministic(barcode, sections, refresh=False):
+    """_deterministic, shared by concurrent builds and streams of the variant."""
+    return _flight.do(
+        f"{_cache_key(barcode, sections)}|det",
+        lambda: _deterministic(barcode, sections, refresh=refresh),
+    )
+
+
+async def _complete(barcode, sections, deterministic):
+    """Insights (when `sections` need them) on top of a deterministic result, then _finish."""
+    raw, normalized, analyzed, version = deterministic
+    insights = None
+    if sections is None or "ai_insights" in sections:
+        with metrics.stage("insights"):
+            insights = await generate_insights(normalized, analyzed)
+
+    return _finish(barcode, sections, raw, normalized, analyzed, insights, version)
+
+
+async def build_product(barcode, refresh=False, sections=None):
+    deterministic = await _shared_deterministic(barcode, sections, refresh=refresh)
+    return await _complete(barcode, sections, deterministic)
+
+
+def _schedule_refresh(barcode, sections):
+    key = _cache_key(barcode, sections)
+    if key in _refreshing:
+        return
+    task = asyncio.create_task(
+        _flight.do(key, lambda: build_product(barcode, refresh=True, sections=sections))
+    )
+    _refreshing[key] = task
+    task.add_done_callback(lambda t: _refresh_done(key, t))
+
+
+def _refresh_done(key, task):
+    _refreshing.pop(key, None)
+    if not task.cancelled() and task.exception() is not None:
+        log.warning("Background refresh failed for %s: %s", key, task.exception())
+
+
+def _slice(full, sections):
+    return Encoded(slice_response(full.value, sections), validator=full.validator)
+
+
+async def get_product_entry(barcode, sections=None):
+    """Product response as an Encoded (value + JSON bytes)."""
+    POPULARITY.record(barcode)
+    if sections is not None:
+        full = RESPONSE_CACHE.peek(barcode)
+        if full is not None:
+            metrics.CACHE_REQUESTS.inc("response", "sliced")
+            return _slice(full, sections)
+
+    key = _cache_key(barcode, sections)
+    cached, state = RESPONSE_CACHE.get(key)
+    metrics.CACHE_REQUESTS.inc("response", state)
+    if state == FRESH:
+        return cached
+    if state == STALE:
+        _schedule_refresh(barcode, sections)
+        return cached
+    return await _flight.do(key, lambda: build_product(barcode, sections=sections))
+
+
+async def current_etag(barcode, sections=None):
+    """
+    ETag the response for this variant would carry, from a fresh cached
+    response or else from the raw OFF document (one fetch, no analysis).
+    None when it cannot be known without building the response.
+    """
+    POPULARITY.record(barcode)
+    entry = RESPONSE_CACHE.peek(_cache_key(barcode, sections))
+    if entry is None and sections is not None:
+        full = RESPONSE_CACHE.peek(barcode)
+        if full is not None:
+            # get_product_entry would answer with a slice of it; without a
+            # validator that slice's ETag is a hash of its own content
+            entry = full if full.validator is not None else _slice(full, sections)
+    if entry is not None:
+        return etag_for(entry, sections)
+
+    with metrics.stage("fetch"):
+        raw = await fetch_raw(barcode)
+    validator = _validator(barcode, raw)
+    return None if validator is None else _variant_etag(validator, sections)
+
+
+async def refresh_product(barcode):
+    """Rebuild the full response from a fresh OFF fetch (shares in-flight builds)."""
+    return await _flight.do(barcode, lambda: build_product(barcode, refresh=True))
+
+
+async def get_product_response(barcode, sections=None):
+    return (await get_product_entry(barcode, sections)).value
+
+
+def _cached_entry(barcode, sections):
+    """Fresh cached response for this variant, or a full one to slice from."""
+    entry = RESPONSE_CACHE.peek(_cache_key(barcode, sections))
+    if entry is None and sections is not None:
+        entry = RESPONSE_CACHE.peek(barcode)
+    return entry
+
+
+async def stream_product(barcode, sections=None):
+    """
+    Progressive product response: yields ("analysis", Encoded) with every
+    requested section except ai_insights as soon as the deterministic
+    stages finish, then ("insights", Encoded) once the LLM answers (or
+    with its error/unavailable status). Without ai_insights in `sections`
+    only the first event is produced.
+
+    A fresh cached response answers both events at once. Otherwise the
+    complete response is built and cached as build_product would, sharing
+    in-flight work with it.
+    """
+    POPULARITY.record(barcode)
+    wants_insights = sections is None or "ai_insights" in sections
+    early = frozenset(SECTIONS if sections is None else sections) - {"ai_insights"}
+
+    cached = _cached_entry(barcode, sections)
+    if cached is not None:
+        metrics.CACHE_REQUESTS.inc("response", "fresh")
+        yield "analysis", Encoded(slice_response(cached.value, early))
+        if wants_insights:
+            yield "insights", Encoded(cached.value["ai_insights"])
+        return
+
+    metrics.CACHE_REQUESTS.inc("response", "miss")
+    # Both stages run under the single-flight keys build_product uses, so
+    # concurrent streamed and plain misses share one fetch and one LLM call
+    deterministic = await _shared_deterministic(barcode, sections)
+    _, normalized, analyzed, _ = deterministic
+    with metrics.stage("format"):
+        yield "analysis", Encoded(format_response(normalized, analyzed, sections=early))
+    if not wants_insights:
+        return
+
+    key = _cache_key(barcode, sections)
+    try:
+        entry = await _flight.do(key, lambda: _complete(barcode, sections, deterministic))
+        insights = entry.value["ai_insights"]
+    except Exception:
+        log.exception("Insights failed for %s", barcode)
+        insights = {"status": "error", "reason": "Internal error"}
+    yield "insights", Encoded(insights)
+
+
+async def _batch_item(barcode, sem, sections):
+    async with sem:
+        try:
+            entry = await get_product_entry(barcode, sections)
+        except HTTPException as e:
+            return dumps({"barcode": barcode, "status": e.status_code, "error": e.detail})
+        except Exception:
+            log.exception("Batch item failed for %s", barcode)
+            return dumps({"barcode": barcode, "status": 500, "error": "Internal error"})
+    # Splice the pre-encoded product in rather than re-encoding it
+    return b'{"barcode":' + dumps(barcode) + b',"status":200,"product":' + entry.body + b"}"
+
+
+async def stream_batch(barcodes, concurrency=BATCH_CONCURRENCY, sections=None):
+    """
+    Yield one NDJSON line per unique barcode, in completion order.
+    A failing barcode produces an error line instead of aborting the batch.
+    """
+    unique = list(dict.fromkeys(b.strip() for b in barcodes if b and b.strip()))
+    sem = asyncio.Semaphore(concurrency)
+    tasks = [asyncio.create_task(_batch_item(b, sem, sections)) for b in unique]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done + b"\n"
+    finally:
+        # Client went away mid-stream: stop the remaining work
+        for t in tasks:
+            t.cancel()
+
+
+def singleflight_stats():
+    return _flight.stats()
+
+
+def cache_stats():
+    return {
+        "raw":      RAW_CACHE.stats(),
+        "response": RESPONSE_CACHE.stats(),
+        "refreshing": len(_refreshing),
+    }
@@ -0,0 +1,131 @@
+"""
+popularity.py -- Approximate per-barcode request counts and the hot list.
+
+A count-min sketch (`depth` rows of `width` counters) estimates how often
+each barcode was requested in constant memory, however many distinct
+barcodes show up. A small top-K table keeps the barcodes with the highest
+estimates. decay() halves every counter so popularity follows recent
+traffic rather than all-time totals.
+
+The hot list (top-K with counts) is persisted as JSON so a restarted
+worker knows what to warm before the first request arrives.
+"""
+
+import array
+import hashlib
+import json
+import logging
+import os
+
+log = logging.getLogger(__name__)
+
+_MASK = (1 << 32) - 1
+
+
+class CountMinSketch:
+
+    def __init__(self, width=2048, depth=4):
+        self.width = width
+        self.depth = depth
+        self.rows = [array.array("L", [0]) * width for _ in range(depth)]
+
+    def _indexes(self, key):
+        # Double hashing: row i uses h1 + i*h2, from one 64-bit digest
+        h = int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+        h1, h2 = h & _MASK, (h >> 32) | 1
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def add(self, key, count=1):
+        """Count `key` and return its new estimate."""
+        estimate = None
+        for row, i in zip(self.rows, self._indexes(key)):
+            row[i] += count
+            if estimate is None or row[i] < estimate:
+                estimate = row[i]
+        return estimate
+
+    def estimate(self, key):
+        return min(row[i] for row, i in zip(self.rows, self._indexes(key)))
+
+    def decay(self):
+        for row in self.rows:
+            for i, v in enumerate(row):
+                if v:
+                    row[i] = v >> 1
+
+
+class PopularityTracker:
+
+    def __init__(self, width=2048, depth=4, k=500):
+        self.sketch = CountMinSketch(width, depth)
+        self.k = k
+        self._top = {}   # barcode -> estimate, at most k entries
+        self._floor = 0  # lower bound of the smallest estimate in _top
+        self.recorded = 0
+
+    def record(self, barcode):
+        self.recorded += 1
+        estimate = self.sketch.add(barcode)
+        if barcode in self._top or len(self._top) < self.k:
+            self._top[barcode] = estimate
+            return
+        # Most requests are for cold barcodes: skip the O(k) scan for them
+        if estimate <= self._floor:
+            return
+        coldest = min(self._top, key=self._top.get)
+        self._floor = self._top[coldest]
+        if estimate > self._floor:
+            del self._top[coldest]
+            self._top[barcode] = estimate
+            self._floor = min(self._top.values())
+
+    def top(self, n=None):
+        """[(barcode, estimate)], most requested first."""
+        ranked = sorted(self._top.items(), key=lambda kv: kv[1], reverse=True)
+        return ranked if n is None else ranked[:n]
+
+    def decay(self):
+        self.sketch.decay()
+        self._top = {b: c >> 1 for b, c in self._top.items() if c >> 1}
+        self._floor = 0
+
+    def seed(self, hot):
+        """Prime the tracker from a persisted hot list [(barcode, count)]."""
+        for barcode, count in hot:
+            estimate = self.sketch.add(barcode, count)
+            if len(self._top) < self.k or barcode in self._top:
+                self._top[barcode] = estimate
+
+    def stats(self):
+        top = self.top(5)
+        return {
+            "recorded": self.recorded,
+            "tracked":  len(self._top),
+            "k":        self.k,
+            "sketch":   f"{self.sketch.depth}x{self.sketch.width}",
+            "top":      [{"barcode": b, "count": c} for b, c in top],
+        }
+
+
+def load_hot_list(path):
+    """[(barcode, count)] from `path`, or [] if missing or unreadable."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return [(str(item["barcode"]), int(item["count"])) for item in data["hot"]]
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        log.warning("Ignoring unreadable hot list %s: %s", path, e)
+        return []
+
+
+def save_hot_list(path, hot):
+    """Write [(barcode, count)] atomically; several workers may share `path`."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"hot": [{"barcode": b, "count": c} for b, c in hot]}, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        log.warning("Could not save hot list %s: %s", path, e)
@@ -0,0 +1,200 @@
+"""
+prefetch.py -- Background warm-up and refresh of popular products.
+
+On startup the persisted hot list seeds the popularity tracker and the
+hottest products are built into the response cache before users ask for
+them. Afterwards, every PREFETCH_INTERVAL seconds, each of the top
+PREFETCH_TOP_N barcodes whose cached response is missing or has less than
+PREFETCH_LEAD seconds of freshness left is rebuilt from a fresh OFF
+fetch, so popular products rarely reach a user stale or cold.
+
+Every build costs at least one OFF request (and an LLM call when the
+insight cache misses), so builds draw from a token bucket of
+PREFETCH_BUDGET per minute, shared by warm-up and refresh. Barcodes whose
+build fails are left alone for a while instead of burning the budget.
+The hot list is saved every tick and on shutdown if any request was
+recorded since the last save; the counts are halved every
+POPULARITY_DECAY_INTERVAL seconds.
+"""
+
+import asyncio
+import logging
+import os
+import time
+
+from services import pipeline
+from services.popularity import load_hot_list, save_hot_list
+
+log = logging.getLogger(__name__)
+
+PREFETCH             = os.getenv("PREFETCH", "1").lower() in ("1", "true", "yes")
+PREFETCH_TOP_N       = int(os.getenv("PREFETCH_TOP_N", "100"))
+PREFETCH_INTERVAL    = float(os.getenv("PREFETCH_INTERVAL", "30"))
+PREFETCH_LEAD        = float(os.getenv("PREFETCH_LEAD", "120"))
+PREFETCH_BUDGET      = float(os.getenv("PREFETCH_BUDGET", "30"))
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "4"))
+POPULARITY_DECAY_INTERVAL = float(os.getenv("POPULARITY_DECAY_INTERVAL", "3600"))
+# Runtime state, so kept out of the source tree by default (next to the insight cache)
+_DEFAULT_HOT_LIST_PATH = os.path.join(
+    os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "food-analyzer", "hotlist.json",
+)
+HOT_LIST_PATH = os.getenv("HOT_LIST_PATH", _DEFAULT_HOT_LIST_PATH)
+
+# Skip a barcode for this many intervals after a failed build
+_FAILURE_BACKOFF = 10
+
+
+class Budget:
+    """Token bucket: `per_minute` tokens per minute, bursting up to one minute's worth."""
+
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self._last = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class Prefetcher:
+
+    def __init__(self, tracker, path=HOT_LIST_PATH, top_n=PREFETCH_TOP_N,
+                 interval=PREFETCH_INTERVAL, lead=PREFETCH_LEAD, budget=PREFETCH_BUDGET,
+                 concurrency=PREFETCH_CONCURRENCY, decay_interval=POPULARITY_DECAY_INTERVAL):
+        self.tracker = tracker
+        self.path = path
+        self.top_n = top_n
+        self.interval = interval
+        self.lead = lead
+        self.budget = Budget(budget)
+        self.concurrency = concurrency
+        self.decay_interval = decay_interval
+
+        self._task = None
+        self._failed = {}   # barcode -> monotonic time of the last failed build
+        self._last_decay = time.monotonic()
+        self._saved_recorded = 0    # tracker.recorded at the last save
+
+        self.warmed = 0
+        self.refreshed = 0
+        self.failed = 0
+        self.over_budget = 0
+        self.ticks = 0
+
+    def due(self):
+        """Top barcodes whose cached response is missing or about to go stale."""
+        now = time.monotonic()
+        backoff = _FAILURE_BACKOFF * self.interval
+        due = []
+        for barcode, _ in self.tracker.top(self.top_n):
+            if now - self._failed.get(barcode, -backoff) < backoff:
+                continue
+            remaining = pipeline.RESPONSE_CACHE.expires_in(barcode)
+            if remaining is None or remaining < self.lead:
+                due.append(barcode)
+        return due
+
+    async def _build(self, barcode, sem):
+        async with sem:
+            try:
+                await pipeline.refresh_product(barcode)
+                return True
+            except Exception as e:
+                self._failed[barcode] = time.monotonic()
+                self.failed += 1
+                log.info("Prefetch of %s failed: %s", barcode, e)
+                return False
+
+    async def _run_builds(self, barcodes):
+        allowed = []
+        for barcode in barcodes:
+            if not self.budget.take():
+                self.over_budget += len(barcodes) - len(allowed)
+                break
+            allowed.append(barcode)
+        sem = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(*(self._build(b, sem) for b in allowed))
+        return sum(results)
+
+    async def warm(self):
+        hot = load_hot_list(self.path)
+        if not hot:
+            return
+        self.tracker.seed(hot)
+        self.warmed += await self._run_builds(self.due())
+        log.info("Warmed %d of %d hot products", self.warmed, min(len(hot), self.top_n))
+
+    async def tick(self):
+        self.ticks += 1
+        self.refreshed += await self._run_builds(self.due())
+        if time.monotonic() - self._last_decay >= self.decay_interval:
+            self.tracker.decay()
+            self._last_decay = time.monotonic()
+        self._saved_recorded = 0    # tracker.recorded at the last save
+        self.save()
+
+    def save(self):
+        """Persist the hot list, unless nothing was recorded since the last save."""
+        if self.tracker.recorded == self._saved_recorded:
+            return
+        if self.path == _DEFAULT_HOT_LIST_PATH:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            except OSError as e:
+                log.warning("Could not save hot list %s: %s", self.path, e)
+                return
+        save_hot_list(self.path, self.tracker.top())
+        self._saved_recorded = self.tracker.recorded
+
+    async def _loop(self):
+        await self.warm()
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.tick()
+            except Exception:
+                log.exception("Prefetch tick failed")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.save()
+
+    def stats(self):
+        return {
+            "warmed":      self.warmed,
+            "refreshed":   self.refreshed,
+            "failed":      self.failed,
+            "over_budget": self.over_budget,
+            "ticks":       self.ticks,
+            "budget_tokens": round(self.budget.tokens, 1),
+            "popularity":  self.tracker.stats(),
+        }
+
+
+_prefetcher = None
+
+
+def get_prefetcher():
+    """The worker's prefetcher; None when PREFETCH is off."""
+    global _prefetcher
+    if _prefetcher is None and PREFETCH:
+        _prefetcher = Prefetcher(pipeline.POPULARITY)
+    return _prefetcher
@@ -0,0 +1,47 @@
+"""
+product_store.py -- Local SQLite store of analyzed products.
+
+Holds the same JSON document GET /product/{barcode} returns (without AI
+insights), keyed by barcode. Written by the offline ingestion tool.
+"""
+
+import json
+import sqlite3
+import time
+
+
+class ProductStore:
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS products ("
+            " barcode TEXT PRIMARY KEY,"
+            " analysis TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def put_many(self, rows):
+        """rows: iterable of (barcode, analysis_json) pairs. Commits once."""
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO products (barcode, analysis, updated_at) VALUES (?, ?, ?)",
+            ((barcode, doc, now) for barcode, doc in rows),
+        )
+        self.conn.commit()
+
+    def get(self, barcode):
+        row = self.conn.execute(
+            "SELECT analysis FROM products WHERE barcode = ?", (barcode,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
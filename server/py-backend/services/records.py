@@ -0,0 +1,192 @@
+"""
+records.py -- Typed records passed between the pipeline stages.
+
+extract_product_data → Extracted, normalize → Normalized, analyze →
+Analysis. They are slotted dataclasses: one fixed-size object per record
+instead of a dict per product, ingredient, additive or nutrient row, and
+attribute access instead of string-keyed lookups.
+
+format_response puts the records straight into the response; they
+become JSON only when the response is encoded (orjson serializes
+dataclasses natively, encoding.dumps converts them on the stdlib path).
+Field order is the key order of the JSON objects.
+"""
+
+from dataclasses import dataclass, fields
+
+
+@dataclass(slots=True)
+class Product:
+    code: str | None = None
+    name: str = "Unknown"
+    brand: str = "Unknown"
+    image: str | None = None
+    quantity: str | None = None
+    categories: list = None
+
+
+@dataclass(slots=True)
+class Nutrients:
+    """Per 100 g (or per serving, see Serving.nutrition_data_per); None when unreported."""
+
+    energy_kcal: float | None = None
+    fat: float | None = None
+    saturated_fat: float | None = None
+    carbohydrates: float | None = None
+    sugars: float | None = None
+    fiber: float | None = None
+    protein: float | None = None
+    salt: float | None = None
+    cholesterol: float | None = None
+
+    def get(self, name, default=None):
+        """Value by nutrient name, `default` for names that are not tracked."""
+        return getattr(self, name, default)
+
+    def items(self):
+        return [(name, getattr(self, name)) for name in NUTRIENT_NAMES]
+
+
+NUTRIENT_NAMES = tuple(f.name for f in fields(Nutrients))
+
+
+@dataclass(slots=True)
+class Ingredient:
+    """One normalized ingredient; additives found in the ingredient list use it too."""
+
+    id: str | None = None
+    text: str | None = None
+    percent_estimate: float | None = None
+    percent_min: float | None = None
+    percent_max: float | None = None
+    vegan: str | None = None
+    vegetarian: str | None = None
+    ciqual_proxy_food_code: str | None = None
+    ciqual_food_code: str | None = None
+    ecobalyse_code: str | None = None
+    from_palm_oil: str | None = None
+    is_in_taxonomy: int | None = None
+
+
+INGREDIENT_FIELDS = tuple(f.name for f in fields(Ingredient))
+
+
+@dataclass(slots=True)
+class Dominant:
+    ingredient: str
+    percent: float
+
+
+@dataclass(slots=True)
+class Ingredients:
+    text: str
+    ingredients: list      # [Ingredient]
+    additives: list        # [Ingredient]
+    dominant: list         # [Dominant], largest first
+    contains_palm_oil: bool
+    total_count: int
+
+
+@dataclass(slots=True)
+class Serving:
+    serving_size: str | None = None
+    serving_size_g: float | None = None
+    nutrition_data_per: str = "100g"
+
+
+@dataclass(slots=True)
+class Metadata:
+    nova_group: int | None = None
+    nova_group_error: str | None = None
+    nutriscore_grade: str | None = None
+    nutrient_levels: dict = None
+    ecoscore: str | None = None
+    packaging: list = None
+    labels: list = None
+    off_completeness: float | None = None
+    data_quality_warnings: list = None
+    food_groups: list = None
+    countries: list = None
+    last_modified_t: int | None = None
+
+
+@dataclass(slots=True)
+class Extracted:
+    product: Product
+    nutrients: Nutrients
+    ingredients_text: str
+    ingredients: list      # flattened OFF ingredient dicts, as received
+    additives: list        # OFF additives_tags
+    allergens: list
+    serving: Serving
+    metadata: Metadata
+
+
+@dataclass(slots=True)
+class Normalized:
+    product: Product
+    nutrients: Nutrients
+    ingredients: Ingredients
+    allergens: list
+    serving: Serving
+    metadata: Metadata
+
+
+@dataclass(slots=True)
+class Highlights:
+    health_score: int
+    verdict: str
+    likes: list
+    concerns: list
+    nova_group: int | None
+
+
+@dataclass(slots=True)
+class NutrientRow:
+    name: str
+    amount_100g: float
+    unit: str
+    rda_percent: float
+    rating: str
+
+
+@dataclass(slots=True)
+class Radar:
+    salt: float
+    saturated_fat: float
+    sugars: float
+    energy: float
+    fiber: float
+    protein: float
+
+
+@dataclass(slots=True)
+class Additive:
+    """An additive with its knowledge-base entry."""
+
+    code: str
+    name: str
+    category: str
+    risk: str
+    explanation: str
+
+
+@dataclass(slots=True)
+class ServingAnalysis:
+    per_100g: Nutrients
+    per_serving: dict | None
+    serving_size_g: float | None
+
+
+@dataclass(slots=True)
+class Analysis:
+    highlights: Highlights
+    nutrients: list        # [NutrientRow]
+    nutrient_radar: Radar
+    additives_full: list   # [Additive]
+    serving: ServingAnalysis
+
+
+def to_json(value):
+    """Shallow dict of a record (for JSON encoders that do not know dataclasses)."""
+    return {name: getattr(value, name) for name in value.__slots__}
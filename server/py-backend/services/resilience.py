@@ -0,0 +1,116 @@
+"""
+resilience.py -- Circuit breaker and latency window for upstream calls.
+
+CircuitBreaker opens after `failures` consecutive failures and then
+rejects calls for `cooldown` seconds, so a dead upstream costs a request
+nothing instead of a full timeout. After the cooldown one call is let
+through as a probe (half-open): success closes the breaker, failure
+opens it for another cooldown.
+
+LatencyWindow keeps the most recent successful latencies of an upstream
+and answers percentile queries over them (used to time hedged requests).
+"""
+
+import logging
+import time
+from collections import deque
+
+from services import metrics
+
+log = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+
+    def __init__(self, name, failures=5, cooldown=30.0):
+        self.name = name
+        self.threshold = failures
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def _move(self, state):
+        if state != self.state:
+            self.state = state
+            metrics.BREAKER_TRANSITIONS.inc(self.name, state)
+            if state == OPEN:
+                self.opened += 1
+                log.warning("Circuit for %s opened after %d failures", self.name, self.failures)
+            elif state == CLOSED:
+                log.info("Circuit for %s closed", self.name)
+
+    def allow(self):
+        """
+        True if a call may go out now. In half-open state this claims the
+        single probe slot: the caller must report success(), failure() or
+        release().
+        """
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.cooldown:
+                return False
+            self._move(HALF_OPEN)
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def success(self):
+        self.failures = 0
+        self._probing = False
+        self._move(CLOSED)
+
+    def failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == HALF_OPEN or self.failures >= self.threshold:
+            self._opened_at = time.monotonic()
+            self._move(OPEN)
+
+    def release(self):
+        """The call was abandoned (e.g. it lost a hedge) without an outcome."""
+        self._probing = False
+
+    def retry_after(self):
+        """Seconds until the next probe may go out (0 unless open)."""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+
+    def stats(self):
+        return {
+            "state":    self.state,
+            "failures": self.failures,
+            "opened":   self.opened,
+            "retry_after": round(self.retry_after(), 1),
+        }
+
+
+class LatencyWindow:
+
+    def __init__(self, size=256, min_samples=20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=size)
+        self._sorted = None
+
+    def add(self, seconds):
+        self._samples.append(seconds)
+        self._sorted = None
+
+    def percentile(self, p):
+        """p-th percentile of the window, or None until min_samples are in."""
+        if len(self._samples) < self.min_samples:
+            return None
+        if self._sorted is None:
+            self._sorted = sorted(self._samples)
+        ordered = self._sorted
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    def __len__(self):
+        return len(self._samples)
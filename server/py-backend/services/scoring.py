@@ -0,0 +1,267 @@
+"""
+scoring.py -- Small rule engine for the tables in scoring_rules.py.
+
+Rule tables are compiled once at import into tuples of operator functions,
+thresholds and pre-split outcomes. A RulePlan evaluates its rules in order
+against a dict of facts (analyze) or a dict of NumPy columns (analyze_batch).
+
+Set SCORING_STATS=1 (or call enable_stats()) to record, per rule, how
+often each band fires and the time spent evaluating it; read them with
+rule_stats(). Off by default, and free when off.
+"""
+
+import operator
+import os
+import time
+
+from services import scoring_rules
+
+
+def _in(value, options):
+    return value in options
+
+
+def _truthy(value, _):
+    return bool(value)
+
+
+def _missing(value, _):
+    return value is None
+
+
+def _present(value, _):
+    return value is not None
+
+
+_OPS = {
+    ">":  operator.gt,
+    ">=": operator.ge,
+    "<":  operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "in": _in,
+    "truthy":  _truthy,
+    "missing": _missing,
+    "present": _present,
+}
+
+_stats_enabled = os.getenv("SCORING_STATS", "0").lower() in ("1", "true", "yes")
+_stats = {}   # rule name -> {"evaluations", "time_ns", "hits": {label: count}}
+
+
+def enable_stats(enabled=True):
+    global _stats_enabled
+    _stats_enabled = enabled
+
+
+def reset_stats():
+    _stats.clear()
+
+
+def rule_stats():
+    """Per-rule evaluation counts, band hit counts and mean time."""
+    out = {}
+    for name, s in _stats.items():
+        n = s["evaluations"]
+        out[name] = {
+            "evaluations": n,
+            "hits":        dict(s["hits"]),
+            "time_us_total": round(s["time_ns"] / 1000, 1),
+            "time_us_mean":  round(s["time_ns"] / 1000 / n, 3) if n else None,
+        }
+    return out
+
+
+def _compile_outcome(outcome):
+    if outcome is None:
+        return None
+    delta, kind, message = outcome
+    return (delta, kind, message, bool(message) and "{value}" in message)
+
+
+def _compile_cond(cond):
+    field, op, value = cond
+    return (field, op, _OPS[op], value)
+
+
+class Rule:
+    __slots__ = ("name", "field", "when", "missing", "bands", "otherwise")
+
+    def __init__(self, spec):
+        self.name = spec["name"]
+        self.field = spec["field"]
+        self.when = tuple(_compile_cond(c) for c in spec.get("when", ()))
+        self.missing = _compile_outcome(spec.get("missing"))
+        self.otherwise = _compile_outcome(spec.get("otherwise"))
+        bands = []
+        for band in spec["bands"]:
+            op, threshold, outcome = band[:3]
+            guard = _compile_cond(band[3]) if len(band) > 3 else None
+            label = op if threshold is None else f"{op}{threshold}"
+            bands.append((label, op, _OPS[op], threshold, _compile_outcome(outcome), guard))
+        self.bands = tuple(bands)
+
+    def match(self, facts):
+        """Return (label, outcome, value) for one product; outcome may be None."""
+        if self.when:
+            for field, _, fn, expected in self.when:
+                if not _check(fn, facts.get(field), expected):
+                    return None, None, None
+        value = facts.get(self.field)
+        if value is None:
+            return "missing", self.missing, value
+        for label, _, fn, threshold, outcome, guard in self.bands:
+            if fn(value, threshold):
+                if guard is None or _check(guard[2], facts.get(guard[0]), guard[3]):
+                    return label, outcome, value
+        return "otherwise", self.otherwise, value
+
+
+def _check(fn, value, expected):
+    # Comparisons against a missing value are simply false
+    if value is None and fn not in (_missing, _present, _truthy):
+        return False
+    return fn(value, expected)
+
+
+def _apply(outcome, value, likes, concerns):
+    delta, kind, message, templated = outcome
+    if kind is not None:
+        text = message.format(value=value) if templated else message
+        (likes if kind == "like" else concerns).append(text)
+    return delta
+
+
+class RulePlan:
+
+    def __init__(self, rules):
+        self.rules = tuple(Rule(spec) for spec in rules)
+
+    def run(self, facts, likes, concerns):
+        """Evaluate every rule; append messages, return the total score delta."""
+        if _stats_enabled:
+            return self._run_with_stats(facts, likes, concerns)
+        delta = 0
+        for rule in self.rules:
+            _, outcome, value = rule.match(facts)
+            if outcome is None:
+                continue
+            delta += outcome[0]
+            kind = outcome[1]
+            if kind is not None:
+                text = outcome[2].format(value=value) if outcome[3] else outcome[2]
+                (likes if kind == "like" else concerns).append(text)
+        return delta
+
+    def _run_with_stats(self, facts, likes, concerns):
+        delta = 0
+        for rule in self.rules:
+            start = time.perf_counter_ns()
+            label, outcome, value = rule.match(facts)
+            if outcome is not None:
+                delta += _apply(outcome, value, likes, concerns)
+            elapsed = time.perf_counter_ns() - start
+
+            s = _stats.get(rule.name)
+            if s is None:
+                s = _stats[rule.name] = {"evaluations": 0, "time_ns": 0, "hits": {}}
+            s["evaluations"] += 1
+            s["time_ns"] += elapsed
+            if label is not None and outcome is not None:
+                s["hits"][label] = s["hits"].get(label, 0) + 1
+        return delta
+
+    def run_batch(self, cols):
+        """Vectorized run over NumPy columns (NaN = missing); returns delta array."""
+        import numpy as np
+
+        size = len(next(iter(cols.values())))
+        delta = np.zeros(size, dtype=np.int64)
+        for rule in self.rules:
+            active = np.ones(size, dtype=bool)
+            for field, op, _, expected in rule.when:
+                active &= _vec_check(np, op, cols[field], expected)
+
+            value = cols[rule.field]
+            missing = _vec_missing(np, value)
+            undecided = active & ~missing
+            if rule.missing is not None:
+                delta += np.where(active & missing, rule.missing[0], 0)
+            for _, op, _, threshold, outcome, guard in rule.bands:
+                hit = undecided & _vec_check(np, op, value, threshold)
+                if guard is not None:
+                    hit &= _vec_check(np, guard[1], cols[guard[0]], guard[3])
+                delta += np.where(hit, outcome[0], 0)
+                undecided &= ~hit
+            if rule.otherwise is not None:
+                delta += np.where(undecided, rule.otherwise[0], 0)
+        return delta
+
+
+def _vec_missing(np, values):
+    values = np.asarray(values)
+    if values.dtype.kind == "f":
+        return np.isnan(values)
+    return np.zeros(values.shape, dtype=bool)
+
+
+def _vec_check(np, op, values, expected):
+    values = np.asarray(values)
+    if op == "missing":
+        return _vec_missing(np, values)
+    if op == "present":
+        return ~_vec_missing(np, values)
+    if op == "truthy":
+        return values.astype(bool) & ~_vec_missing(np, values)
+    if op == "in":
+        return np.isin(values, expected)
+    return _OPS[op](values, expected)
+
+
+class RatingTable:
+    """Compiled RATING_BANDS: nutrient value → traffic-light colour."""
+
+    def __init__(self, table):
+        self.table = {
+            metric: (
+                tuple((op, _OPS[op], threshold, colour) for op, threshold, colour in spec["bands"]),
+                spec["otherwise"],
+            )
+            for metric, spec in table.items()
+        }
+
+    def rate(self, metric, value):
+        if value is None:
+            return "neutral"
+        spec = self.table.get(metric)
+        if spec is None:
+            return "neutral"
+        bands, otherwise = spec
+        for _, fn, threshold, colour in bands:
+            if fn(value, threshold):
+                return colour
+        return otherwise
+
+    def rate_batch(self, metric, values):
+        import numpy as np
+
+        values = np.asarray(values, dtype=float)
+        spec = self.table.get(metric)
+        if spec is None:
+            return np.full(values.shape, "neutral")
+        bands, otherwise = spec
+        missing = np.isnan(values)
+        conds = [~missing & fn(values, threshold) for _, fn, threshold, _ in bands]
+        return np.select(conds + [~missing], [c for *_, c in bands] + [otherwise], "neutral")
+
+
+def verdict_for(score):
+    for minimum, verdict in scoring_rules.VERDICTS:
+        if score >= minimum:
+            return verdict
+    return scoring_rules.VERDICTS[-1][1]
+
+
+NUTRITION_PLAN    = RulePlan(scoring_rules.NUTRITION_RULES)
+DATA_QUALITY_PLAN = RulePlan(scoring_rules.DATA_QUALITY_RULES)
+RATINGS           = RatingTable(scoring_rules.RATING_BANDS)
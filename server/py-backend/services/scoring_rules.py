@@ -0,0 +1,203 @@
+"""
+scoring_rules.py -- Thresholds and score deltas used by the analyzer.
+
+Pure data: services/scoring.py compiles these tables once at import.
+To retune scoring, edit the numbers here; analyze(), rating_color() and
+analyze_batch() all read from the same tables.
+
+Rule format
+    name       unique rule name (used in hit counters)
+    field      fact the rule looks at (see analyzer._facts)
+    when       optional [(field, op, value)] preconditions; rule is skipped
+               unless all hold
+    missing    outcome when the field is None / NaN
+    bands      [(op, threshold, outcome)] or [(op, threshold, outcome, guard)];
+               the first matching band wins, guard is an extra (field, op, value)
+    otherwise  outcome when the value is present but no band matched
+
+An outcome is (score_delta, kind, message) with kind "like", "concern" or
+None (score only). Messages may use {value}.
+"""
+
+# ── shared nutrient limits (per 100 g) ───────────────────────────────
+SALT_HIGH          = 1.5
+SALT_MODERATE      = 0.6
+SALT_IMPLAUSIBLE   = 10      # above this on a non-condiment → data error
+SAT_FAT_HIGH       = 5
+SAT_FAT_MODERATE   = 2.5
+FAT_HIGH           = 17.5
+FAT_MODERATE       = 10
+SUGARS_HIGH        = 15
+
+NUTRITION_RULES = [
+    {
+        "name": "salt", "field": "salt_scored",
+        "missing": (-5, "concern", "Salt content not reported"),
+        "bands": [
+            (">", SALT_HIGH,     (-25, "concern", "Very high salt")),
+            (">", SALT_MODERATE, (-12, "concern", "Moderate salt")),
+        ],
+        "otherwise": (0, "like", "Low salt"),
+    },
+    {
+        "name": "saturated_fat", "field": "saturated_fat",
+        "missing": (-5, "concern", "Saturated fat not reported"),
+        "bands": [
+            (">", SAT_FAT_HIGH,     (-20, "concern", "High saturated fat")),
+            (">", SAT_FAT_MODERATE, (-8,  "concern", "Moderate saturated fat")),
+        ],
+        "otherwise": (0, "like", "Low saturated fat"),
+    },
+    {
+        "name": "total_fat", "field": "fat",
+        "bands": [
+            (">", FAT_HIGH,     (-10, "concern", "High total fat")),
+            (">", FAT_MODERATE, (-4,  None, None)),
+        ],
+    },
+    {
+        "name": "sat_fat_ratio", "field": "sat_fat_ratio",
+        "bands": [
+            (">", 0.5, (-3, "concern", "High saturated-to-total fat ratio")),
+            ("<", 0.3, (2, "like", "Healthy fat profile"), ("fat", ">", 5)),
+        ],
+    },
+    {
+        # tightened to WHO guidance
+        "name": "sugars", "field": "sugars",
+        "missing": (-3, "concern", "Sugar content not reported"),
+        "bands": [
+            (">", SUGARS_HIGH, (-20, "concern", "Very high sugar")),
+            (">", 10,          (-10, "concern", "High sugar")),
+            (">", 5,           (-4,  "concern", "Moderate sugar")),
+        ],
+        "otherwise": (0, "like", "Low sugar"),
+    },
+    {
+        "name": "fiber", "field": "fiber",
+        "bands": [
+            (">=", 5, (8, "like", "Excellent fiber content")),
+            (">=", 3, (4, "like", "Good fiber content")),
+            ("<",  1, (-3, None, None)),
+        ],
+    },
+    {
+        "name": "protein", "field": "protein",
+        "bands": [
+            (">=", 15, (7, "like", "Excellent protein content")),
+            (">=", 10, (5, "like", "High protein")),
+        ],
+    },
+    {
+        "name": "energy", "field": "energy_kcal",
+        "bands": [
+            (">", 450, (-10, "concern", "Very high calorie density")),
+            (">", 300, (-5,  "concern", "High calorie density")),
+            ("<", 100, (3,   "like",    "Low calorie")),
+        ],
+    },
+    {
+        # > 100 mg per 100 g
+        "name": "cholesterol", "field": "cholesterol",
+        "bands": [(">", 0.1, (-5, "concern", "High cholesterol"))],
+    },
+    {
+        "name": "trans_fat", "field": "trans_fat",
+        "bands": [(">", 0, (-10, "concern", "Contains trans fat"))],
+    },
+    {
+        "name": "carbohydrates", "field": "carbohydrates",
+        "bands": [(">", 70, (-3, "concern", "Very high carbohydrate content"))],
+    },
+    {
+        "name": "nova", "field": "nova_group",
+        "bands": [
+            ("==", 4,      (-15, "concern", "Ultra-processed food (NOVA 4)")),
+            ("==", 3,      (-5,  "concern", "Processed food (NOVA 3)")),
+            ("in", (1, 2), (0,   "like",    "Minimally processed")),
+        ],
+    },
+    {
+        "name": "palm_oil", "field": "contains_palm_oil",
+        "bands": [("truthy", None, (-5, "concern", "Contains palm oil"))],
+    },
+    {
+        "name": "complexity", "field": "ingredient_count",
+        "bands": [(">", 20, (-3, "concern", "Complex formulation ({value} ingredients)"))],
+    },
+]
+
+# Applied after additives and labels
+DATA_QUALITY_RULES = [
+    {
+        "name": "per_serving", "field": "per_100g",
+        "bands": [("==", False, (-8, "concern",
+                   "Nutrition values reported per-serving, not per-100g — analysis may be inaccurate"))],
+    },
+    {
+        "name": "completeness", "field": "off_completeness",
+        "when": [("per_100g", "==", True)],
+        "bands": [
+            (">=", 0.8,  (3, None, None)),
+            ("<",  0.35, (-5, "concern", "Very limited nutrition data available")),
+        ],
+    },
+    {
+        # fallback when OFF reports no completeness figure
+        "name": "key_nutrients", "field": "key_nutrients_present",
+        "when": [("per_100g", "==", True), ("off_completeness", "missing", None)],
+        "bands": [
+            ("==", 4, (3, None, None)),
+            ("<=", 1, (-5, "concern", "Very limited nutrition data available")),
+        ],
+    },
+]
+
+# Additive risk → score deduction, and the cap on the total deduction
+ADDITIVE_PENALTY = {"high": 10, "moderate": 4, "low": 0, "unknown": 2}
+ADDITIVE_PENALTY_CAP = 20
+
+# Certified-label bonus: per matching label, capped
+LABEL_BONUS_EACH = 2
+LABEL_BONUS_CAP  = 5
+
+# Verdict by minimum score, best first
+VERDICTS = [
+    (75, "Healthy choice"),
+    (60, "Decent choice"),
+    (40, "Moderate consumption recommended"),
+    (20, "Best enjoyed occasionally"),
+    (0,  "Limit consumption"),
+]
+
+# Traffic-light colour per nutrient: first matching band wins
+RATING_BANDS = {
+    "salt": {
+        "bands": [(">", SALT_HIGH, "red"), (">", SALT_MODERATE, "orange")],
+        "otherwise": "green",
+    },
+    "saturated_fat": {
+        "bands": [(">", SAT_FAT_HIGH, "red"), (">", SAT_FAT_MODERATE, "orange")],
+        "otherwise": "green",
+    },
+    "sugars": {
+        "bands": [(">", SUGARS_HIGH, "red"), (">", 8, "orange")],
+        "otherwise": "green",
+    },
+    "fat": {
+        "bands": [(">", FAT_HIGH, "red"), (">", FAT_MODERATE, "orange")],
+        "otherwise": "green",
+    },
+    "fiber": {
+        "bands": [(">=", 3, "green"), (">", 1, "orange")],
+        "otherwise": "red",
+    },
+    "protein": {
+        "bands": [(">=", 10, "green")],
+        "otherwise": "neutral",
+    },
+    "energy_kcal": {
+        "bands": [(">", 400, "red"), (">", 250, "orange")],
+        "otherwise": "green",
+    },
+}
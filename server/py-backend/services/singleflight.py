@@ -0,0 +1,46 @@
+"""
+singleflight.py -- Coalesce concurrent calls for the same key.
+
+The first caller for a key starts the work as a task; callers arriving
+while it runs await the same task and get the same result or exception
+(e.g. the fetcher's 404/502 HTTPException). The work is shielded, so a
+disconnecting client does not cancel it for everyone else.
+"""
+
+import asyncio
+
+
+class SingleFlight:
+
+    def __init__(self):
+        self._inflight = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def __contains__(self, key):
+        return key in self._inflight
+
+    async def do(self, key, fn):
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        return await asyncio.shield(task)
+
+    def _done(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved even if every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self):
+        return {
+            "leaders":   self.leaders,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+        }
@@ -0,0 +1,62 @@
+"""The allergen matcher against a per-term regex loop, and its word boundaries."""
+
+import random
+import re
+
+import pytest
+
+from services.allergens import MATCHER
+
+_WORDS = [
+    "sugar", "wheat flour", "wholewheat flour", "buckwheat", "wheatgerm", "milk solids",
+    "buttermilk", "skimmed milk powder", "soya lecithin", "soybean oil", "soymilk",
+    "egg yolk", "eggs", "eggplant", "peanuts", "peanutbutter", "groundnut oil", "sesame seeds",
+    "mustard", "hazelnut paste", "almonds", "cashews", "tree nuts", "gluten", "lactose",
+    "salt", "cocoa butter", "emulsifier", "spices", "e322", "glucose syrup", "weizenmehl",
+    "vollmilchpulver", "mandeln", "senfoil", "sesamoid", "laitue", "lait écrémé", "pindang",
+]
+
+
+def reference(*texts):
+    """One search per term, with the same rules: word start, whole word or compound."""
+    text = "\n".join(t.lower() for t in texts)
+    found = set()
+    for term, names in MATCHER.canonical.items():
+        end = "" if term in MATCHER.compounds else r"(?:e?s)?(?!\w)"
+        if re.search(r"(?<!\w)" + re.escape(term) + end, text):
+            found.update(names)
+    return found
+
+
+def test_same_as_per_term_loop():
+    rng = random.Random(0)
+    traces = ["en:nuts", "en:peanuts", "en:sesame-seeds", "en:soybeans", "en:milk"]
+    for _ in range(2000):
+        text = ", ".join(rng.choice(_WORDS) for _ in range(rng.randint(1, 8)))
+        tr = rng.sample(traces, rng.randint(0, 2))
+        assert MATCHER.find(text, *tr) == reference(text, *tr), (text, tr)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Soya lecithin", {"soy", "soya"}),
+    ("wholewheat flour", {"wheat"}),
+    ("Weizenmehl, Vollmilchpulver", {"wheat", "milk"}),
+    ("Sojabohnen", {"soy", "soya"}),
+    ("eggs, egg yolk", {"egg"}),
+    ("Mandeln, Haselnüsse", {"almond", "hazelnut"}),
+    ("peanutbutter", {"peanut"}),
+    ("pindakaas", {"peanut"}),
+    ("en:sesame-seeds", {"sesame"}),
+    ("laitue, lait écrémé", {"milk"}),
+])
+def test_finds(text, expected):
+    assert MATCHER.find(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "eggplant", "courgette, aubergine (eggplant)", "laitue", "lechuga", "buckwheat",
+    "trigonella", "fenugreek (trigonella)", "Meier", "Schleier", "Eierschwammerl",
+    "mandelic acid", "sesamoid", "pindang", "leiter", "pleite", "senfoil",
+])
+def test_false_friends(text):
+    assert MATCHER.find(text) == set()
@@ -0,0 +1,78 @@
+"""analyze_batch() must agree with analyze() field for field."""
+
+import math
+import random
+
+import pytest
+
+from benchmarks.synthetic import make_product
+from services.analyzer import analyze, rating_color
+from services.analyzer_batch import NUTRIENT_KEYS, analyze_batch, columns_from_normalized
+from services.extractor import extract_product_data
+from services.normalizer import normalize
+from services.records import to_json
+
+N_PRODUCTS = 500
+
+# Values placed exactly on the rule thresholds, to exercise the boundaries
+_EDGES = (
+    ("salt", (0.6, 1.5, 10)), ("sugars", (5, 10, 15)), ("saturated-fat", (2.5, 5)),
+    ("fat", (5, 10, 17.5)), ("fiber", (1, 3, 5)), ("proteins", (10, 15)),
+    ("energy-kcal", (100, 300, 450)),
+)
+
+
+def random_normalized(n, seed):
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        raw = make_product(i, rng)
+        nutr = raw["nutriments"]
+        for key, edges in _EDGES:
+            if rng.random() < 0.2:
+                nutr[key] = rng.choice(edges)
+        if rng.random() < 0.1:
+            raw["completeness"] = rng.choice([0.35, 0.8])
+        out.append(normalize(extract_product_data(raw)))
+    return out
+
+
+def _same(a, b):
+    if isinstance(a, float) and math.isnan(a):
+        return isinstance(b, float) and math.isnan(b)
+    return a == b and type(a) is type(b)
+
+
+@pytest.fixture(scope="module")
+def scored():
+    products = random_normalized(N_PRODUCTS, seed=0)
+    return products, analyze_batch(columns_from_normalized(products))
+
+
+def test_scores_and_verdicts(scored):
+    products, batch = scored
+    for i, p in enumerate(products):
+        hl = analyze(p).highlights
+        assert int(batch["health_score"][i]) == hl.health_score, i
+        assert batch["verdict"][i] == hl.verdict, i
+
+
+def test_rda_and_ratings(scored):
+    products, batch = scored
+    for i, p in enumerate(products):
+        listed = {item.name: item for item in analyze(p).nutrients}
+        for key in NUTRIENT_KEYS:
+            rda = float(batch["rda_percent"][key][i])
+            if key in listed:
+                assert _same(rda, listed[key].rda_percent), (i, key)
+                assert batch["ratings"][key][i] == listed[key].rating, (i, key)
+            else:
+                assert math.isnan(rda), (i, key)
+                assert batch["ratings"][key][i] == rating_color(key, None), (i, key)
+
+
+def test_radar(scored):
+    products, batch = scored
+    for i, p in enumerate(products):
+        for name, value in to_json(analyze(p).nutrient_radar).items():
+            assert float(batch["radar"][name][i]) == value, (i, name)
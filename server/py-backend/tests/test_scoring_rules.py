@@ -0,0 +1,66 @@
+"""
+analyze() on a fixed corpus against the output of the hand-written
+analyze it replaced (the one before the scoring rule table).
+
+tests/fixtures/analyze_golden.json holds the highlights, nutrient list
+and radar that analyze produced for the benchmark fixtures and for
+synthetic products with nutrients placed on the rule thresholds. A rule
+or threshold edit that changes any score, rating or message fails here;
+if the change is intended, regenerate the file and review its diff.
+"""
+
+import json
+import os
+import random
+
+import pytest
+
+from benchmarks.bench_suite import _cases
+from benchmarks.synthetic import make_product
+from services.analyzer import analyze
+from services.encoding import dumps
+from services.extractor import extract_product_data
+from services.normalizer import normalize
+
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "analyze_golden.json")
+N_SYNTHETIC = 150
+FIELDS = ("highlights", "nutrients", "nutrient_radar")
+
+# Values placed exactly on the rule thresholds, to exercise the boundaries
+_EDGES = (
+    ("salt", (0.6, 1.5, 10)), ("sugars", (5, 10, 15)), ("saturated-fat", (2.5, 5)),
+    ("fat", (5, 10, 17.5)), ("fiber", (1, 3, 5)), ("proteins", (10, 15)),
+    ("energy-kcal", (100, 300, 450)),
+)
+
+
+def corpus():
+    """{name: OFF product}: the benchmark cases, then seeded synthetic products."""
+    products = dict(_cases())
+    rng = random.Random(0)
+    for i in range(N_SYNTHETIC):
+        raw = make_product(i, rng)
+        for key, edges in _EDGES:
+            if rng.random() < 0.2:
+                raw["nutriments"][key] = rng.choice(edges)
+        if rng.random() < 0.1:
+            raw["completeness"] = rng.choice([0.35, 0.8])
+        products[f"synthetic-{i:03d}"] = raw
+    return products
+
+
+with open(GOLDEN_PATH, encoding="utf-8") as _f:
+    GOLDEN = json.load(_f)
+
+CORPUS = corpus()
+
+
+def test_corpus_matches_golden():
+    assert sorted(CORPUS) == sorted(GOLDEN)
+
+
+@pytest.mark.parametrize("name", sorted(GOLDEN))
+def test_analyze_unchanged(name):
+    analysis = json.loads(dumps(analyze(normalize(extract_product_data(CORPUS[name])))))
+    for field in FIELDS:
+        assert analysis[field] == GOLDEN[name][field], (name, field)